@@ -0,0 +1,194 @@
+# app/audio.py
+
+import os
+import base64
+import asyncio
+from collections import deque
+from . import metrics
+from .relay import media_message_prefix
+
+# --- Config ---
+# Twilio media streams are 8 kHz mu-law: one byte per sample, 160 bytes per 20 ms frame
+SAMPLE_RATE = 8000
+FRAME_MS = 20
+FRAME_BYTES = SAMPLE_RATE * FRAME_MS // 1000
+OUTBOUND_PREBUFFER_MS = int(os.getenv("OUTBOUND_PREBUFFER_MS", "60"))
+OUTBOUND_LEAD_MS = int(os.getenv("OUTBOUND_LEAD_MS", "100"))
+
+
+class OutboundAudio:
+    """Per-call jitter buffer that paces model audio out to Twilio in real time.
+
+    Deltas from the realtime API arrive in bursts of arbitrary size; they are
+    appended to a byte buffer and a sender task slices them into 20 ms frames,
+    keeping at most `lead_ms` of audio ahead of real time on Twilio's side.
+    That keeps the receive loop free and lets barge-in drop unplayed audio.
+    With `send_text`, frames are written into a pre-built message string
+    instead of going through a dict and json.dumps.
+    """
+
+    def __init__(self, send_json, get_stream_sid, on_state=None,
+                 prebuffer_ms=OUTBOUND_PREBUFFER_MS, lead_ms=OUTBOUND_LEAD_MS, send_text=None):
+        self.send_json = send_json
+        self.send_text = send_text
+        self._media_prefix = (None, None)  # (stream_sid, message prefix)
+        self.get_stream_sid = get_stream_sid
+        self.on_state = on_state
+        self.prebuffer_bytes = prebuffer_ms * SAMPLE_RATE // 1000
+        self.prebuffer_s = prebuffer_ms / 1000
+        self.lead_s = lead_ms / 1000
+        self.buffer = bytearray()
+        self.marks = deque()  # (byte offset in the outbound stream, mark name)
+        self.speaking = False
+        self.item_id = None
+        self.item_bytes_sent = 0
+        self.bytes_queued = 0
+        self.bytes_sent = 0
+        self.frames_sent = 0
+        self.marks_played = 0
+        self._response_done = False
+        self._wake = asyncio.Event()
+        self._task = None
+
+    # --- Producer side (realtime receive loop) ---
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def push(self, item_id, payload_b64):
+        if item_id != self.item_id:
+            self.item_id = item_id
+            self.item_bytes_sent = 0
+        audio = base64.b64decode(payload_b64)
+        self.buffer += audio
+        self.bytes_queued += len(audio)
+        metrics.outbound_buffer_ms.observe(self.depth_ms())
+        self._response_done = False
+        self._wake.set()
+
+    def end_of_response(self, mark_name):
+        # Ask Twilio to echo `mark_name` once everything queued so far has played
+        self.marks.append((self.bytes_queued, mark_name))
+        self._response_done = True
+        self._wake.set()
+
+    def mark_played(self, mark_name):
+        self.marks_played += 1
+
+    async def clear(self):
+        """Barge-in: drop unsent audio and Twilio's queue.
+
+        Returns (item_id, ms played) for conversation.item.truncate, or None.
+        """
+        had_audio = bool(self.buffer) or self.speaking
+        self.buffer.clear()
+        self.bytes_queued = self.bytes_sent
+        self.marks.clear()
+        self._response_done = False
+        self._set_speaking(False)
+        self._wake.set()
+        if not had_audio or self.item_id is None:
+            return None
+        stream_sid = self.get_stream_sid()
+        if stream_sid:
+            await self.send_json({"event": "clear", "streamSid": stream_sid})
+        return self.item_id, self.item_bytes_sent * 1000 // SAMPLE_RATE
+
+    def depth_ms(self):
+        return len(self.buffer) * 1000 // SAMPLE_RATE
+
+    # --- Sender task ---
+    def _set_speaking(self, speaking):
+        if speaking != self.speaking:
+            self.speaking = speaking
+            if self.on_state:
+                self.on_state(speaking)
+
+    async def _wait(self, timeout=None):
+        self._wake.clear()
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _send_frame(self, stream_sid, frame):
+        payload = base64.b64encode(frame).decode()
+        if self.send_text is None:
+            await self.send_json({
+                "event": "media",
+                "streamSid": stream_sid,
+                "media": {"track": "outbound", "payload": payload}
+            })
+            return
+        if self._media_prefix[0] != stream_sid:
+            self._media_prefix = (stream_sid, media_message_prefix(stream_sid))
+        await self.send_text(self._media_prefix[1] + payload + '"}}')
+
+    async def _send_due_marks(self, stream_sid):
+        while self.marks and self.marks[0][0] <= self.bytes_sent:
+            _, name = self.marks.popleft()
+            await self.send_json({"event": "mark", "streamSid": stream_sid, "mark": {"name": name}})
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_at = None
+        while True:
+            stream_sid = self.get_stream_sid()
+            if not self.buffer or not stream_sid:
+                if stream_sid:
+                    await self._send_due_marks(stream_sid)
+                # A mid-response underrun keeps the "speaking" state; only a
+                # finished (or cleared) response drains it
+                if self._response_done or not stream_sid:
+                    self._set_speaking(False)
+                next_at = None
+                if not self.buffer:
+                    await self._wait()
+                elif not stream_sid:
+                    # Audio arrived before Twilio's start event
+                    await self._wait(FRAME_MS / 1000)
+                continue
+
+            if next_at is None:
+                # Jitter buffer: collect a little audio before starting playback
+                # unless the response is already complete
+                if len(self.buffer) < self.prebuffer_bytes and not self._response_done:
+                    await self._wait(self.prebuffer_s)
+                    if len(self.buffer) < self.prebuffer_bytes and not self._response_done:
+                        await self._wait(self.prebuffer_s)
+                    if not self.buffer:
+                        continue
+                next_at = loop.time()
+                self._set_speaking(True)
+
+            if len(self.buffer) < FRAME_BYTES and not self._response_done:
+                # Underrun mid-response: give the model one frame time to catch up
+                await self._wait(FRAME_MS / 1000)
+                if not self.buffer:
+                    continue
+
+            frame = bytes(self.buffer[:FRAME_BYTES])
+            del self.buffer[:FRAME_BYTES]
+            await self._send_frame(stream_sid, frame)
+            self.bytes_sent += len(frame)
+            self.item_bytes_sent += len(frame)
+            self.frames_sent += 1
+            metrics.frames_out_total.inc()
+            await self._send_due_marks(stream_sid)
+
+            # next_at is when Twilio finishes playing what we have sent; after an
+            # underrun playback restarts from now rather than bursting to catch up
+            now = loop.time()
+            next_at = max(next_at, now) + len(frame) / SAMPLE_RATE
+            delay = next_at - self.lead_s - now
+            if delay > 0:
+                await asyncio.sleep(delay)
@@ -0,0 +1,86 @@
+# app/chat.py
+
+import os
+import json
+import asyncio
+from .providers import providers
+from .tools import tools
+from .logger import log
+
+# --- Config ---
+CHAT_MODEL = os.getenv("CHAT_MODEL", "gpt-4-0613")
+CHAT_MAX_TOKENS = int(os.getenv("CHAT_MAX_TOKENS", "256"))
+# Model round-trips that may call tools before the model must answer in text
+CHAT_MAX_TOOL_ITERATIONS = int(os.getenv("CHAT_MAX_TOOL_ITERATIONS", "4"))
+
+CHAT_TOOLS = tools.chat_tools()
+
+
+async def run_chat(messages, turn, max_iterations=CHAT_MAX_TOOL_ITERATIONS):
+    """Run one user turn to a final answer, yielding events as they happen.
+
+    Yields {"type": "token", "text"} for streamed reply text, {"type": "status",
+    "text", "tool"} before each tool runs, and finally {"type": "done",
+    "reply"}. Tool calls from one completion run in parallel; after
+    `max_iterations` completions that called tools, the model is asked to answer
+    without tools. New assistant/tool messages are appended to `turn`.
+    """
+    for iteration in range(max_iterations + 1):
+        text = []
+        calls = {}  # index -> {"id", "name", "arguments"}
+        async with providers.limit("chat"):
+            stream = await providers.client_for("chat").chat.completions.create(
+                model=CHAT_MODEL,
+                messages=messages + turn,
+                tools=CHAT_TOOLS,
+                tool_choice="auto" if iteration < max_iterations else "none",
+                max_tokens=CHAT_MAX_TOKENS,
+                temperature=0.9,
+                stream=True
+            )
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    text.append(delta.content)
+                    yield {"type": "token", "text": delta.content}
+                for tc in delta.tool_calls or []:
+                    call = calls.setdefault(tc.index, {"id": None, "name": "", "arguments": ""})
+                    if tc.id:
+                        call["id"] = tc.id
+                    if tc.function and tc.function.name:
+                        call["name"] += tc.function.name
+                    if tc.function and tc.function.arguments:
+                        call["arguments"] += tc.function.arguments
+
+        reply = "".join(text)
+        if not calls:
+            turn.append({"role": "assistant", "content": reply})
+            yield {"type": "done", "reply": reply}
+            return
+
+        calls = [calls[i] for i in sorted(calls)]
+        turn.append({
+            "role": "assistant",
+            "content": reply or None,
+            "tool_calls": [
+                {"id": c["id"], "type": "function", "function": {"name": c["name"], "arguments": c["arguments"]}}
+                for c in calls
+            ]
+        })
+        for c in calls:
+            yield {"type": "status", "text": tools.status(c["name"]), "tool": c["name"]}
+        results = await asyncio.gather(*(tools.call(c["name"], c["arguments"]) for c in calls))
+        for c, result in zip(calls, results):
+            log(f"/chat function {c['name']} called with {c['arguments']}, result={result}")
+            turn.append({"role": "tool", "tool_call_id": c["id"], "content": json.dumps(result)})
+
+    # Only reached if the model kept calling tools with tool_choice="none"
+    reply = "Sorry, I couldn't complete that request. Could you try rephrasing it?"
+    turn.append({"role": "assistant", "content": reply})
+    yield {"type": "done", "reply": reply}
+
+
+def sse(event):
+    return f"data: {json.dumps(event)}\n\n"
@@ -0,0 +1,100 @@
+# app/chat_sessions.py
+
+import os
+import json
+from .shared_state import shared_state
+
+# --- Config ---
+CHAT_SESSION_MAX = int(os.getenv("CHAT_SESSION_MAX", "10000"))
+CHAT_SESSION_IDLE_TTL = float(os.getenv("CHAT_SESSION_IDLE_TTL", str(30 * 60)))
+CHAT_SESSION_MAX_BYTES = int(os.getenv("CHAT_SESSION_MAX_BYTES", str(64 * 1024 * 1024)))
+# History sent to the model per turn; older turns are folded into a short summary
+CHAT_HISTORY_TOKENS = int(os.getenv("CHAT_HISTORY_TOKENS", "1500"))
+CHAT_SUMMARY_TOKENS = int(os.getenv("CHAT_SUMMARY_TOKENS", "300"))
+SUMMARY_LINE_CHARS = 160
+
+# Rough per-message framing cost the model adds on top of the content
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(message):
+    """~4 characters per token; close enough for budgeting without a tokenizer."""
+    text = message.get("content") or ""
+    if message.get("tool_calls"):
+        text += json.dumps(message["tool_calls"])
+    return len(text) // 4 + MESSAGE_OVERHEAD_TOKENS
+
+
+class ChatSession:
+    def __init__(self, id, messages=None, summary=""):
+        self.id = id
+        self.messages = messages or []  # user/assistant/tool turns, no system prompt
+        self.summary = summary
+
+    def size(self):
+        return len(self.summary) + sum(
+            len(m.get("content") or "") + len(json.dumps(m.get("tool_calls") or "")) + 64
+            for m in self.messages
+        )
+
+    def compact(self, budget=CHAT_HISTORY_TOKENS, summary_tokens=CHAT_SUMMARY_TOKENS):
+        """Drop the oldest turns until the history fits `budget`, noting them in the summary.
+
+        The newest message is always kept. The summary keeps a clipped line per
+        dropped user/assistant message and is itself capped, so the prompt
+        stays roughly constant however long the conversation runs.
+        """
+        tokens = sum(estimate_tokens(m) for m in self.messages)
+        lines = []
+        while len(self.messages) > 1 and tokens > budget:
+            dropped = self.messages.pop(0)
+            tokens -= estimate_tokens(dropped)
+            if dropped.get("content") and dropped["role"] in ("user", "assistant"):
+                lines.append(f"{dropped['role']}: {dropped['content'][:SUMMARY_LINE_CHARS]}")
+            # A tool result is meaningless without the call that produced it
+            while len(self.messages) > 1 and self.messages[0]["role"] == "tool":
+                tokens -= estimate_tokens(self.messages.pop(0))
+        if lines:
+            summary = "\n".join(filter(None, [self.summary] + lines))
+            max_chars = summary_tokens * 4
+            if len(summary) > max_chars:
+                summary = summary[-max_chars:].split("\n", 1)[-1]
+            self.summary = summary
+
+    def prompt(self, system_message):
+        messages = [{"role": "system", "content": system_message}]
+        if self.summary:
+            messages.append({"role": "system", "content": "Earlier in this conversation:\n" + self.summary})
+        return messages + self.messages
+
+
+class ChatSessionStore:
+    """Server-side /chat conversations: LRU with idle-TTL expiry and a memory cap.
+
+    Sessions are evicted least recently used first once there are more than
+    `max_sessions` or their estimated size passes `max_bytes`, and expire
+    after `idle_ttl` seconds without a turn. They are kept in a shared-state
+    table, so with SHARED_STATE_URL set any worker can continue a session.
+    """
+
+    def __init__(self, state=shared_state, max_sessions=CHAT_SESSION_MAX, idle_ttl=CHAT_SESSION_IDLE_TTL,
+                 max_bytes=CHAT_SESSION_MAX_BYTES):
+        self.table = state.table("chat_sessions", max_sessions, max_bytes, idle_ttl)
+
+    async def load(self, session_id):
+        data = await self.table.get(session_id)
+        if data is None:
+            return None
+        return ChatSession(session_id, data["messages"], data["summary"])
+
+    async def save(self, session):
+        await self.table.set(session.id, {"messages": session.messages, "summary": session.summary}, session.size())
+
+    async def delete(self, session_id):
+        await self.table.delete(session_id)
+
+    def stats(self):
+        return self.table.stats()
+
+
+chat_sessions = ChatSessionStore()
@@ -1,31 +1,243 @@
 # app/crud.py
 
-from sqlalchemy.orm import Session
+from datetime import datetime
+from sqlalchemy import select, update, delete, or_, literal
+from sqlalchemy.ext.asyncio import AsyncSession
 from . import models, schemas
+from .logger import log
+from .slot_index import availability
+from .specialties import resolve_specialty
+from .schedules import format_weekdays
 
-def get_doctors(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Doctor).offset(skip).limit(limit).all()
+def specialty_filter(specialty, specialty_id):
+    """Doctor predicate for a specialty phrase resolved to `specialty_id` (or None).
 
-def get_doctor(db: Session, doctor_id: int):
-    return db.query(models.Doctor).filter(models.Doctor.id == doctor_id).first()
+    Linked doctors match through doctor_specialties; doctors added since the
+    last sync_specialties aren't linked yet, so their own column is matched
+    against the phrase and the canonical specialty name as well.
+    """
+    text_match = models.Doctor.specialty.ilike(f"%{specialty}%")
+    if specialty_id is None:
+        return text_match
+    canonical = select(models.Specialty.name).filter(models.Specialty.id == specialty_id).scalar_subquery()
+    return or_(
+        models.Doctor.id.in_(
+            select(models.DoctorSpecialty.doctor_id).filter(models.DoctorSpecialty.specialty_id == specialty_id)
+        ),
+        text_match,
+        models.Doctor.specialty.ilike(literal("%") + canonical + literal("%")),
+    )
+
+async def get_doctors(db: AsyncSession, limit: int = 100, after_id: int = None, specialty: str = None, skip: int = 0):
+    """One page of doctors ordered by id, starting after `after_id` (keyset pagination).
+
+    Seeking on the primary key keeps deep pages as cheap as the first one;
+    `skip` is the old offset paging, kept for existing callers. Slots are not
+    loaded; use get_slots_for_doctors for the page's ids.
+    """
+    query = select(models.Doctor).order_by(models.Doctor.id).limit(limit)
+    if after_id is not None:
+        query = query.filter(models.Doctor.id > after_id)
+    elif skip:
+        query = query.offset(skip)
+    if specialty:
+        query = query.filter(specialty_filter(specialty, await resolve_specialty(db, specialty)))
+    result = await db.execute(query)
+    return result.scalars().all()
+
+async def get_doctors_by_ids(db: AsyncSession, ids: list[int]):
+    # Returned in the order asked for; unknown ids are left out
+    result = await db.execute(select(models.Doctor).filter(models.Doctor.id.in_(ids)))
+    by_id = {d.id: d for d in result.scalars()}
+    return [by_id[i] for i in dict.fromkeys(ids) if i in by_id]
+
+async def get_slots_by_ids(db: AsyncSession, ids: list[int]):
+    result = await db.execute(select(models.Slot).filter(models.Slot.id.in_(ids)))
+    by_id = {s.id: s for s in result.scalars()}
+    return [by_id[i] for i in dict.fromkeys(ids) if i in by_id]
+
+async def get_slots_for_doctors(db: AsyncSession, doctor_ids: list[int], start: datetime, end: datetime):
+    """Slots of many doctors in [start, end) with one query: doctor_id -> slots by time.
+
+    Plain column rows rather than ORM objects: a page can carry thousands of
+    slots and identity-map bookkeeping would dominate the request.
+    """
+    slots = {doctor_id: [] for doctor_id in doctor_ids}
+    if not doctor_ids:
+        return slots
+    result = await db.execute(
+        select(models.Slot.id, models.Slot.doctor_id, models.Slot.start_time, models.Slot.is_booked)
+        .filter(models.Slot.doctor_id.in_(doctor_ids), models.Slot.start_time >= start, models.Slot.start_time < end)
+        .order_by(models.Slot.doctor_id, models.Slot.start_time)
+    )
+    for slot in result:
+        slots[slot.doctor_id].append(slot)
+    return slots
+
+async def get_doctor(db: AsyncSession, doctor_id: int):
+    return await db.get(models.Doctor, doctor_id)
+
+async def search_doctors(db: AsyncSession, specialty: str = ""):
+    specialty_id = await resolve_specialty(db, specialty)
+    query = select(models.Doctor).filter(specialty_filter(specialty, specialty_id)).order_by(models.Doctor.id)
+    result = await db.execute(query)
+    return result.scalars().all()
+
+async def find_next_available(db: AsyncSession, specialty: str, start: datetime = None, end: datetime = None, limit: int = 5):
+    """Earliest free slots across every doctor of a specialty, in one query.
+
+    Returns (slot_id, start_time, doctor_id, doctor_name) rows, or None if the
+    specialty phrase does not resolve.
+    """
+    specialty_id = await resolve_specialty(db, specialty)
+    if specialty_id is None:
+        return None
+    start = start or datetime.now()
+    query = (
+        select(models.Slot.id, models.Slot.start_time, models.Doctor.id.label("doctor_id"), models.Doctor.name.label("doctor_name"))
+        .join(models.Doctor, models.Doctor.id == models.Slot.doctor_id)
+        .filter(
+            specialty_filter(specialty, specialty_id),
+            models.Slot.is_booked == False,
+            models.Slot.start_time >= start,
+        )
+        .order_by(models.Slot.start_time, models.Slot.id)
+        .limit(limit)
+    )
+    if end:
+        query = query.filter(models.Slot.start_time < end)
+    result = await db.execute(query)
+    return result.all()
+
+async def get_doctor_slots(db: AsyncSession, doctor_id: int, date: str = None):
+    if date:
+        slots = await availability.free_slots(db, doctor_id, datetime.fromisoformat(date).date())
+        if slots is not None:
+            return slots
+    # All free slots, or a date outside the indexed window: ask the database
+    query = select(models.Slot).filter(models.Slot.doctor_id == doctor_id, models.Slot.is_booked == False)
+    if date:
+        day_start = datetime.fromisoformat(date)
+        day_end = day_start.replace(hour=23, minute=59, second=59)
+        query = query.filter(models.Slot.start_time >= day_start, models.Slot.start_time <= day_end)
+    result = await db.execute(query)
+    return result.scalars().all()
 
-def get_doctor_slots(db: Session, doctor_id: int):
-    return db.query(models.Slot).filter(models.Slot.doctor_id == doctor_id, models.Slot.is_booked == False).all()
+async def get_next_free_slots(db: AsyncSession, doctor_id: int, limit: int, after: datetime = None):
+    slots = await availability.next_free(db, doctor_id, limit, after)
+    if slots is not None:
+        return slots
+    query = (
+        select(models.Slot)
+        .filter(models.Slot.doctor_id == doctor_id, models.Slot.is_booked == False,
+                models.Slot.start_time >= (after or datetime.now()))
+        .order_by(models.Slot.start_time)
+        .limit(limit)
+    )
+    result = await db.execute(query)
+    return result.scalars().all()
 
-def create_appointment(db: Session, appointment: schemas.AppointmentCreate):
-    slot = db.query(models.Slot).filter(models.Slot.id == appointment.slot_id, models.Slot.is_booked == False).first()
-    if not slot:
-        print(f"[DEBUG] Slot not found or already booked: {appointment.slot_id}")
+async def claim_slot(db: AsyncSession, slot_id: int, doctor_id: int):
+    # Conditional update: only one concurrent caller can flip is_booked for a given slot
+    stmt = (
+        update(models.Slot)
+        .where(models.Slot.id == slot_id, models.Slot.doctor_id == doctor_id, models.Slot.is_booked == False)
+        .values(is_booked=True)
+        .execution_options(synchronize_session=False)
+    )
+    if db.bind.dialect.update_returning:
+        result = await db.execute(stmt.returning(models.Slot.id))
+        return result.scalar_one_or_none() is not None
+    result = await db.execute(stmt)
+    return result.rowcount == 1
+
+async def release_slot(db: AsyncSession, slot_id: int):
+    # Returns (doctor_id, start_time) of the freed slot, or None if it was not booked
+    stmt = (
+        update(models.Slot)
+        .where(models.Slot.id == slot_id, models.Slot.is_booked == True)
+        .values(is_booked=False)
+        .execution_options(synchronize_session=False)
+    )
+    if db.bind.dialect.update_returning:
+        result = await db.execute(stmt.returning(models.Slot.doctor_id, models.Slot.start_time))
+        return result.first()
+    if (await db.execute(stmt)).rowcount != 1:
         return None
-    slot.is_booked = True
-    db_appointment = models.Appointment(
-        doctor_id=appointment.doctor_id,
-        slot_id=appointment.slot_id,
-        patient_name=appointment.patient_name,
-        status="booked"
-    )
-    db.add(db_appointment)
-    db.commit()
-    db.refresh(db_appointment)
-    print(f"[DEBUG] Created appointment: {db_appointment}")
-    return db_appointment
\ No newline at end of file
+    result = await db.execute(select(models.Slot.doctor_id, models.Slot.start_time).filter(models.Slot.id == slot_id))
+    return result.first()
+
+async def create_appointment(db: AsyncSession, appointment: schemas.AppointmentCreate):
+    try:
+        if not await claim_slot(db, appointment.slot_id, appointment.doctor_id):
+            await db.rollback()
+            log(f"Slot not found or already booked: {appointment.slot_id}", level="DEBUG")
+            return None
+        db_appointment = models.Appointment(
+            doctor_id=appointment.doctor_id,
+            slot_id=appointment.slot_id,
+            patient_name=appointment.patient_name,
+            status="booked"
+        )
+        db.add(db_appointment)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    availability.mark_booked(appointment.doctor_id, appointment.slot_id)
+    log(f"Created appointment: {db_appointment}", level="DEBUG")
+    return db_appointment
+
+async def cancel_appointment(db: AsyncSession, appointment_id: int):
+    try:
+        stmt = (
+            delete(models.Appointment)
+            .where(models.Appointment.id == appointment_id)
+            .execution_options(synchronize_session=False)
+        )
+        if db.bind.dialect.delete_returning:
+            result = await db.execute(stmt.returning(models.Appointment.slot_id))
+            slot_id = result.scalar_one_or_none()
+        else:
+            slot_id = (await db.execute(
+                select(models.Appointment.slot_id).filter(models.Appointment.id == appointment_id)
+            )).scalar_one_or_none()
+            if slot_id is not None and (await db.execute(stmt)).rowcount != 1:
+                slot_id = None
+        if slot_id is None:
+            await db.rollback()
+            return False
+        freed = await release_slot(db, slot_id)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    if freed:
+        availability.mark_free(freed.doctor_id, slot_id, freed.start_time)
+    return True
+
+async def create_schedule_rule(db: AsyncSession, doctor_id: int, rule: schemas.ScheduleRuleCreate):
+    db_rule = models.ScheduleRule(
+        doctor_id=doctor_id,
+        weekdays=format_weekdays(rule.weekdays),
+        start_time=rule.start_time,
+        end_time=rule.end_time,
+        slot_minutes=rule.slot_minutes,
+        valid_from=rule.valid_from,
+        valid_until=rule.valid_until
+    )
+    db.add(db_rule)
+    await db.commit()
+    return db_rule
+
+async def get_schedule_rules(db: AsyncSession, doctor_id: int):
+    result = await db.execute(
+        select(models.ScheduleRule).filter(models.ScheduleRule.doctor_id == doctor_id).order_by(models.ScheduleRule.id)
+    )
+    return result.scalars().all()
+
+async def create_schedule_exception(db: AsyncSession, doctor_id: int, exception: schemas.ScheduleExceptionCreate):
+    db_exception = models.ScheduleException(doctor_id=doctor_id, **exception.model_dump())
+    db.add(db_exception)
+    await db.commit()
+    return db_exception
@@ -1,5 +1,7 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import inspect, text, UniqueConstraint
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.engine import make_url
 import os
 from dotenv import load_dotenv
 
@@ -7,7 +9,79 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# --- Pool config ---
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# Sync driver names from existing .env files map onto their async counterparts
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url):
+    url = make_url(url)
+    if url.drivername in ASYNC_DRIVERS:
+        url = url.set(drivername=ASYNC_DRIVERS[url.drivername])
+    return url
+
+
+def engine_kwargs(url):
+    # In-memory SQLite runs on a single shared connection, so pool sizing does not apply
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+ASYNC_DATABASE_URL = to_async_url(DATABASE_URL)
+engine = create_async_engine(ASYNC_DATABASE_URL, **engine_kwargs(ASYNC_DATABASE_URL))
+SessionLocal = async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
+
+
+def create_schema(conn):
+    """Create missing tables, indexes and unique constraints.
+
+    Returns the unique constraints that could not be added because existing
+    rows already break them, as (constraint name, duplicate groups); no data
+    is changed to make them fit.
+    """
+    # create_all only adds indexes together with new tables; add any that an
+    # existing database is missing as well
+    Base.metadata.create_all(bind=conn)
+    inspector = inspect(conn)
+    conflicts = []
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=conn, checkfirst=True)
+        # Unique constraints can't be added to an existing table everywhere;
+        # a unique index of the same name enforces the same thing
+        existing = {c["name"] for c in inspector.get_unique_constraints(table.name)}
+        existing |= {i["name"] for i in inspector.get_indexes(table.name)}
+        for constraint in table.constraints:
+            if isinstance(constraint, UniqueConstraint) and constraint.name and constraint.name not in existing:
+                columns = ", ".join(column.name for column in constraint.columns)
+                duplicates = conn.execute(text(
+                    f"SELECT COUNT(*) FROM (SELECT 1 FROM {table.name} GROUP BY {columns} HAVING COUNT(*) > 1) d"
+                )).scalar_one()
+                if duplicates:
+                    conflicts.append((constraint.name, duplicates))
+                    continue
+                conn.execute(text(f"CREATE UNIQUE INDEX {constraint.name} ON {table.name} ({columns})"))
+    return conflicts
+
+
+async def get_db():
+    async with SessionLocal() as db:
+        yield db
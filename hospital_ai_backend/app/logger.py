@@ -0,0 +1,196 @@
+# app/logger.py
+
+import os
+import json
+import queue
+import datetime
+import threading
+import time
+import atexit
+
+# --- Config ---
+LOGFILE = os.getenv("LOGFILE", "app_run.log")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_ROTATE_SECONDS = int(os.getenv("LOG_ROTATE_SECONDS", str(24 * 3600)))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "0.5"))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "500"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_RATE_INTERVAL = float(os.getenv("LOG_RATE_INTERVAL", "1.0"))
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+
+_STOP = object()
+
+
+class LogWriter:
+    """Background thread that drains a queue of log lines into a rotating file.
+
+    Callers only pay for a `put_nowait`; file opens, writes and rotation all
+    happen on the writer thread, in batches. With `json_rates` the periodic
+    counter summaries are written as JSON records too, for files of JSON lines.
+    """
+
+    def __init__(self, path=LOGFILE, level=LOG_LEVEL, max_bytes=LOG_MAX_BYTES,
+                 backup_count=LOG_BACKUP_COUNT, rotate_seconds=LOG_ROTATE_SECONDS,
+                 flush_interval=LOG_FLUSH_INTERVAL, batch_size=LOG_BATCH_SIZE,
+                 queue_size=LOG_QUEUE_SIZE, rate_interval=LOG_RATE_INTERVAL, json_rates=False):
+        self.path = path
+        self.level = LEVELS.get(level, LEVELS["INFO"])
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.rotate_seconds = rotate_seconds
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.rate_interval = rate_interval
+        self.json_rates = json_rates
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self._rates = {}
+        self._rates_lock = threading.Lock()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._file = None
+        self._opened_at = 0.0
+
+    # --- Producer side (any thread / event loop) ---
+    def enabled(self, level):
+        return LEVELS.get(level, LEVELS["INFO"]) >= self.level
+
+    def submit(self, msg, level="INFO"):
+        if not self.enabled(level):
+            return
+        self.ensure_started()
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        line = f"{timestamp} {msg}\n" if level == "INFO" else f"{timestamp} [{level}] {msg}\n"
+        try:
+            self.queue.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1
+
+    def submit_raw(self, line):
+        """Queue a preformatted line (no timestamp or level), e.g. a JSON record."""
+        self.ensure_started()
+        try:
+            self.queue.put_nowait(line + "\n")
+        except queue.Full:
+            self.dropped += 1
+
+    def count(self, key, n=1):
+        """Count a high-rate event; the writer emits one summary line per interval."""
+        self.ensure_started()
+        with self._rates_lock:
+            self._rates[key] = self._rates.get(key, 0) + n
+
+    # --- Lifecycle ---
+    def ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=5.0):
+        if self._thread is None:
+            return
+        self.queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    # --- Writer thread ---
+    def _run(self):
+        batch = []
+        last_flush = time.monotonic()
+        last_rates = last_flush
+        stopping = False
+        while not stopping:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+                if item is _STOP:
+                    stopping = True
+                else:
+                    batch.append(item)
+                    # Drain whatever else is already waiting without blocking
+                    while len(batch) < self.batch_size:
+                        item = self.queue.get_nowait()
+                        if item is _STOP:
+                            stopping = True
+                            break
+                        batch.append(item)
+            except queue.Empty:
+                pass
+
+            now = time.monotonic()
+            if stopping or now - last_rates >= self.rate_interval:
+                batch.extend(self._rate_lines(now - last_rates))
+                last_rates = now
+            if batch and (stopping or len(batch) >= self.batch_size or now - last_flush >= self.flush_interval):
+                self._write(batch)
+                batch = []
+                last_flush = now
+        if batch:
+            self._write(batch)
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def _rate_lines(self, elapsed):
+        with self._rates_lock:
+            rates, self._rates = self._rates, {}
+        if self.dropped:
+            rates["log.dropped"], self.dropped = self.dropped, 0
+        if not rates:
+            return []
+        if self.json_rates:
+            return [json.dumps({"rates": rates, "interval_s": round(elapsed, 3), "at": time.time()}) + "\n"]
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        elapsed = max(elapsed, 1e-6)
+        summary = ", ".join(f"{key}={n} ({n / elapsed:.1f}/s)" for key, n in sorted(rates.items()))
+        return [f"{timestamp} RATE {summary}\n"]
+
+    def _write(self, lines):
+        try:
+            if self._file is None:
+                self._open()
+            elif self._should_rotate():
+                self._rotate()
+            self._file.write("".join(lines))
+            self._file.flush()
+        except OSError:
+            # Never let logging take the writer thread down
+            self._file = None
+
+    def _open(self):
+        self._file = open(self.path, "a")
+        self._opened_at = time.time()
+
+    def _should_rotate(self):
+        if self.max_bytes and self._file.tell() >= self.max_bytes:
+            return True
+        return bool(self.rotate_seconds) and time.time() - self._opened_at >= self.rotate_seconds
+
+    def _rotate(self):
+        self._file.close()
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+
+writer = LogWriter()
+atexit.register(writer.stop)
+
+
+def log(msg, level="INFO"):
+    writer.submit(msg, level)
+
+
+def log_rate(key, n=1):
+    writer.count(key, n)
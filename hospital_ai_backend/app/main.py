@@ -1,82 +1,252 @@
 import os
 import json
-import base64
 import asyncio
-import websockets
-import datetime
-from io import BytesIO
+import uuid
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from datetime import datetime, date, timedelta
+from typing import Optional
 from dotenv import load_dotenv
-import openai
 from fastapi import FastAPI, WebSocket, Request, Depends, HTTPException, Query, File, UploadFile, Response, APIRouter, WebSocketDisconnect
 from fastapi.responses import JSONResponse, StreamingResponse
-from sqlalchemy.orm import Session
-from . import models, schemas, crud
-from .database import SessionLocal, engine, Base
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import schemas, crud, schedules
+from .database import engine, get_db
+from .migrate import migrate, DB_CREATE_SCHEMA
+from .warmup import readiness, warm_up, STARTUP_WARMUP
 from .schemas import ChatRequest
 from fastapi.staticfiles import StaticFiles
+from .logger import log, log_rate
+from .audio import OutboundAudio
+from .visualizer import hub
+from .tts_cache import tts_cache, cache_key, MEDIA_TYPES
+from .providers import providers
+from .realtime_pool import realtime_pool
+from . import metrics
+from .tools import tools, ToolCache
+from .chat_sessions import chat_sessions, ChatSession
+from .chat import run_chat, sse
+from .stt import AudioFormat, open_audio, transcribe_stream
+from .shared_state import shared_state
+from .relay import MEDIA_RELAY_FAST, InboundRelay, twilio_media_payload, audio_delta
 
 
-
-# --------------- Logging Setup ---------------
-LOGFILE = "app_run.log"
-def log(msg):
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(LOGFILE, "a") as f:
-        f.write(f"{timestamp} {msg}\n")
-
 # --- Config ---
 load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 VOICE = "alloy"
+TTS_MODEL = os.getenv("TTS_MODEL", "tts-1")
+TTS_FORMAT = os.getenv("TTS_FORMAT", "mp3")
+TTS_CHUNK_BYTES = int(os.getenv("TTS_CHUNK_BYTES", "8192"))
+# include=slots window on doctor listings when none is given, and its maximum
+DOCTOR_SLOTS_DAYS = int(os.getenv("DOCTOR_SLOTS_DAYS", "7"))
+DOCTOR_SLOTS_MAX_DAYS = int(os.getenv("DOCTOR_SLOTS_MAX_DAYS", "31"))
 NGROK_BASE = "https://bdd2-2600-1702-7d20-1790-7569-cb79-4e79-22eb.ngrok-free.app"  
+MEDIA_STREAM_URL = "wss://bdd2-2600-1702-7d20-1790-7569-cb79-4e79-22eb.ngrok-free.app/media-stream"
 SYSTEM_MESSAGE = (
     "You are Rachel, a helpful, empathetic hospital assistant at Rock Hospitals. "
     "Use natural conversation, hesitations, and warmth. Help users with doctors, appointments, etc. "
     "Ask clarifying questions, suggest slots, and never book until user confirms. Never provide medical advice."
 )
+
+# --- Lifespan ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema changes belong to `python -m app.migrate`; DB_CREATE_SCHEMA=1 runs it here
+    readiness.begin()
+    if DB_CREATE_SCHEMA:
+        await readiness.step("migrate", migrate)
+    await shared_state.start()
+    await realtime_pool.start(SESSION_UPDATE)
+    loop_lag_task = asyncio.create_task(metrics.monitor_loop_lag())
+    if STARTUP_WARMUP:
+        # Imports the provider SDK and builds the client off the event loop
+        warmup_task = asyncio.create_task(warm_up(prebuild={"twiml": incoming_call_twiml, "openai_sdk": providers.preload}))
+    else:
+        providers.start()
+        warmup_task = None
+        readiness.finish()
+    try:
+        yield
+    finally:
+        for task in (warmup_task, loop_lag_task):
+            if task:
+                task.cancel()
+        await realtime_pool.close()
+        await engine.dispose()
+        await providers.close()
+        await shared_state.close()
+
 app = FastAPI(
     title="Hospital AI Voice Assistant API",
     description="API for doctors, slots, and appointment booking",
-    version="0.2.0"
+    version="0.2.0",
+    lifespan=lifespan
 )
-app.state.visualizer_clients = []
 router = APIRouter()
 
+# The directory is resolved on first request, not at import
+app.mount("/static", StaticFiles(directory="static", check_dir=False), name="static")
+
+@app.get("/ready")
+async def ready():
+    # 503 until this worker has finished warming up; point load-balancer health checks here
+    return JSONResponse(status_code=200 if readiness.ready else 503, content=readiness.status())
 
-# --- DB Setup ---
-Base.metadata.create_all(bind=engine)
-def get_db():
-    db = SessionLocal()
+# --- Metrics ---
+metrics.registry.register(metrics.CallbackGauge(
+    "visualizer_clients", "Connected /ws-visualizer clients", lambda: len(hub)))
+metrics.registry.register(metrics.CallbackGauge(
+    "realtime_pool_idle", "Warm realtime sessions waiting for a call", lambda: len(realtime_pool.idle)))
+metrics.registry.register(metrics.CallbackGauge(
+    "tts_cache_hit_ratio", "Share of /tts requests served without a new upstream call",
+    lambda: tts_cache.stats()["hit_rate"]))
+metrics.registry.register(metrics.CallbackGauge(
+    "chat_sessions", "Server-side /chat sessions held in memory", lambda: chat_sessions.stats()["entries"]))
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
     try:
-        yield db
+        response = await call_next(request)
+        status = response.status_code
+        return response
     finally:
-        db.close()
-app.mount("/static", StaticFiles(directory="static"), name="static")
+        # Label by route template, not raw path, to keep the series count bounded
+        route = request.scope.get("route")
+        metrics.http_request_seconds.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=status,
+        )
 
-# --- Conversation store for Twilio calls ---
-CONV_HISTORY = {}
+@app.get("/metrics")
+async def read_metrics():
+    return Response(content=metrics.registry.render(), media_type="text/plain; version=0.0.4")
 
 # --- Classic REST endpoints ---
+async def doctors_out(db, doctors, include, slots_from, slots_to):
+    """Doctor rows for the response; with include=slots, their slots in the window from one query."""
+    slots = {}
+    if include == "slots":
+        start = slots_from or datetime.combine(date.today(), datetime.min.time())
+        end = slots_to or start + timedelta(days=DOCTOR_SLOTS_DAYS)
+        if not start < end <= start + timedelta(days=DOCTOR_SLOTS_MAX_DAYS):
+            raise HTTPException(status_code=422, detail=f"Slot window must be 1 to {DOCTOR_SLOTS_MAX_DAYS} days")
+        slots = await crud.get_slots_for_doctors(db, [d.id for d in doctors], start, end)
+    return [
+        {"id": d.id, "name": d.name, "specialty": d.specialty, "description": d.description,
+         "contact_info": d.contact_info, "slots": slots.get(d.id)}
+        for d in doctors
+    ]
+
 @app.get("/doctors", response_model=list[schemas.DoctorBase])
-def read_doctors(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    log(f"/doctors called: skip={skip}, limit={limit}")
-    return crud.get_doctors(db, skip=skip, limit=limit)
+async def read_doctors(
+    response: Response,
+    limit: int = Query(10, ge=1, le=500),
+    cursor: Optional[int] = Query(None, description="X-Next-Cursor of the previous page"),
+    specialty: Optional[str] = None,
+    include: Optional[str] = Query(None, pattern="^slots$"),
+    slots_from: Optional[datetime] = None,
+    slots_to: Optional[datetime] = None,
+    skip: int = Query(0, ge=0, description="Offset paging; prefer cursor"),
+    db: AsyncSession = Depends(get_db)
+):
+    log(f"/doctors called: cursor={cursor}, skip={skip}, limit={limit}, specialty={specialty}, include={include}")
+    doctors = await crud.get_doctors(db, limit=limit, after_id=cursor, specialty=specialty, skip=skip)
+    if len(doctors) == limit:
+        response.headers["X-Next-Cursor"] = str(doctors[-1].id)
+    return await doctors_out(db, doctors, include, slots_from, slots_to)
+
+@app.post("/doctors/batch", response_model=list[schemas.DoctorBase])
+async def read_doctors_batch(
+    request: schemas.BatchIds,
+    include: Optional[str] = Query(None, pattern="^slots$"),
+    slots_from: Optional[datetime] = None,
+    slots_to: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    log(f"/doctors/batch called: {len(request.ids)} ids, include={include}")
+    doctors = await crud.get_doctors_by_ids(db, request.ids)
+    return await doctors_out(db, doctors, include, slots_from, slots_to)
+
+@app.post("/slots/batch", response_model=list[schemas.SlotOut])
+async def read_slots_batch(request: schemas.BatchIds, db: AsyncSession = Depends(get_db)):
+    log(f"/slots/batch called: {len(request.ids)} ids")
+    return await crud.get_slots_by_ids(db, request.ids)
 
 @app.get("/doctors/{doctor_id}/slots", response_model=list[schemas.SlotBase])
-def read_doctor_slots(doctor_id: int, db: Session = Depends(get_db)):
-    log(f"/doctors/{doctor_id}/slots called")
-    return crud.get_doctor_slots(db, doctor_id)
+async def read_doctor_slots(doctor_id: int, date: str = None, limit: int = None, db: AsyncSession = Depends(get_db)):
+    log(f"/doctors/{doctor_id}/slots called: date={date}, limit={limit}")
+    if limit:
+        return await crud.get_next_free_slots(db, doctor_id, limit)
+    return await crud.get_doctor_slots(db, doctor_id, date)
+
+@app.get("/slots/next-available", response_model=list[schemas.AvailableSlot])
+async def read_next_available(
+    specialty: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(5, ge=1, le=50),
+    db: AsyncSession = Depends(get_db)
+):
+    log(f"/slots/next-available called: specialty={specialty}, start={start}, end={end}, limit={limit}")
+    rows = await crud.find_next_available(db, specialty, start, end, limit)
+    if rows is None:
+        raise HTTPException(status_code=404, detail="Unknown specialty")
+    return rows
 
 @app.post("/appointments", response_model=schemas.AppointmentBase)
-def create_appointment(appointment: schemas.AppointmentCreate, db: Session = Depends(get_db)):
+async def create_appointment(appointment: schemas.AppointmentCreate, db: AsyncSession = Depends(get_db)):
     log(f"/appointments called: {appointment}")
-    db_appointment = crud.create_appointment(db, appointment)
+    db_appointment = await crud.create_appointment(db, appointment)
     if not db_appointment:
         log(f"Slot not available for {appointment}")
         raise HTTPException(status_code=400, detail="Slot not available")
     return db_appointment
 
+# --- Schedules (admin) ---
+@app.post("/doctors/{doctor_id}/schedule-rules", response_model=schemas.ScheduleRuleOut)
+async def create_schedule_rule(doctor_id: int, rule: schemas.ScheduleRuleCreate, db: AsyncSession = Depends(get_db)):
+    if not await crud.get_doctor(db, doctor_id):
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    return await crud.create_schedule_rule(db, doctor_id, rule)
 
+@app.get("/doctors/{doctor_id}/schedule-rules", response_model=list[schemas.ScheduleRuleOut])
+async def read_schedule_rules(doctor_id: int, db: AsyncSession = Depends(get_db)):
+    return await crud.get_schedule_rules(db, doctor_id)
+
+@app.post("/doctors/{doctor_id}/schedule-exceptions", response_model=schemas.ScheduleExceptionOut)
+async def create_schedule_exception(doctor_id: int, exception: schemas.ScheduleExceptionCreate, db: AsyncSession = Depends(get_db)):
+    if not await crud.get_doctor(db, doctor_id):
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    return await crud.create_schedule_exception(db, doctor_id, exception)
+
+@app.post("/admin/schedules/generate")
+async def generate_slots(request: schemas.ScheduleGenerate):
+    log(f"/admin/schedules/generate called: {request}")
+    if request.end <= request.start:
+        raise HTTPException(status_code=422, detail="end must be after start")
+    return await schedules.generate(request.start, request.end, request.doctor_ids)
+
+@app.post("/admin/schedules/extend")
+async def extend_slots(request: schemas.ScheduleExtend):
+    log(f"/admin/schedules/extend called: {request}")
+    return await schedules.extend(request.days, request.doctor_ids)
+
+
+
+def tts_upstream(text, voice):
+    async def stream():
+        async with providers.limit("tts"):
+            async with providers.client_for("tts").audio.speech.with_streaming_response.create(
+                model=TTS_MODEL, voice=voice, input=text, response_format=TTS_FORMAT
+            ) as response:
+                async for chunk in response.iter_bytes(TTS_CHUNK_BYTES):
+                    yield chunk
+    return stream
 
 @app.post("/tts")
 async def tts_endpoint(
@@ -84,134 +254,152 @@ async def tts_endpoint(
     voice: str = Query(VOICE, description="Voice to use: alloy, echo, fable, onyx, nova, shimmer")
 ):
     log(f"/tts called: text='{text[:30]}...' voice='{voice}'")
-    client = openai.OpenAI(api_key=OPENAI_API_KEY)
+    key = cache_key(text, voice, TTS_MODEL, TTS_FORMAT)
+    media_type = MEDIA_TYPES[TTS_FORMAT]
+    data = tts_cache.get_memory(key)
+    if data is not None:
+        return Response(content=data, media_type=media_type)
+    path = await tts_cache.get_disk(key, TTS_FORMAT)
+    if path:
+        return tts_cache.response(key, path, media_type)
+    fill = tts_cache.fill(key, TTS_FORMAT, tts_upstream(text, voice))
     try:
-        response = client.audio.speech.create(
-            model="tts-1", voice=voice, input=text, response_format="mp3"
-        )
-        audio_data = BytesIO(response.content)
-        return StreamingResponse(audio_data, media_type="audio/mpeg")
+        await fill.wait_started()
     except Exception as e:
         log(f"/tts error: {e}")
         return {"error": str(e)}
+    return StreamingResponse(fill.stream(), media_type=media_type)
+
+@app.get("/tts/stats")
+async def tts_stats():
+    return tts_cache.stats()
 
 @app.post("/stt")
-def stt_endpoint(audio: UploadFile = File(...), language: str = "en"):
-    client = openai.OpenAI(api_key=OPENAI_API_KEY)
-    audio.file.seek(0)
-    audio_bytes = audio.file.read()
+async def stt_endpoint(
+    audio: UploadFile = File(...),
+    language: str = "en",
+    stream: bool = False,
+    encoding: Optional[str] = Query(None, pattern="^(mulaw|pcm16)$"),
+    sample_rate: int = Query(8000, ge=1000, le=192000),
+):
+    """Transcribe an upload. With stream=true, WAV (PCM16 or mu-law) or raw
+    `encoding` audio is split at silences, transcribed in parallel and sent
+    back as server-sent events with timestamps. The multipart upload is
+    spooled to a temporary file before this runs; segmenting then reads it
+    a chunk at a time, so memory stays bounded but work starts once the
+    upload has arrived."""
+    if stream:
+        return await stt_stream(audio, language, AudioFormat(encoding, sample_rate) if encoding else None)
+    await audio.seek(0)
+    audio_bytes = await audio.read()
     log(f"/stt called for file: {audio.filename}")
     try:
-        transcript = client.audio.transcriptions.create(
-            model="whisper-1",
-            file=(audio.filename, audio_bytes, audio.content_type),
-            language=language
-        )
+        async with providers.limit("stt"):
+            transcript = await providers.client_for("stt").audio.transcriptions.create(
+                model="whisper-1",
+                file=(audio.filename, audio_bytes, audio.content_type),
+                language=language
+            )
         return {"text": transcript.text}
     except Exception as e:
         log(f"/stt error: {e}")
         return JSONResponse(status_code=400, content={"error": str(e)})
 
+async def stt_stream(audio, language, fmt):
+    await audio.seek(0)
+    log(f"/stt streaming file: {audio.filename}")
+
+    async def transcribe(wav, index):
+        async with providers.limit("stt"):
+            transcript = await providers.client_for("stt").audio.transcriptions.create(
+                model="whisper-1", file=(f"segment-{index}.wav", wav, "audio/wav"), language=language
+            )
+        return transcript.text
+
+    try:
+        fmt, head = await open_audio(audio, fmt)
+        source = transcribe_stream(audio, fmt, head, transcribe)
+    except ValueError as e:
+        # Compressed or unknown audio can't be cut without a decoder: send it whole
+        log(f"/stt: not segmenting {audio.filename} ({e})")
+        source = None
+
+    async def events():
+        try:
+            if source is not None:
+                async for event in source:
+                    yield sse(event)
+                return
+            await audio.seek(0)
+            async with providers.limit("stt"):
+                transcript = await providers.client_for("stt").audio.transcriptions.create(
+                    model="whisper-1", file=(audio.filename, audio.file, audio.content_type), language=language
+                )
+            yield sse({"type": "segment", "index": 0, "start": 0, "end": None, "text": transcript.text})
+            yield sse({"type": "done", "text": transcript.text, "segments": 1, "duration": None})
+        except Exception as e:
+            log(f"/stt error: {e}")
+            yield sse({"type": "error", "error": str(e)})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 # --- Twilio incoming call: give TwiML that points to websocket ---
-@app.api_route("/incoming-call", methods=["GET", "POST"])
-async def handle_incoming_call(request: Request):
+SESSION_TOKEN_PLACEHOLDER = "__SESSION_TOKEN__"
+
+@lru_cache(maxsize=1)
+def incoming_call_twiml():
+    """The /incoming-call response, built once; only the session token changes per call."""
     from twilio.twiml.voice_response import VoiceResponse, Connect
     response = VoiceResponse()
     response.say("Connecting you, please stay on line.")
     connect = Connect()
-    ws_url = f"wss://bdd2-2600-1702-7d20-1790-7569-cb79-4e79-22eb.ngrok-free.app/media-stream"
-    connect.stream(url=ws_url)
+    stream = connect.stream(url=MEDIA_STREAM_URL)
+    # Hand a pre-warmed realtime session to the media stream that is about to connect
+    stream.parameter(name="session", value=SESSION_TOKEN_PLACEHOLDER)
     response.append(connect)
-    log(f"Twilio incoming-call: returned TwiML with stream to {ws_url}")
-    return Response(content=str(response), media_type="application/xml")
+    return str(response)
+
+@app.api_route("/incoming-call", methods=["GET", "POST"])
+async def handle_incoming_call(request: Request):
+    twiml = incoming_call_twiml().replace(SESSION_TOKEN_PLACEHOLDER, realtime_pool.reserve())
+    log(f"Twilio incoming-call: returned TwiML with stream to {MEDIA_STREAM_URL}")
+    return Response(content=twiml, media_type="application/xml")
+
+# --- Realtime session config ---
+# Built once; sent to every realtime session as soon as it connects
+SESSION_UPDATE = json.dumps({
+    "type": "session.update",
+    "session": {
+        "turn_detection": {"type": "server_vad"},
+        "input_audio_format": "g711_ulaw",
+        "output_audio_format": "g711_ulaw",
+        "voice": VOICE,
+        "instructions": SYSTEM_MESSAGE,
+        "modalities": ["text", "audio"],
+        "temperature": 0.9,
+        "tools": tools.realtime_tools(),
+    }
+})
 
 # --- Twilio <Stream> media stream endpoint ---
 @app.websocket("/media-stream")
 async def media_stream(websocket: WebSocket):
     await websocket.accept()
     log("WebSocket: connection opened")
-    db = next(get_db())
-    openai_client = openai.OpenAI(api_key=OPENAI_API_KEY)
-    stream_sid = None
-
-    function_list = [
-        {
-            "type": "function", 
-            "name": "list_doctors",
-            "description": "Get a list of doctors by specialty.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "specialty": {
-                        "type": "string",
-                        "description": "Specialty of the doctor, e.g., 'cardiologist', 'pediatrician'."
-                    }
-                },
-                "required": ["specialty"]
-            }
-        },
-        {
-            "type": "function", 
-            "name": "cancel_appointment",
-            "description": "Cancel an appointment by appointment ID.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "appointment_id": {"type": "integer"}
-                },
-                "required": ["appointment_id"]
-            }
-        },
-        {
-            "type": "function", 
-            "name": "list_slots",
-            "description": "List available slots for a given doctor and optional date.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "doctor_id": {"type": "integer"},
-                    "date": {"type": "string", "description": "Date in YYYY-MM-DD format (optional)"}
-                },
-                "required": ["doctor_id"]
-            }
-        },
-        {
-            "type": "function", 
-            "name": "book_appointment",
-            "description": "Book an appointment for a user with a doctor at a given slot.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "doctor_id": {"type": "integer"},
-                    "slot_id": {"type": "integer"},
-                    "patient_name": {"type": "string"}
-                },
-                "required": ["doctor_id", "slot_id", "patient_name"]
-            }
-        }
-    ]
+    stream_sid_holder = {"sid": None}
 
-    async with websockets.connect(
-        'wss://api.openai.com/v1/realtime?model=gpt-4o-realtime-preview-2024-10-01',
-        additional_headers={
-            "Authorization": f"Bearer {OPENAI_API_KEY}",
-            "OpenAI-Beta": "realtime=v1"
-        }
-    ) as openai_ws:
-        # --- Start OpenAI session ---
-        await openai_ws.send(json.dumps({
-            "type": "session.update",
-            "session": {
-                "turn_detection": {"type": "server_vad"},
-                "input_audio_format": "g711_ulaw",
-                "output_audio_format": "g711_ulaw",
-                "voice": VOICE,
-                "instructions": SYSTEM_MESSAGE,
-                "modalities": ["text", "audio"],
-                "temperature": 0.9,
-                "tools": function_list,
-            }
-        }))
+    # Twilio sends "connected" then "start"; the start event carries the
+    # token of the realtime session reserved for us by /incoming-call
+    session_token = None
+    while True:
+        data = json.loads(await websocket.receive_text())
+        if data.get("event") == "start":
+            stream_sid_holder["sid"] = data["start"]["streamSid"]
+            session_token = data["start"].get("customParameters", {}).get("session")
+            log(f"Twilio stream started: {stream_sid_holder['sid']}")
+            break
+
+    async with realtime_pool.session(session_token) as openai_ws:
         log("OpenAI session started.")
         # --- Greet the user on call start ---
         await openai_ws.send(json.dumps({
@@ -223,177 +411,207 @@ async def media_stream(websocket: WebSocket):
             }
         }))
         await openai_ws.send(json.dumps({"type": "response.create"}))
-        stream_sid_holder = {"sid": None}
+
+        call_id = uuid.uuid4().hex
+        hub.set_state(call_id, "call-started")
+        trace = metrics.CallTrace(call_id)
+        frames_in = 0
+
+        def on_speaking(speaking):
+            if speaking:
+                trace.mark_first_audio()
+            trace.event("ai-speaking" if speaking else "ai-stop")
+            hub.set_state(call_id, "ai-speaking" if speaking else "ai-stop")
+
+        outbound = OutboundAudio(
+            websocket.send_json, lambda: stream_sid_holder["sid"], on_state=on_speaking,
+            send_text=websocket.send_text if MEDIA_RELAY_FAST else None
+        )
+        inbound = InboundRelay(openai_ws.send)
 
         async def receive_from_twilio():
+            nonlocal frames_in
             async for message in websocket.iter_text():
-                log(f"FROM_TWILIO: {message[:200]}")
-                data = json.loads(message)
-                event_type = data.get('event')
-                if event_type == 'start':
-                    stream_sid_holder['sid'] = data['start']['streamSid']
-                    log(f"Twilio stream started: {stream_sid_holder['sid']}")
-                elif event_type == 'media':
-                    audio_append = {
-                        "type": "input_audio_buffer.append",
-                        "audio": data['media']['payload']
-                    }
-                    await openai_ws.send(json.dumps(audio_append))
+                # Fast path: the payload is spliced into the append message without a json round-trip
+                payload = twilio_media_payload(message) if MEDIA_RELAY_FAST else None
+                event_type = 'media'
+                if payload is None:
+                    data = json.loads(message)
+                    event_type = data.get('event')
+                    if event_type == 'media':
+                        payload = data['media']['payload']
+                if event_type == 'media':
+                    # Media frames arrive at 50/s; count them instead of logging each one
+                    frames_in += 1
+                    metrics.frames_in_total.inc()
+                    log_rate("FROM_TWILIO media")
+                    await inbound.media(payload)
+                    continue
+                log(f"FROM_TWILIO: {message[:200]}", level="DEBUG")
+                await inbound.flush()
+                if event_type == 'mark':
+                    outbound.mark_played(data['mark']['name'])
                 elif event_type == 'stop':
                     log(f"Twilio stream stopped: {stream_sid_holder['sid']}")
                     break
 
+        tool_cache = ToolCache()
+        pending_calls = []  # tool calls of the response in progress
+        background = set()
+
+        def spawn(coro):
+            task = asyncio.create_task(coro)
+            background.add(task)
+            task.add_done_callback(background.discard)
+            return task
+
+        async def run_tool_call(event):
+            # Runs beside the receive loop so a slow query never stalls audio
+            name = event.get("name")
+            started = time.perf_counter()
+            result = await tools.call(name, event.get("arguments"), cache=tool_cache)
+            failed = isinstance(result, dict) and "error" in result
+            trace.event("tool_call", function=name, ms=round((time.perf_counter() - started) * 1000, 1), failed=failed)
+            log(f"Function {name} called with {event.get('arguments')}, result={result}")
+            return event.get("call_id"), result
+
+        async def reply_to_tools(batch):
+            # All calls from one response run in parallel; the model continues once it has every output
+            for call_id, result in await asyncio.gather(*batch):
+                await openai_ws.send(json.dumps({
+                    "type": "conversation.item.create",
+                    "item": {"type": "function_call_output", "call_id": call_id, "output": json.dumps(result)}
+                }))
+            await openai_ws.send(json.dumps({"type": "response.create"}))
+
         async def send_to_twilio():
             while True:
                 openai_message = await openai_ws.recv()
-                log(f"FROM_OPENAI: {openai_message[:200]}")
+                delta = audio_delta(openai_message) if MEDIA_RELAY_FAST else None
+                if delta is not None:
+                    log_rate("FROM_OPENAI response.audio.delta")
+                    outbound.push(*delta)
+                    continue
                 response = json.loads(openai_message)
-                # --- Function calling ---
-                if response.get("type") == "function_call":
-                    fn = response["function_call"]
-                    fn_name = fn["name"]
-                    fn_args = fn["arguments"]
-                    result = {}
-                    try:
-                        if fn_name == "list_doctors":
-                            specialty = fn_args.get("specialty", "")
-                            doctors = db.query(models.Doctor).filter(models.Doctor.specialty.ilike(f"%{specialty}%")).all()
-                            result = [
-                                {"id": d.id, "name": d.name, "specialty": d.specialty, "contact_info": d.contact_info}
-                                for d in doctors
-                            ]
-                        elif fn_name == "list_slots":
-                            doctor_id = fn_args["doctor_id"]
-                            date = fn_args.get("date")
-                            query = db.query(models.Slot).filter(
-                                models.Slot.doctor_id == doctor_id,
-                                models.Slot.is_booked == False
-                            )
-                            if date:
-                                from datetime import datetime
-                                day_start = datetime.fromisoformat(date)
-                                day_end = day_start.replace(hour=23, minute=59, second=59)
-                                query = query.filter(
-                                    models.Slot.start_time >= day_start,
-                                    models.Slot.start_time <= day_end
-                                )
-                            slots = query.all()
-                            result = [
-                                {"id": s.id, "start_time": str(s.start_time)}
-                                for s in slots
-                            ]
-                        elif fn_name == "cancel_appointment":
-                            appt_id = fn_args["appointment_id"]
-                            appt = db.query(models.Appointment).filter(models.Appointment.id == appt_id).first()
-                            if appt:
-                                db.delete(appt)
-                                db.commit()
-                                result = {"success": True}
-                            else:
-                                result = {"success": False, "reason": "Appointment not found"}
-                        elif fn_name == "book_appointment":
-                            doctor_id = fn_args["doctor_id"]
-                            slot_id = fn_args["slot_id"]
-                            patient_name = fn_args["patient_name"]
-                            appointment = crud.create_appointment(
-                                db, schemas.AppointmentCreate(
-                                    doctor_id=doctor_id,
-                                    slot_id=slot_id,
-                                    patient_name=patient_name
-                                )
-                            )
-                            if appointment:
-                                result = {
-                                    "success": True,
-                                    "appointment_id": appointment.id,
-                                    "doctor_id": doctor_id,
-                                    "slot_id": slot_id
-                                }
-                            else:
-                                result = {"success": False, "reason": "Slot not available"}
-                    except Exception as ex:
-                        result = {"error": str(ex)}
-                    log(f"Function {fn_name} called with {fn_args}, result={result}")
-                    await openai_ws.send(json.dumps({
-                        "type": "conversation.item.create",
-                        "item": {
-                            "type": "function",
-                            "name": fn_name,
-                            "content": json.dumps(result)
-                        }
-                    }))
-                # --- Send audio response to Twilio
+                if response.get("type") == "response.audio.delta":
+                    log_rate("FROM_OPENAI response.audio.delta")
+                else:
+                    log(f"FROM_OPENAI: {openai_message[:200]}", level="DEBUG")
+                # --- Function calling: start each call as soon as its arguments are complete ---
+                if response.get("type") == "response.function_call_arguments.done":
+                    pending_calls.append(spawn(run_tool_call(response)))
+                elif response.get("type") == "response.done" and pending_calls:
+                    batch = pending_calls[:]
+                    pending_calls.clear()
+                    spawn(reply_to_tools(batch))
+                # --- Queue audio for the paced sender; barge-in flushes it ---
                 if response.get("type") == "response.audio.delta" and "delta" in response:
-                    stream_sid = stream_sid_holder["sid"]
-                    if stream_sid:
-        
-                        audio_payload = response["delta"]
-                        await asyncio.gather(*[
-                            client.send_json({"type": "ai-speaking"}) for client in app.state.visualizer_clients
-                        ])
-
-
-                        await websocket.send_json({
-                            "event": "media",
-                            "streamSid": stream_sid,
-                            "media": {
-                                "track": "outbound",      
-                                "payload": audio_payload     
-                            }
-                        })
-                        await asyncio.sleep(0.5)
-                        await asyncio.gather(*[
-                            client.send_json({"type": "ai-stop"}) for client in app.state.visualizer_clients
-                        ])
+                    outbound.push(response.get("item_id"), response["delta"])
+                elif response.get("type") == "response.audio.done":
+                    outbound.end_of_response(response.get("item_id") or "response")
+                elif response.get("type") == "input_audio_buffer.speech_started":
+                    truncated = await outbound.clear()
+                    trace.event("barge_in", truncated=bool(truncated))
+                    if truncated:
+                        item_id, audio_end_ms = truncated
+                        await openai_ws.send(json.dumps({
+                            "type": "conversation.item.truncate",
+                            "item_id": item_id,
+                            "content_index": 0,
+                            "audio_end_ms": audio_end_ms
+                        }))
 
+        outbound.start()
+        metrics.active_calls.inc()
+        tasks = [asyncio.create_task(receive_from_twilio()), asyncio.create_task(send_to_twilio())]
         try:
-            await asyncio.gather(receive_from_twilio(), send_to_twilio())
+            # Either side finishing (Twilio "stop", or the model socket closing) ends the call
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
         except Exception as e:
             log(f"WebSocket session closed with error: {e}")
         finally:
+            tasks += list(background)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await outbound.stop()
+            metrics.active_calls.dec()
+            metrics.call_frames_in.observe(frames_in)
+            metrics.call_frames_out.observe(outbound.frames_sent)
+            trace.finish(frames_in=frames_in, frames_out=outbound.frames_sent)
+            hub.end_call(call_id)
             log("WebSocket: connection closed")
 
 
 @app.websocket("/ws-visualizer")
 async def visualizer_ws(websocket: WebSocket):
     await websocket.accept()
-    app.state.visualizer_clients.append(websocket)
+    sub = hub.subscribe(websocket)
     try:
         while True:
             await websocket.receive_text()
     except WebSocketDisconnect:
-        app.state.visualizer_clients.remove(websocket)
+        pass
+    finally:
+        await hub.unsubscribe(sub)
 
 
 @router.post("/chat")
-async def chat(request: ChatRequest, db: Session = Depends(get_db)):
-    messages = [msg.dict(exclude_unset=True) for msg in request.messages]
-    if messages[0]["role"] != "system":
-        system_prompt = {
-            "role": "system",
-            "content": SYSTEM_MESSAGE
-        }
-        messages = [system_prompt] + messages
-    FUNCTION_LIST = [
-    ]
-    client = openai.OpenAI(api_key=OPENAI_API_KEY)
+async def chat(request: ChatRequest):
+    session = None
+    if request.message is not None:
+        session = await chat_sessions.load(request.session_id) if request.session_id else None
+        if session is None:
+            session = ChatSession(request.session_id or uuid.uuid4().hex)
+        session.messages.append({"role": "user", "content": request.message})
+        session.compact()
+        messages = session.prompt(SYSTEM_MESSAGE)
+    elif request.messages:
+        messages = [msg.dict(exclude_unset=True) for msg in request.messages]
+        if messages[0]["role"] != "system":
+            system_prompt = {
+                "role": "system",
+                "content": SYSTEM_MESSAGE
+            }
+            messages = [system_prompt] + messages
+    else:
+        raise HTTPException(status_code=422, detail="Send `message` (with an optional `session_id`) or `messages`")
+
+    turn = []
+
+    async def finish(reply):
+        result = {"reply": reply}
+        if session is not None:
+            session.messages += turn
+            session.compact()
+            await chat_sessions.save(session)
+            result["session_id"] = session.id
+        return result
+
+    if request.stream:
+        async def events():
+            try:
+                async for event in run_chat(messages, turn):
+                    if event["type"] == "done":
+                        event.update(await finish(event["reply"]))
+                    yield sse(event)
+            except Exception as e:
+                log(f"/chat error: {e}")
+                yield sse({"type": "error", "error": str(e)})
+        return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
     try:
-        response = client.chat.completions.create(
-            model="gpt-4-0613",
-            messages=messages,
-            functions=FUNCTION_LIST,
-            function_call="auto",
-            max_tokens=256,
-            temperature=0.9
-        )
-        first_choice = response.choices[0]
-        if first_choice.finish_reason == "function_call":
-            fn = first_choice.message.function_call
-            fn_name = fn.name
-            fn_args = json.loads(fn.arguments)
-        return {"reply": first_choice.message.content}
+        async for event in run_chat(messages, turn):
+            if event["type"] == "done":
+                return await finish(event["reply"])
     except Exception as e:
         log(f"/chat error: {e}")
         return {"error": str(e)}
 
+@router.get("/chat/stats")
+async def chat_stats():
+    return chat_sessions.stats()
+
 app.include_router(router)
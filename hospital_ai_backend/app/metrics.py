@@ -0,0 +1,185 @@
+# app/metrics.py
+
+import os
+import json
+import time
+import asyncio
+import atexit
+from bisect import bisect_left
+from .logger import LogWriter
+
+# --- Config ---
+# Optional per-call trace spans, one JSON object per line; empty disables
+TRACE_FILE = os.getenv("TRACE_FILE", "")
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.1"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000)
+DEPTH_MS_BUCKETS = (0, 20, 60, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.values = {} if self.label_names else {(): 0}
+
+    def inc(self, n=1, **labels):
+        key = tuple(labels.get(l, "") for l in self.label_names)
+        self.values[key] = self.values.get(key, 0) + n
+
+    def samples(self):
+        for key, value in self.values.items():
+            yield self.name, _labels(self.label_names, key), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = tuple(labels.get(l, "") for l in self.label_names)
+        self.values[key] = value
+
+    def dec(self, n=1, **labels):
+        self.inc(-n, **labels)
+
+
+class CallbackGauge:
+    """Gauge whose value is read from `fn()` at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name, help, fn):
+        self.name, self.help, self.fn = name, help, fn
+
+    def samples(self):
+        yield self.name, "", self.fn()
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self.values = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(l, "") for l in self.label_names)
+        data = self.values.get(key)
+        if data is None:
+            data = self.values[key] = [0] * (len(self.buckets) + 2)
+        i = bisect_left(self.buckets, value)
+        if i < len(self.buckets):
+            data[i] += 1
+        data[-2] += value
+        data[-1] += 1
+
+    def samples(self):
+        for key, data in self.values.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets, data):
+                cumulative += n
+                labels = _labels(self.label_names + ("le",), key + (bound,))
+                yield f"{self.name}_bucket", labels, cumulative
+            yield f"{self.name}_bucket", _labels(self.label_names + ("le",), key + ("+Inf",)), data[-1]
+            yield f"{self.name}_sum", _labels(self.label_names, key), data[-2]
+            yield f"{self.name}_count", _labels(self.label_names, key), data[-1]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# --- Hot-path metrics ---
+tool_call_seconds = registry.register(Histogram(
+    "tool_call_duration_seconds", "Realtime/chat tool handler duration", ["function", "outcome"]))
+http_request_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "REST handler latency", ["method", "route", "status"]))
+call_frames_in = registry.register(Histogram(
+    "call_frames_in", "Inbound Twilio media frames per call", buckets=COUNT_BUCKETS))
+call_frames_out = registry.register(Histogram(
+    "call_frames_out", "Outbound media frames per call", buckets=COUNT_BUCKETS))
+frames_in_total = registry.register(Counter("frames_in_total", "Inbound Twilio media frames"))
+frames_out_total = registry.register(Counter("frames_out_total", "Outbound media frames sent to Twilio"))
+outbound_buffer_ms = registry.register(Histogram(
+    "outbound_buffer_depth_ms", "Outbound audio queued ahead of the pacer, sampled per delta",
+    buckets=DEPTH_MS_BUCKETS))
+event_loop_lag_seconds = registry.register(Histogram(
+    "event_loop_lag_seconds", "Delay of a periodic timer beyond its deadline"))
+time_to_first_audio_seconds = registry.register(Histogram(
+    "time_to_first_audio_seconds", "Call start to first outbound audio frame"))
+active_calls = registry.register(Gauge("active_calls", "Calls currently on /media-stream"))
+
+
+# --- Event-loop lag ---
+async def monitor_loop_lag(interval=LOOP_LAG_INTERVAL):
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        event_loop_lag_seconds.observe(max(0.0, loop.time() - started - interval))
+
+
+# --- Per-call trace spans ---
+# Every line of the trace file is JSON, dropped-record counts included
+trace_writer = LogWriter(path=TRACE_FILE, json_rates=True) if TRACE_FILE else None
+if trace_writer:
+    atexit.register(trace_writer.stop)
+
+
+class CallTrace:
+    """Collects span events for one call and writes them as a JSON line at hangup."""
+
+    def __init__(self, call_id):
+        self.call_id = call_id
+        self.started = time.monotonic()
+        self.started_at = time.time()
+        self.events = []
+        self.first_audio = None
+
+    def offset_ms(self):
+        return round((time.monotonic() - self.started) * 1000, 1)
+
+    def event(self, name, **fields):
+        if trace_writer:
+            self.events.append({"t_ms": self.offset_ms(), "event": name, **fields})
+
+    def mark_first_audio(self):
+        if self.first_audio is None:
+            self.first_audio = time.monotonic() - self.started
+            time_to_first_audio_seconds.observe(self.first_audio)
+            self.event("first_audio")
+
+    def finish(self, **fields):
+        self.event("hangup", **fields)
+        if trace_writer:
+            trace_writer.submit_raw(json.dumps({
+                "call_id": self.call_id, "started_at": self.started_at, "spans": self.events
+            }))
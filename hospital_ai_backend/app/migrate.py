@@ -0,0 +1,117 @@
+# app/migrate.py
+#
+# Creates missing tables/indexes and syncs the specialty lookup tables.
+# Run once per deploy, before starting workers:
+#     python -m app.migrate
+# Slots repeated by overlapping schedule runs block the unique
+# (doctor_id, start_time) constraint; list and then remove them with:
+#     python -m app.migrate --dedupe-slots [--apply]
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+from sqlalchemy import delete, exists, func, inspect, or_, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+from . import models
+from .database import SessionLocal, engine, create_schema
+from .specialties import sync_specialties
+from .logger import log
+
+# --- Config ---
+# Development convenience: migrate on every app startup (the old behaviour)
+DB_CREATE_SCHEMA = os.getenv("DB_CREATE_SCHEMA", "0") == "1"
+DEDUPE_PREVIEW_ROWS = 50
+
+
+def duplicate_slots(conn):
+    """Free slots that repeat another slot's doctor and start time.
+
+    Returns (rows that can go, doctor start times with several booked
+    copies). Of each repeated start time the booked copy, or else the
+    oldest, is kept; slots an appointment points at are never listed.
+    """
+    inspector = inspect(conn)
+    if not all(inspector.has_table(t) for t in (models.Slot.__tablename__, models.Appointment.__tablename__)):
+        return [], 0
+    Slot, other = models.Slot, aliased(models.Slot)
+    duplicate = exists().where(
+        other.doctor_id == Slot.doctor_id,
+        other.start_time == Slot.start_time,
+        other.id != Slot.id,
+        or_(other.is_booked == True, other.id < Slot.id),
+    )
+    rows = conn.execute(
+        select(Slot.id, Slot.doctor_id, Slot.start_time)
+        .where(Slot.is_booked == False, Slot.id.not_in(select(models.Appointment.slot_id)), duplicate)
+        .order_by(Slot.doctor_id, Slot.start_time, Slot.id)
+    ).all()
+    booked = conn.execute(select(func.count()).select_from(
+        select(Slot.doctor_id, Slot.start_time).filter(Slot.is_booked == True)
+        .group_by(Slot.doctor_id, Slot.start_time).having(func.count() > 1).subquery()
+    )).scalar_one()
+    return rows, booked
+
+
+async def dedupe_slots(apply=False):
+    """Print the duplicate slots; delete them only with `apply`. Returns the rows found."""
+    async with engine.begin() as conn:
+        rows, booked = await conn.run_sync(duplicate_slots)
+        for row in rows[:DEDUPE_PREVIEW_ROWS]:
+            print(f"slot {row.id}: doctor {row.doctor_id} at {row.start_time}")
+        if len(rows) > DEDUPE_PREVIEW_ROWS:
+            print(f"... and {len(rows) - DEDUPE_PREVIEW_ROWS} more")
+        if apply and rows:
+            ids = [row.id for row in rows]
+            for i in range(0, len(ids), 500):
+                await conn.execute(delete(models.Slot).where(models.Slot.id.in_(ids[i:i + 500])))
+            log(f"Deleted {len(rows)} duplicate slots")
+        else:
+            print(f"{len(rows)} duplicate free slots" + (" (dry run; add --apply to delete)" if rows else ""))
+        if booked:
+            print(f"{booked} doctor start times have several booked slots; resolve those by hand")
+    return rows
+
+
+async def migrate():
+    """Bring the schema up to date. Returns unique constraints left out because of existing duplicates."""
+    started = time.perf_counter()
+    async with engine.begin() as conn:
+        conflicts = await conn.run_sync(create_schema)
+        if not any(name == "uq_slots_doctor_start" for name, _ in conflicts):
+            # Superseded by the uq_slots_doctor_start unique index
+            await conn.execute(text("DROP INDEX IF EXISTS ix_slots_doctor_start"))
+    for name, groups in conflicts:
+        log(f"Migration: {name} not added, {groups} duplicate groups in the data. "
+            f"Review with `python -m app.migrate --dedupe-slots`", level="ERROR")
+    async with SessionLocal() as db:
+        try:
+            linked = await sync_specialties(db)
+        except IntegrityError:
+            # Another process seeded the same rows first; a second pass sees them
+            await db.rollback()
+            linked = await sync_specialties(db)
+    log(f"Migration done in {time.perf_counter() - started:.2f}s ({linked} doctor-specialty links added)")
+    return conflicts
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Create missing tables and indexes, sync specialties")
+    parser.add_argument("--dedupe-slots", action="store_true",
+                        help="list free slots repeating a doctor's start time (dry run)")
+    parser.add_argument("--apply", action="store_true", help="with --dedupe-slots: delete them, then migrate")
+    args = parser.parse_args()
+    try:
+        if args.dedupe_slots:
+            await dedupe_slots(apply=args.apply)
+            if not args.apply:
+                return 0
+        return 1 if await migrate() else 0
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -1,6 +1,6 @@
 # app/models.py
 
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, DateTime, Date, Time, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from .database import Base
 import datetime
@@ -16,6 +16,36 @@ class Doctor(Base):
 
     slots = relationship("Slot", back_populates="doctor", cascade="all, delete-orphan")
     appointments = relationship("Appointment", back_populates="doctor", cascade="all, delete-orphan")
+    schedule_rules = relationship("ScheduleRule", back_populates="doctor", cascade="all, delete-orphan")
+    specialties = relationship("Specialty", secondary="doctor_specialties", back_populates="doctors")
+
+class Specialty(Base):
+    __tablename__ = "specialties"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), nullable=False, unique=True)
+
+    synonyms = relationship("SpecialtySynonym", back_populates="specialty", cascade="all, delete-orphan")
+    doctors = relationship("Doctor", secondary="doctor_specialties", back_populates="specialties")
+
+class SpecialtySynonym(Base):
+    __tablename__ = "specialty_synonyms"
+
+    # Normalized (lower-case, single-spaced) phrase, e.g. "heart doctor"
+    term = Column(String(100), primary_key=True)
+    specialty_id = Column(Integer, ForeignKey("specialties.id"), nullable=False)
+
+    specialty = relationship("Specialty", back_populates="synonyms")
+
+class DoctorSpecialty(Base):
+    __tablename__ = "doctor_specialties"
+
+    doctor_id = Column(Integer, ForeignKey("doctors.id"), primary_key=True)
+    specialty_id = Column(Integer, ForeignKey("specialties.id"), primary_key=True)
+
+    __table_args__ = (
+        Index("ix_doctor_specialties_specialty", "specialty_id", "doctor_id"),
+    )
 
 class Slot(Base):
     __tablename__ = "slots"
@@ -28,6 +58,49 @@ class Slot(Base):
     doctor = relationship("Doctor", back_populates="slots")
     appointments = relationship("Appointment", back_populates="slot", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # One slot per doctor and start time; also serves per-doctor time lookups
+        UniqueConstraint("doctor_id", "start_time", name="uq_slots_doctor_start"),
+        # Partial index over free slots only, ordered by time, for cross-doctor searches
+        Index(
+            "ix_slots_free_start", "start_time", "doctor_id",
+            postgresql_where=(is_booked == False),
+            sqlite_where=(is_booked == False),
+        ),
+    )
+
+class ScheduleRule(Base):
+    __tablename__ = "schedule_rules"
+
+    id = Column(Integer, primary_key=True, index=True)
+    doctor_id = Column(Integer, ForeignKey("doctors.id"), nullable=False, index=True)
+    # Comma-separated ISO weekdays counted from Monday = 0, e.g. "0,1,2,3,4"
+    weekdays = Column(String(20), nullable=False)
+    start_time = Column(Time, nullable=False)
+    end_time = Column(Time, nullable=False)
+    slot_minutes = Column(Integer, nullable=False, default=15)
+    valid_from = Column(Date, nullable=False)
+    valid_until = Column(Date)
+    # Slots exist for every day before this one; rolling extension resumes here
+    generated_until = Column(Date)
+
+    doctor = relationship("Doctor", back_populates="schedule_rules")
+
+class ScheduleException(Base):
+    __tablename__ = "schedule_exceptions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    doctor_id = Column(Integer, ForeignKey("doctors.id"), nullable=False)
+    day = Column(Date, nullable=False)
+    # Both empty: the whole day is off
+    start_time = Column(Time)
+    end_time = Column(Time)
+    reason = Column(String(100))
+
+    __table_args__ = (
+        Index("ix_schedule_exceptions_doctor_day", "doctor_id", "day"),
+    )
+
 class Appointment(Base):
     __tablename__ = "appointments"
 
@@ -0,0 +1,123 @@
+# app/providers.py
+
+import os
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit, urlunsplit
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Config ---
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Point at a local fake server (e.g. http://127.0.0.1:9100/v1) for offline benchmarks
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+REALTIME_MODEL = os.getenv("REALTIME_MODEL", "gpt-4o-realtime-preview-2024-10-01")
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "20"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30"))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+
+# Per-endpoint concurrency limits and request timeouts (seconds)
+ENDPOINT_LIMITS = {
+    "chat": int(os.getenv("OPENAI_CHAT_CONCURRENCY", "32")),
+    "tts": int(os.getenv("OPENAI_TTS_CONCURRENCY", "16")),
+    "stt": int(os.getenv("OPENAI_STT_CONCURRENCY", "8")),
+}
+ENDPOINT_TIMEOUTS = {
+    "chat": float(os.getenv("OPENAI_CHAT_TIMEOUT", "30")),
+    "tts": float(os.getenv("OPENAI_TTS_TIMEOUT", "30")),
+    "stt": float(os.getenv("OPENAI_STT_TIMEOUT", "120")),
+}
+
+
+def realtime_url(base_url=OPENAI_BASE_URL, model=REALTIME_MODEL):
+    if not base_url:
+        return f"wss://api.openai.com/v1/realtime?model={model}"
+    parts = urlsplit(base_url)
+    scheme = "wss" if parts.scheme == "https" else "ws"
+    return urlunsplit((scheme, parts.netloc, parts.path.rstrip("/") + "/realtime", f"model={model}", ""))
+
+
+class Providers:
+    """Application-lifetime clients for the model provider.
+
+    One AsyncOpenAI client with a keep-alive connection pool is shared by
+    every endpoint. `limit(name)` bounds in-flight requests per endpoint and
+    `client_for(name)` applies that endpoint's timeout; retries with backoff
+    are handled by the SDK (`OPENAI_MAX_RETRIES`). The SDK is imported when
+    the client is first built, not with this module: it is a large share of
+    the app's import time.
+    """
+
+    def __init__(self, api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL,
+                 limits=ENDPOINT_LIMITS, timeouts=ENDPOINT_TIMEOUTS):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeouts = timeouts
+        self.semaphores = {name: asyncio.Semaphore(n) for name, n in limits.items()}
+        self.realtime_url = realtime_url(base_url)
+        self._client = None
+        # start() may run in a warmup thread while a request needs the client
+        self._start_lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            self.start()
+        return self._client
+
+    def start(self):
+        with self._start_lock:
+            if self._client is not None:
+                return
+            import httpx
+            import openai
+            http_client = openai.DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+                    keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(60.0, connect=OPENAI_CONNECT_TIMEOUT),
+            )
+            self._client = openai.AsyncOpenAI(
+                api_key=self.api_key or "offline",
+                base_url=self.base_url,
+                max_retries=OPENAI_MAX_RETRIES,
+                http_client=http_client,
+            )
+
+    def preload(self):
+        """Import the SDK and build the client and the resources the first chat/TTS/STT call would otherwise load."""
+        self.start()
+        client = self._client
+        client.chat.completions, client.audio.speech, client.audio.transcriptions
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    def client_for(self, name):
+        return self.client.with_options(timeout=self.timeouts.get(name, 60.0))
+
+    @asynccontextmanager
+    async def limit(self, name):
+        semaphore = self.semaphores.get(name)
+        if semaphore is None:
+            yield
+            return
+        async with semaphore:
+            yield
+
+    def realtime_headers(self):
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "OpenAI-Beta": "realtime=v1"
+        }
+
+
+providers = Providers()
@@ -0,0 +1,169 @@
+# app/realtime_pool.py
+
+import os
+import time
+import uuid
+import asyncio
+from contextlib import asynccontextmanager
+import websockets
+from websockets.protocol import State
+from .providers import providers
+from .logger import log
+
+# --- Config ---
+# Size this to the number of calls expected to start at about the same time
+REALTIME_POOL_SIZE = int(os.getenv("REALTIME_POOL_SIZE", "2"))
+# Realtime sessions are capped server-side; recycle idle ones well before that
+REALTIME_SESSION_MAX_AGE = float(os.getenv("REALTIME_SESSION_MAX_AGE", str(20 * 60)))
+REALTIME_RESERVATION_TTL = float(os.getenv("REALTIME_RESERVATION_TTL", "60"))
+REALTIME_POOL_INTERVAL = float(os.getenv("REALTIME_POOL_INTERVAL", "5"))
+
+
+class RealtimeSession:
+    def __init__(self, ws):
+        self.ws = ws
+        self.opened_at = time.monotonic()
+
+    def usable(self, max_age):
+        return self.ws.state is State.OPEN and time.monotonic() - self.opened_at < max_age
+
+    async def close(self):
+        try:
+            await self.ws.close()
+        except Exception:
+            pass
+
+
+class RealtimePool:
+    """Pre-connected, pre-configured realtime sessions.
+
+    A background task keeps `size` idle sessions open, each already sent the
+    `session.update` payload, and replaces them before they age out.
+    /incoming-call reserves one under a token that Twilio hands back in the
+    stream's start event; /media-stream then takes it over and only has to
+    request the greeting. With no warm session available, a fresh one is
+    connected exactly as before.
+    """
+
+    def __init__(self, size=REALTIME_POOL_SIZE, max_age=REALTIME_SESSION_MAX_AGE,
+                 reservation_ttl=REALTIME_RESERVATION_TTL, interval=REALTIME_POOL_INTERVAL):
+        self.size = size
+        self.max_age = max_age
+        self.reservation_ttl = reservation_ttl
+        self.interval = interval
+        self.session_update = None
+        self.idle = []
+        self.reserved = {}  # token -> (session, deadline)
+        self.counters = {"warm": 0, "cold": 0, "connect_errors": 0}
+        self._wake = asyncio.Event()
+        self._task = None
+
+    # --- Lifecycle ---
+    async def start(self, session_update):
+        self.session_update = session_update
+        if self.size > 0 and self._task is None:
+            self._task = asyncio.create_task(self._maintain())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        sessions = self.idle + [s for s, _ in self.reserved.values()]
+        self.idle, self.reserved = [], {}
+        await asyncio.gather(*(s.close() for s in sessions))
+
+    # --- Call side ---
+    def reserve(self):
+        """Set aside a warm session for a call that is about to connect."""
+        token = uuid.uuid4().hex
+        session = self._pop_idle()
+        if session:
+            self.reserved[token] = (session, time.monotonic() + self.reservation_ttl)
+            self._wake.set()
+        return token
+
+    @asynccontextmanager
+    async def session(self, token=None):
+        """Yield a configured realtime websocket for one call, closing it afterwards."""
+        session = None
+        if token in self.reserved:
+            session, deadline = self.reserved.pop(token)
+            if time.monotonic() > deadline or not session.usable(self.max_age):
+                await session.close()
+                session = None
+        if session is None:
+            session = self._pop_idle()
+        if session is None:
+            self.counters["cold"] += 1
+            session = await self._connect()
+        else:
+            self.counters["warm"] += 1
+        self._wake.set()
+        try:
+            yield session.ws
+        finally:
+            await session.close()
+
+    def stats(self):
+        return {**self.counters, "idle": len(self.idle), "reserved": len(self.reserved), "size": self.size}
+
+    # --- Pool maintenance ---
+    def _fresh(self, session):
+        # Recycle sessions a little before max_age so a call never gets a stale
+        # one; the same cutoff for handing out and for recycling, so the
+        # maintainer never closes a session a call could have taken
+        return session.usable(self.max_age - self.interval)
+
+    def _pop_idle(self):
+        while self.idle:
+            session = self.idle.pop()
+            if self._fresh(session):
+                return session
+            asyncio.create_task(session.close())
+        return None
+
+    async def _connect(self):
+        ws = await websockets.connect(providers.realtime_url, additional_headers=providers.realtime_headers())
+        if self.session_update:
+            await ws.send(self.session_update)
+        return RealtimeSession(ws)
+
+    async def _maintain(self):
+        while True:
+            try:
+                await self._refill()
+            except Exception as e:
+                # Keep maintaining; calls fall back to cold connects meanwhile
+                log(f"Realtime pool maintenance failed: {e!r}", level="ERROR")
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _refill(self):
+        # Detach expired reservations and stale sessions before awaiting
+        # anything: calls pop from both while the closes below are in progress
+        now = time.monotonic()
+        # Reserved but the call never arrived
+        stale = [self.reserved.pop(token)[0] for token, (_, deadline) in list(self.reserved.items()) if now > deadline]
+        stale += [s for s in self.idle if not self._fresh(s)]
+        self.idle = [s for s in self.idle if s not in stale]
+        for s in stale:
+            await s.close()
+        missing = self.size - len(self.idle)
+        if missing > 0:
+            results = await asyncio.gather(*(self._connect() for _ in range(missing)), return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    self.counters["connect_errors"] += 1
+                    log(f"Realtime pool connect failed: {result!r}")
+                else:
+                    self.idle.append(result)
+
+
+realtime_pool = RealtimePool()
@@ -0,0 +1,90 @@
+# app/relay.py
+
+import os
+import base64
+
+# --- Config ---
+# String-level relay of media frames; falls back to json for anything unexpected
+MEDIA_RELAY_FAST = os.getenv("MEDIA_RELAY_FAST", "1") == "1"
+# Inbound 20 ms frames per input_audio_buffer.append (1 = forward every frame)
+MEDIA_COALESCE_FRAMES = max(1, int(os.getenv("MEDIA_COALESCE_FRAMES", "1")))
+
+# Both compact and json.dumps-default spacing are accepted
+TWILIO_MEDIA_PREFIXES = ('{"event":"media"', '{"event": "media"')
+AUDIO_DELTA_PREFIXES = ('{"type":"response.audio.delta"', '{"type": "response.audio.delta"')
+
+APPEND_PREFIX = '{"type":"input_audio_buffer.append","audio":"'
+APPEND_SUFFIX = '"}'
+
+
+def string_field(message, key, start=0):
+    """Value of the first `"key": "..."` in `message`, without parsing it.
+
+    Only for values that cannot contain escaped quotes (base64, ids).
+    """
+    i = message.find(f'"{key}"', start)
+    if i < 0:
+        return None
+    i = message.find(":", i + len(key) + 2)
+    if i < 0:
+        return None
+    i = message.find('"', i + 1)
+    if i < 0:
+        return None
+    end = message.find('"', i + 1)
+    if end < 0:
+        return None
+    return message[i + 1:end]
+
+
+def twilio_media_payload(message):
+    """Base64 audio of a Twilio media event, or None for any other message."""
+    if not message.startswith(TWILIO_MEDIA_PREFIXES):
+        return None
+    return string_field(message, "payload")
+
+
+def audio_delta(message):
+    """(item_id, base64 audio) of a response.audio.delta event, or None."""
+    if not message.startswith(AUDIO_DELTA_PREFIXES):
+        return None
+    delta = string_field(message, "delta")
+    if delta is None:
+        return None
+    return string_field(message, "item_id"), delta
+
+
+def append_message(payload_b64):
+    return APPEND_PREFIX + payload_b64 + APPEND_SUFFIX
+
+
+def media_message_prefix(stream_sid):
+    return '{"event":"media","streamSid":"' + stream_sid + '","media":{"track":"outbound","payload":"'
+
+
+class InboundRelay:
+    """Forwards caller audio to the model, optionally coalescing frames.
+
+    With `coalesce_frames` > 1 the frames are decoded and re-encoded as one
+    larger append (base64 strings with padding cannot simply be joined),
+    trading up to (n - 1) * 20 ms of extra latency for n times fewer messages.
+    """
+
+    def __init__(self, send, coalesce_frames=MEDIA_COALESCE_FRAMES):
+        self.send = send
+        self.coalesce_frames = coalesce_frames
+        self.pending = []
+
+    async def media(self, payload_b64):
+        if self.coalesce_frames == 1:
+            await self.send(append_message(payload_b64))
+            return
+        self.pending.append(base64.b64decode(payload_b64))
+        if len(self.pending) >= self.coalesce_frames:
+            await self.flush()
+
+    async def flush(self):
+        if self.pending:
+            audio = b"".join(self.pending)
+            self.pending.clear()
+            await self.send(append_message(base64.b64encode(audio).decode()))
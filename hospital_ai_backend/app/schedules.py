@@ -0,0 +1,241 @@
+# app/schedules.py
+#
+# Expands recurring per-doctor availability rules into Slot rows.
+#     python -m app.schedules generate --start 2025-01-01 --end 2025-04-01
+#     python -m app.schedules extend --days 60
+
+import os
+import time
+import asyncio
+import argparse
+import datetime
+from collections import defaultdict
+from sqlalchemy import select, update, or_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from . import models
+from .database import engine
+from .logger import log
+from .slot_index import availability
+
+# --- Config ---
+# Rows per INSERT executemany and doctors per transaction
+SCHEDULE_BATCH_SIZE = int(os.getenv("SCHEDULE_BATCH_SIZE", "20000"))
+SCHEDULE_DOCTOR_CHUNK = int(os.getenv("SCHEDULE_DOCTOR_CHUNK", "50"))
+# Rolling extension keeps this many days of slots ahead of today
+SCHEDULE_HORIZON_DAYS = int(os.getenv("SCHEDULE_HORIZON_DAYS", "60"))
+
+DAY = datetime.timedelta(days=1)
+
+
+def parse_weekdays(weekdays):
+    return {int(d) for d in str(weekdays).split(",") if d.strip()}
+
+
+def format_weekdays(weekdays):
+    return ",".join(str(d) for d in sorted(set(weekdays)))
+
+
+def day_starts(rule):
+    """Slot start times within one day for `rule`, as offsets from midnight."""
+    step = datetime.timedelta(minutes=rule.slot_minutes)
+    start = datetime.timedelta(hours=rule.start_time.hour, minutes=rule.start_time.minute)
+    end = datetime.timedelta(hours=rule.end_time.hour, minutes=rule.end_time.minute)
+    offsets = []
+    while start + step <= end:
+        offsets.append(start)
+        start += step
+    return offsets
+
+
+def blocked(exception, start_time, slot_minutes):
+    if exception.start_time is None or exception.end_time is None:
+        return True
+    slot_end = (datetime.datetime.combine(datetime.date.min, start_time)
+                + datetime.timedelta(minutes=slot_minutes)).time()
+    return start_time < exception.end_time and exception.start_time < slot_end
+
+
+def expand(rules, exceptions, start, end):
+    """Slot start datetimes from `rules` over the days [start, end), minus `exceptions`.
+
+    Rules of one doctor may overlap; each start time is produced once.
+    """
+    off_days = defaultdict(list)
+    for exception in exceptions:
+        off_days[exception.day].append(exception)
+    starts = set()
+    for rule in rules:
+        weekdays = parse_weekdays(rule.weekdays)
+        offsets = day_starts(rule)
+        day = max(start, rule.valid_from)
+        last = min(end, rule.valid_until + DAY) if rule.valid_until else end
+        while day < last:
+            if day.weekday() in weekdays:
+                midnight = datetime.datetime.combine(day, datetime.time.min)
+                day_off = off_days.get(day)
+                if not day_off:
+                    starts.update(midnight + offset for offset in offsets)
+                else:
+                    starts.update(
+                        midnight + offset for offset in offsets
+                        if not any(blocked(e, (midnight + offset).time(), rule.slot_minutes) for e in day_off)
+                    )
+            day += DAY
+    return starts
+
+
+def insert_slots():
+    # (doctor_id, start_time) is unique; rows another run inserted first are skipped
+    dialect_insert = postgresql_insert if engine.dialect.name == "postgresql" else sqlite_insert
+    return dialect_insert(models.Slot).on_conflict_do_nothing(index_elements=["doctor_id", "start_time"])
+
+
+async def insert_rows(conn, rows, stats):
+    result = await conn.execute(insert_slots(), rows)
+    # Some drivers don't report executemany row counts
+    created = result.rowcount if result.rowcount >= 0 else len(rows)
+    stats["slots_created"] += created
+    stats["slots_existing"] += len(rows) - created
+
+
+def covered_until(rule, today):
+    """The day up to which `rule` already has all its slots."""
+    # Nothing is owed before the rule starts or before today
+    return rule.generated_until or max(rule.valid_from, today)
+
+
+async def generate(start, end, doctor_ids=None, batch_size=SCHEDULE_BATCH_SIZE, doctor_chunk=SCHEDULE_DOCTOR_CHUNK,
+                   today=None):
+    """Create the slots every rule implies on the days [start, end).
+
+    Idempotent: start times a doctor already has a slot for (booked or not)
+    are skipped, so re-running a window or overlapping windows adds nothing
+    twice. The unique (doctor_id, start_time) constraint makes that hold for
+    concurrent runs too: conflicting rows are ignored. Existing start times
+    are still read up front so a re-run doesn't send them all again. Rows go
+    in with executemany batches of `batch_size`, one transaction per
+    `doctor_chunk` doctors. Returns counts for the run.
+
+    A rule's `generated_until` only moves to `end` when the window starts
+    within its covered days; a window further ahead leaves a gap that
+    extend() still has to fill.
+    """
+    started = time.perf_counter()
+    today = today or datetime.date.today()
+    stats = {"doctors": 0, "rules": 0, "slots_created": 0, "slots_existing": 0}
+    if end <= start:
+        return {**stats, "seconds": 0.0}
+    window_start = datetime.datetime.combine(start, datetime.time.min)
+    window_end = datetime.datetime.combine(end, datetime.time.min)
+
+    async with engine.connect() as conn:
+        query = select(models.ScheduleRule).filter(
+            models.ScheduleRule.valid_from < end,
+            or_(models.ScheduleRule.valid_until == None, models.ScheduleRule.valid_until >= start),
+        )
+        if doctor_ids is not None:
+            query = query.filter(models.ScheduleRule.doctor_id.in_(doctor_ids))
+        rules = defaultdict(list)
+        for rule in (await conn.execute(query)).all():
+            rules[rule.doctor_id].append(rule)
+    doctors = sorted(rules)
+
+    for i in range(0, len(doctors), doctor_chunk):
+        chunk = doctors[i:i + doctor_chunk]
+        async with engine.begin() as conn:
+            exceptions = defaultdict(list)
+            for exception in (await conn.execute(select(models.ScheduleException).filter(
+                models.ScheduleException.doctor_id.in_(chunk),
+                models.ScheduleException.day >= start,
+                models.ScheduleException.day < end,
+            ))).all():
+                exceptions[exception.doctor_id].append(exception)
+            existing = defaultdict(set)
+            for doctor_id, start_time in (await conn.execute(select(models.Slot.doctor_id, models.Slot.start_time).filter(
+                models.Slot.doctor_id.in_(chunk),
+                models.Slot.start_time >= window_start,
+                models.Slot.start_time < window_end,
+            ))).all():
+                existing[doctor_id].add(start_time)
+
+            rows = []
+            for doctor_id in chunk:
+                starts = expand(rules[doctor_id], exceptions[doctor_id], start, end)
+                new = starts - existing[doctor_id]
+                stats["slots_existing"] += len(starts) - len(new)
+                for start_time in sorted(new):
+                    rows.append({"doctor_id": doctor_id, "start_time": start_time, "is_booked": False})
+                    if len(rows) >= batch_size:
+                        await insert_rows(conn, rows, stats)
+                        rows = []
+            if rows:
+                await insert_rows(conn, rows, stats)
+
+            rule_ids = [rule.id for doctor_id in chunk for rule in rules[doctor_id]]
+            contiguous = [
+                rule.id for doctor_id in chunk for rule in rules[doctor_id]
+                if start <= covered_until(rule, today) < end
+            ]
+            if contiguous:
+                # Re-checked in SQL in case another run moved the mark meanwhile
+                await conn.execute(
+                    update(models.ScheduleRule)
+                    .where(models.ScheduleRule.id.in_(contiguous),
+                           or_(models.ScheduleRule.generated_until == None,
+                               (models.ScheduleRule.generated_until >= start)
+                               & (models.ScheduleRule.generated_until < end)))
+                    .values(generated_until=end)
+                )
+        for doctor_id in chunk:
+            availability.invalidate(doctor_id)
+        stats["doctors"] += len(chunk)
+        stats["rules"] += len(rule_ids)
+
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    log(f"Schedule generate {start}..{end}: {stats}")
+    return stats
+
+
+async def extend(days=SCHEDULE_HORIZON_DAYS, doctor_ids=None, today=None):
+    """Rolling extension: bring every rule's slots up to `days` ahead of today.
+
+    Generation starts at the earliest `generated_until` (or today) among the
+    rules, so a daily run only writes the newly uncovered days.
+    """
+    today = today or datetime.date.today()
+    end = today + datetime.timedelta(days=days)
+    async with engine.connect() as conn:
+        query = select(models.ScheduleRule.generated_until)
+        if doctor_ids is not None:
+            query = query.filter(models.ScheduleRule.doctor_id.in_(doctor_ids))
+        marks = (await conn.execute(query)).scalars().all()
+    start = min((mark or today for mark in marks), default=today)
+    return await generate(max(start, today), end, doctor_ids, today=today)
+
+
+# --- CLI ---
+async def main():
+    parser = argparse.ArgumentParser(description="Generate doctor slots from schedule rules")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("generate", help="create slots for a date window")
+    run.add_argument("--start", type=datetime.date.fromisoformat, required=True)
+    run.add_argument("--end", type=datetime.date.fromisoformat, required=True, help="exclusive")
+    run.add_argument("--doctor", type=int, action="append", dest="doctor_ids")
+    roll = commands.add_parser("extend", help="keep slots generated N days ahead of today")
+    roll.add_argument("--days", type=int, default=SCHEDULE_HORIZON_DAYS)
+    roll.add_argument("--doctor", type=int, action="append", dest="doctor_ids")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "generate":
+            stats = await generate(args.start, args.end, args.doctor_ids)
+        else:
+            stats = await extend(args.days, args.doctor_ids)
+        print(stats)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
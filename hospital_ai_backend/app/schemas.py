@@ -1,8 +1,8 @@
 # app/schemas.py
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator, model_validator
 from typing import Optional, List
-from datetime import datetime
+from datetime import datetime, date, time
 
 class SlotBase(BaseModel):
     id: int
@@ -10,7 +10,7 @@ class SlotBase(BaseModel):
     is_booked: bool
 
     class Config:
-        orm_mode = True
+        from_attributes = True
 
 class DoctorBase(BaseModel):
     id: int
@@ -18,12 +18,18 @@ class DoctorBase(BaseModel):
     specialty: str
     description: Optional[str] = None
     contact_info: Optional[str] = None
-    # For listing slots with doctor (optional)
+    # Only filled when asked for with include=slots
     slots: Optional[List[SlotBase]] = None
 
     class Config:
         from_attributes = True
 
+class SlotOut(SlotBase):
+    doctor_id: int
+
+class BatchIds(BaseModel):
+    ids: List[int] = Field(min_length=1, max_length=500)
+
 
 class AppointmentBase(BaseModel):
     id: int
@@ -34,7 +40,16 @@ class AppointmentBase(BaseModel):
     created_at: datetime
 
     class Config:
-        orm_mode = True
+        from_attributes = True
+
+class AvailableSlot(BaseModel):
+    id: int
+    start_time: datetime
+    doctor_id: int
+    doctor_name: str
+
+    class Config:
+        from_attributes = True
 
 # Schemas for creating new appointments (requests)
 class AppointmentCreate(BaseModel):
@@ -48,4 +63,82 @@ class ChatMessage(BaseModel):
     name: Optional[str] = None  
 
 class ChatRequest(BaseModel):
-    messages: List[ChatMessage]
\ No newline at end of file
+    # Either the new `message` of a server-side session (omit `session_id` to
+    # start one), or a full `messages` list for stateless use
+    session_id: Optional[str] = None
+    message: Optional[str] = None
+    messages: Optional[List[ChatMessage]] = None
+    # Server-sent events: token, status (while a tool runs), then done
+    stream: bool = False
+
+# --- Schedules ---
+class ScheduleRuleCreate(BaseModel):
+    # ISO weekdays, Monday = 0
+    weekdays: List[int] = Field(min_length=1)
+    start_time: time
+    end_time: time
+    slot_minutes: int = Field(15, ge=5, le=240)
+    valid_from: date
+    valid_until: Optional[date] = None
+
+    @field_validator("weekdays")
+    @classmethod
+    def check_weekdays(cls, weekdays):
+        if any(d < 0 or d > 6 for d in weekdays):
+            raise ValueError("weekdays are 0 (Monday) to 6 (Sunday)")
+        return sorted(set(weekdays))
+
+    @model_validator(mode="after")
+    def check_hours(self):
+        if self.end_time <= self.start_time:
+            raise ValueError("end_time must be after start_time")
+        if self.valid_until and self.valid_until < self.valid_from:
+            raise ValueError("valid_until must not be before valid_from")
+        return self
+
+class ScheduleRuleOut(ScheduleRuleCreate):
+    id: int
+    doctor_id: int
+    generated_until: Optional[date] = None
+
+    @field_validator("weekdays", mode="before")
+    @classmethod
+    def split_weekdays(cls, weekdays):
+        if isinstance(weekdays, str):
+            return [int(d) for d in weekdays.split(",") if d]
+        return weekdays
+
+    class Config:
+        from_attributes = True
+
+class ScheduleExceptionCreate(BaseModel):
+    day: date
+    # Leave both empty to block the whole day
+    start_time: Optional[time] = None
+    end_time: Optional[time] = None
+    reason: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_hours(self):
+        if (self.start_time is None) != (self.end_time is None):
+            raise ValueError("give both start_time and end_time, or neither for the whole day")
+        if self.start_time is not None and self.end_time <= self.start_time:
+            raise ValueError("end_time must be after start_time")
+        return self
+
+class ScheduleExceptionOut(ScheduleExceptionCreate):
+    id: int
+    doctor_id: int
+
+    class Config:
+        from_attributes = True
+
+class ScheduleGenerate(BaseModel):
+    start: date
+    # Exclusive
+    end: date
+    doctor_ids: Optional[List[int]] = None
+
+class ScheduleExtend(BaseModel):
+    days: int = Field(60, ge=1, le=730)
+    doctor_ids: Optional[List[int]] = None
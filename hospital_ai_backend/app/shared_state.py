@@ -0,0 +1,301 @@
+# app/shared_state.py
+
+import os
+import json
+import time
+import sqlite3
+import asyncio
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from .logger import log
+
+# --- Config ---
+# Empty: state lives in this process (single worker). sqlite:///path/to/file.db:
+# shared by every worker/process on the machine that points at the same file.
+SHARED_STATE_URL = os.getenv("SHARED_STATE_URL", "")
+SHARED_STATE_POLL_INTERVAL = float(os.getenv("SHARED_STATE_POLL_INTERVAL", "0.05"))
+# Published events are kept this long for workers that poll late
+SHARED_STATE_EVENT_RETENTION = float(os.getenv("SHARED_STATE_EVENT_RETENTION", "60"))
+
+
+# --- In-process backend ---
+class MemoryTable:
+    """Key -> JSON-able value with LRU eviction, idle-TTL expiry and a size cap.
+
+    Values are stored serialized, as in SQLiteTable, so callers always get a
+    copy: changing a loaded value has no effect until it is set again.
+    """
+
+    def __init__(self, max_entries, max_bytes, idle_ttl):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.entries = OrderedDict()  # key -> (value, size, last used)
+        self.bytes = 0
+        self.counters = {"created": 0, "expired": 0, "evicted": 0}
+
+    async def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        value, size, last_used = entry
+        now = time.monotonic()
+        if now - last_used > self.idle_ttl:
+            self._drop(key)
+            self.counters["expired"] += 1
+            return None
+        # A read counts as use: keep the entry alive and at the young end
+        self.entries[key] = (value, size, now)
+        self.entries.move_to_end(key)
+        return json.loads(value)
+
+    async def set(self, key, value, size):
+        value = json.dumps(value)
+        old = self.entries.pop(key, None)
+        if old is None:
+            self.counters["created"] += 1
+        else:
+            self.bytes -= old[1]
+        self.entries[key] = (value, size, time.monotonic())
+        self.bytes += size
+        self._evict()
+
+    async def delete(self, key):
+        self._drop(key)
+
+    def _drop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+
+    def _evict(self):
+        now = time.monotonic()
+        # Oldest first: stop at the first entry that is still fresh
+        while self.entries:
+            key, (_, _, last_used) = next(iter(self.entries.items()))
+            if now - last_used <= self.idle_ttl:
+                break
+            self._drop(key)
+            self.counters["expired"] += 1
+        while len(self.entries) > 1 and (len(self.entries) > self.max_entries or self.bytes > self.max_bytes):
+            self._drop(next(iter(self.entries)))
+            self.counters["evicted"] += 1
+
+    def stats(self):
+        return {**self.counters, "entries": len(self.entries), "bytes": self.bytes}
+
+
+class MemoryState:
+    """Single-process shared state: tables are dicts, publish calls listeners directly."""
+
+    def __init__(self):
+        self.listeners = defaultdict(list)
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def table(self, name, max_entries, max_bytes, idle_ttl):
+        return MemoryTable(max_entries, max_bytes, idle_ttl)
+
+    def subscribe(self, channel, callback):
+        """Call `callback(event)` on the event loop for every event on `channel`."""
+        self.listeners[channel].append(callback)
+
+    def publish(self, channel, event):
+        for callback in self.listeners[channel]:
+            callback(event)
+
+
+# --- Multi-process backend (SQLite file) ---
+class SQLiteTable:
+    def __init__(self, state, name, max_entries, max_bytes, idle_ttl):
+        self.state = state
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.counters = {"created": 0, "expired": 0, "evicted": 0}
+        self.entries = 0  # as of the last write from this process
+        self.bytes = 0
+
+    async def get(self, key):
+        return await self.state.run(self._get, key)
+
+    async def set(self, key, value, size):
+        await self.state.run(self._set, key, json.dumps(value), size)
+
+    async def delete(self, key):
+        await self.state.run(self._delete, key)
+
+    def stats(self):
+        return {**self.counters, "entries": self.entries, "bytes": self.bytes}
+
+    # --- Executor thread ---
+    def _get(self, db, key):
+        row = db.execute("SELECT value, last_used FROM kv WHERE ns = ? AND key = ?", (self.name, key)).fetchone()
+        if row is None:
+            return None
+        if time.time() - row[1] > self.idle_ttl:
+            self._delete(db, key)
+            self.counters["expired"] += 1
+            return None
+        return json.loads(row[0])
+
+    def _set(self, db, key, value, size):
+        with db:
+            created = db.execute(
+                "SELECT 1 FROM kv WHERE ns = ? AND key = ?", (self.name, key)
+            ).fetchone() is None
+            db.execute(
+                "INSERT OR REPLACE INTO kv (ns, key, value, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                (self.name, key, value, size, time.time())
+            )
+            self.counters["created"] += created
+            self._evict(db)
+
+    def _delete(self, db, key):
+        with db:
+            db.execute("DELETE FROM kv WHERE ns = ? AND key = ?", (self.name, key))
+
+    def _evict(self, db):
+        expired = db.execute(
+            "DELETE FROM kv WHERE ns = ? AND last_used < ?", (self.name, time.time() - self.idle_ttl)
+        ).rowcount
+        self.counters["expired"] += expired
+        entries, total = db.execute(
+            "SELECT count(*), coalesce(sum(size), 0) FROM kv WHERE ns = ?", (self.name,)
+        ).fetchone()
+        if entries > self.max_entries or total > self.max_bytes:
+            # Least recently written first, until both caps hold (always keep the newest)
+            victims = []
+            for key, size in db.execute(
+                "SELECT key, size FROM kv WHERE ns = ? ORDER BY last_used LIMIT ?", (self.name, entries - 1)
+            ):
+                if entries <= self.max_entries and total <= self.max_bytes:
+                    break
+                victims.append((self.name, key))
+                entries -= 1
+                total -= size
+            db.executemany("DELETE FROM kv WHERE ns = ? AND key = ?", victims)
+            self.counters["evicted"] += len(victims)
+        self.entries, self.bytes = entries, total
+
+
+class SQLiteState:
+    """Shared state for several worker processes on one machine, through a SQLite file.
+
+    Tables are rows in a `kv` table. `publish` appends to an `events` table
+    (batched by a writer task) and every process polls it, so events reach
+    subscribers in all workers within about one poll interval. All SQLite
+    calls run on one executor thread per process.
+    """
+
+    def __init__(self, path, poll_interval=SHARED_STATE_POLL_INTERVAL, retention=SHARED_STATE_EVENT_RETENTION):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.listeners = defaultdict(list)
+        self.outbox = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-state")
+        self.db = None
+        self.last_id = 0
+        self._tasks = []
+
+    async def run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, self.db, *args)
+
+    async def start(self):
+        if self.db is not None:
+            return
+        self.db = await asyncio.get_running_loop().run_in_executor(self.executor, self._open)
+        self.last_id = await self.run(lambda db: db.execute("SELECT coalesce(max(id), 0) FROM events").fetchone()[0])
+        self._tasks = [asyncio.create_task(self._write()), asyncio.create_task(self._poll())]
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.db is not None:
+            await self.run(lambda db: db.close())
+            self.db = None
+
+    def table(self, name, max_entries, max_bytes, idle_ttl):
+        return SQLiteTable(self, name, max_entries, max_bytes, idle_ttl)
+
+    def subscribe(self, channel, callback):
+        self.listeners[channel].append(callback)
+
+    def publish(self, channel, event):
+        self.outbox.put_nowait((channel, json.dumps(event)))
+
+    # --- Background tasks ---
+    def _open(self):
+        db = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        with db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS kv (ns TEXT, key TEXT, value TEXT, size INTEGER, last_used REAL, "
+                "PRIMARY KEY (ns, key))"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS ix_kv_ns_last_used ON kv (ns, last_used)")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "channel TEXT, payload TEXT, created REAL)"
+            )
+        return db
+
+    async def _write(self):
+        while True:
+            batch = [await self.outbox.get()]
+            while not self.outbox.empty():
+                batch.append(self.outbox.get_nowait())
+            now = time.time()
+            try:
+                await self.run(self._insert_events, [(channel, payload, now) for channel, payload in batch])
+            except Exception as e:
+                log(f"Shared state publish failed: {e!r}", level="ERROR")
+
+    def _insert_events(self, db, rows):
+        with db:
+            db.executemany("INSERT INTO events (channel, payload, created) VALUES (?, ?, ?)", rows)
+
+    async def _poll(self):
+        last_prune = time.monotonic()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                rows = await self.run(self._fetch_events, self.last_id)
+                if time.monotonic() - last_prune > self.retention / 4:
+                    last_prune = time.monotonic()
+                    await self.run(self._prune_events)
+            except Exception as e:
+                log(f"Shared state poll failed: {e!r}", level="ERROR")
+                continue
+            for event_id, channel, payload in rows:
+                self.last_id = event_id
+                event = json.loads(payload)
+                for callback in self.listeners[channel]:
+                    callback(event)
+
+    def _fetch_events(self, db, after):
+        return db.execute("SELECT id, channel, payload FROM events WHERE id > ? ORDER BY id", (after,)).fetchall()
+
+    def _prune_events(self, db):
+        with db:
+            db.execute("DELETE FROM events WHERE created < ?", (time.time() - self.retention,))
+
+
+def create_state(url=SHARED_STATE_URL):
+    if not url:
+        return MemoryState()
+    if url.startswith("sqlite:///"):
+        return SQLiteState(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported SHARED_STATE_URL: {url}")
+
+
+shared_state = create_state()
@@ -0,0 +1,173 @@
+# app/slot_index.py
+
+import os
+import time
+import asyncio
+import datetime
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import NamedTuple
+from sqlalchemy import select
+from . import models
+
+# --- Config ---
+SLOT_INDEX_TTL = float(os.getenv("SLOT_INDEX_TTL", "30"))
+SLOT_INDEX_MAX_DOCTORS = int(os.getenv("SLOT_INDEX_MAX_DOCTORS", "1000"))
+SLOT_INDEX_HORIZON_DAYS = int(os.getenv("SLOT_INDEX_HORIZON_DAYS", "60"))
+
+
+class FreeSlot(NamedTuple):
+    id: int
+    start_time: datetime.datetime
+    is_booked: bool = False
+
+
+class DoctorSlots:
+    """Free slots of one doctor inside [window_start, window_end), sorted by start time."""
+
+    def __init__(self, window_start, window_end, rows):
+        self.window_start = window_start
+        self.window_end = window_end
+        self.keys = sorted((start_time, slot_id) for slot_id, start_time in rows)
+        self.by_id = {slot_id: start_time for start_time, slot_id in self.keys}
+        self.loaded_at = time.monotonic()
+
+    def covers(self, start, end):
+        return self.window_start <= start and end <= self.window_end
+
+    def between(self, start, end):
+        lo = bisect_left(self.keys, (start, 0))
+        hi = bisect_left(self.keys, (end, 0))
+        return [FreeSlot(slot_id, start_time) for start_time, slot_id in self.keys[lo:hi]]
+
+    def first(self, after, k):
+        lo = bisect_left(self.keys, (after, 0))
+        return [FreeSlot(slot_id, start_time) for start_time, slot_id in self.keys[lo:lo + k]]
+
+    def remove(self, slot_id):
+        start_time = self.by_id.pop(slot_id, None)
+        if start_time is None:
+            return
+        i = bisect_left(self.keys, (start_time, slot_id))
+        if i < len(self.keys) and self.keys[i] == (start_time, slot_id):
+            del self.keys[i]
+
+    def add(self, slot_id, start_time):
+        if slot_id in self.by_id or not (self.window_start <= start_time < self.window_end):
+            return
+        self.by_id[slot_id] = start_time
+        insort(self.keys, (start_time, slot_id))
+
+
+class SlotIndex:
+    """In-process, per-doctor availability index.
+
+    Doctors are loaded on first use, kept in an LRU capped at `max_doctors`,
+    and reloaded once older than `ttl` seconds so changes made outside this
+    process show up. Bookings and cancellations made through `crud` update
+    the loaded entries in place.
+    """
+
+    def __init__(self, ttl=SLOT_INDEX_TTL, max_doctors=SLOT_INDEX_MAX_DOCTORS, horizon_days=SLOT_INDEX_HORIZON_DAYS):
+        self.ttl = ttl
+        self.max_doctors = max_doctors
+        self.horizon = datetime.timedelta(days=horizon_days)
+        self._entries = OrderedDict()
+        self._locks = {}
+        self._generation = {}
+
+    # --- Reads ---
+    async def free_slots(self, db, doctor_id, day):
+        """Free slots on `day`, or None if the day is outside the indexed window."""
+        entry = await self._entry(db, doctor_id)
+        start = datetime.datetime.combine(day, datetime.time.min)
+        end = start + datetime.timedelta(days=1)
+        if not entry.covers(start, end):
+            return None
+        return entry.between(start, end)
+
+    async def next_free(self, db, doctor_id, k, after=None):
+        entry = await self._entry(db, doctor_id)
+        after = max(after or datetime.datetime.now(), entry.window_start)
+        if after >= entry.window_end:
+            return None
+        slots = entry.first(after, k)
+        # Fewer than k inside the window: later slots may exist beyond it
+        return slots if len(slots) == k else None
+
+    # --- Write-through ---
+    def mark_booked(self, doctor_id, slot_id):
+        self._bump(doctor_id)
+        entry = self._entries.get(doctor_id)
+        if entry:
+            entry.remove(slot_id)
+
+    def mark_free(self, doctor_id, slot_id, start_time):
+        self._bump(doctor_id)
+        entry = self._entries.get(doctor_id)
+        if entry:
+            entry.add(slot_id, start_time)
+
+    def invalidate(self, doctor_id=None):
+        doctor_ids = set(self._entries) | set(self._locks) if doctor_id is None else [doctor_id]
+        for doctor_id in doctor_ids:
+            self._entries.pop(doctor_id, None)
+            self._forget(doctor_id)
+
+    # --- Loading ---
+    def _bump(self, doctor_id):
+        # Only doctors with a lock can have a load in flight that needs to
+        # notice the change; anyone else is read fresh on first use anyway
+        if doctor_id in self._locks:
+            self._generation[doctor_id] = self._generation.get(doctor_id, 0) + 1
+
+    def _forget(self, doctor_id):
+        # A load in progress still needs its lock and generation; it stores an
+        # entry when done, and that entry's eviction forgets them
+        lock = self._locks.get(doctor_id)
+        if lock is not None and not lock.locked():
+            del self._locks[doctor_id]
+            self._generation.pop(doctor_id, None)
+
+    def _fresh(self, entry):
+        return entry is not None and time.monotonic() - entry.loaded_at < self.ttl
+
+    async def _entry(self, db, doctor_id):
+        entry = self._entries.get(doctor_id)
+        if self._fresh(entry):
+            self._entries.move_to_end(doctor_id)
+            return entry
+        lock = self._locks.setdefault(doctor_id, asyncio.Lock())
+        async with lock:
+            entry = self._entries.get(doctor_id)
+            if self._fresh(entry):
+                return entry
+            entry = await self._load(db, doctor_id)
+            self._entries[doctor_id] = entry
+            self._entries.move_to_end(doctor_id)
+            while len(self._entries) > self.max_doctors:
+                evicted, _ = self._entries.popitem(last=False)
+                self._forget(evicted)
+            return entry
+
+    async def _load(self, db, doctor_id):
+        generation = self._generation.get(doctor_id, 0)
+        window_start = datetime.datetime.combine(datetime.date.today(), datetime.time.min)
+        window_end = window_start + self.horizon
+        result = await db.execute(
+            select(models.Slot.id, models.Slot.start_time).filter(
+                models.Slot.doctor_id == doctor_id,
+                models.Slot.is_booked == False,
+                models.Slot.start_time >= window_start,
+                models.Slot.start_time < window_end,
+            )
+        )
+        entry = DoctorSlots(window_start, window_end, result.all())
+        if self._generation.get(doctor_id, 0) != generation:
+            # A booking or cancel landed while we were reading; serve this
+            # snapshot once but reload on the next request
+            entry.loaded_at = 0.0
+        return entry
+
+
+availability = SlotIndex()
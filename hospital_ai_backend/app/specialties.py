@@ -0,0 +1,98 @@
+# app/specialties.py
+
+import re
+from sqlalchemy import select, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models
+
+# Canonical specialty -> phrases callers use for it. Stored normalized in
+# specialty_synonyms; the canonical name itself is always a synonym too.
+DEFAULT_SYNONYMS = {
+    "Cardiology": ["cardiologist", "cardiac", "heart", "heart doctor", "heart specialist"],
+    "Pediatrics": ["pediatrician", "paediatrician", "paediatrics", "child doctor", "kids doctor", "children"],
+    "Dermatology": ["dermatologist", "skin", "skin doctor"],
+    "Neurology": ["neurologist", "brain", "nerve doctor"],
+    "Orthopedics": ["orthopedist", "orthopaedics", "orthopedic", "bone doctor", "bones", "joints"],
+    "General Medicine": ["general practitioner", "gp", "family doctor", "primary care", "physician"],
+    "Gynecology": ["gynecologist", "gynaecologist", "obgyn", "women's health"],
+    "ENT": ["ear nose throat", "ent specialist", "otolaryngology"],
+    "Ophthalmology": ["ophthalmologist", "eye doctor", "eyes"],
+    "Psychiatry": ["psychiatrist", "mental health"],
+}
+
+
+def normalize(term):
+    return re.sub(r"\s+", " ", re.sub(r"[^a-z0-9' ]", " ", (term or "").lower())).strip()
+
+
+async def sync_specialties(db: AsyncSession, synonyms=DEFAULT_SYNONYMS):
+    """Idempotently load the specialty/synonym tables and link doctors to them.
+
+    Doctors are linked by resolving their free-text `specialty` column, so
+    rows created out-of-band are picked up on the next sync.
+    """
+    existing = {s.name: s.id for s in (await db.execute(select(models.Specialty))).scalars()}
+    for name in synonyms:
+        if name not in existing:
+            specialty = models.Specialty(name=name)
+            db.add(specialty)
+            await db.flush()
+            existing[name] = specialty.id
+
+    known_terms = set((await db.execute(select(models.SpecialtySynonym.term))).scalars())
+    new_terms = {}
+    for name, terms in synonyms.items():
+        for term in [name, *terms]:
+            term = normalize(term)
+            if term and term not in known_terms and term not in new_terms:
+                new_terms[term] = existing[name]
+    if new_terms:
+        await db.execute(insert(models.SpecialtySynonym), [
+            {"term": term, "specialty_id": specialty_id} for term, specialty_id in new_terms.items()
+        ])
+
+    term_map = dict((await db.execute(
+        select(models.SpecialtySynonym.term, models.SpecialtySynonym.specialty_id)
+    )).all())
+    linked = set((await db.execute(
+        select(models.DoctorSpecialty.doctor_id, models.DoctorSpecialty.specialty_id)
+    )).all())
+    links = []
+    for doctor_id, specialty in (await db.execute(select(models.Doctor.id, models.Doctor.specialty))).all():
+        specialty_id = match(term_map, specialty)
+        if specialty_id and (doctor_id, specialty_id) not in linked:
+            links.append({"doctor_id": doctor_id, "specialty_id": specialty_id})
+    if links:
+        await db.execute(insert(models.DoctorSpecialty), links)
+    await db.commit()
+    return len(links)
+
+
+def match(term_map, phrase):
+    """Exact synonym match first, then the longest synonym contained in the phrase."""
+    phrase = normalize(phrase)
+    if phrase in term_map:
+        return term_map[phrase]
+    padded = f" {phrase} "
+    best = None
+    for term, specialty_id in term_map.items():
+        if f" {term} " in padded and (best is None or len(term) > len(best[0])):
+            best = (term, specialty_id)
+    return best[1] if best else None
+
+
+async def resolve_specialty(db: AsyncSession, phrase):
+    """Map a caller's phrase ("heart doctor") to a specialty id, or None."""
+    term = normalize(phrase)
+    if not term:
+        return None
+    specialty_id = (await db.execute(
+        select(models.SpecialtySynonym.specialty_id).filter(models.SpecialtySynonym.term == term)
+    )).scalar_one_or_none()
+    if specialty_id is not None:
+        return specialty_id
+    # The synonym table is small; fall back to substring matching in Python
+    term_map = dict((await db.execute(
+        select(models.SpecialtySynonym.term, models.SpecialtySynonym.specialty_id)
+    )).all())
+    return match(term_map, term)
@@ -0,0 +1,263 @@
+# app/stt.py
+
+import os
+import sys
+import struct
+import asyncio
+from array import array
+from collections import deque
+from operator import mul
+from typing import NamedTuple
+
+# --- Config ---
+# Segments end at the first long-enough silence after MIN seconds, and are
+# cut regardless at MAX seconds
+STT_SEGMENT_MIN_SECONDS = float(os.getenv("STT_SEGMENT_MIN_SECONDS", "15"))
+STT_SEGMENT_MAX_SECONDS = float(os.getenv("STT_SEGMENT_MAX_SECONDS", "30"))
+STT_SILENCE_MS = int(os.getenv("STT_SILENCE_MS", "400"))
+# RMS below this (16-bit sample scale) counts as silence
+STT_VAD_THRESHOLD = float(os.getenv("STT_VAD_THRESHOLD", "300"))
+# Segments transcribed at once per request; twice as many may wait in memory
+STT_WORKERS = int(os.getenv("STT_WORKERS", "4"))
+STT_READ_CHUNK = int(os.getenv("STT_READ_CHUNK", str(256 * 1024)))
+
+FRAME_MS = 20
+# Every Nth sample is enough to tell speech from silence
+VAD_STRIDE = 4
+MAX_HEADER_BYTES = 64 * 1024
+
+
+def ulaw_to_linear(u):
+    # G.711 mu-law decode to a signed 16-bit sample
+    u = ~u & 0xFF
+    exponent = (u >> 4) & 0x07
+    sample = ((((u & 0x0F) << 3) + 0x84) << exponent) - 0x84
+    return -sample if u & 0x80 else sample
+
+
+ULAW_TO_LINEAR = [ulaw_to_linear(u) for u in range(256)]
+ULAW_SQUARES = [s * s for s in ULAW_TO_LINEAR]
+
+
+class AudioFormat(NamedTuple):
+    encoding: str  # "pcm16" or "mulaw"
+    sample_rate: int = 8000
+    channels: int = 1
+
+    @property
+    def block_bytes(self):
+        return self.channels * (2 if self.encoding == "pcm16" else 1)
+
+    @property
+    def bytes_per_second(self):
+        return self.sample_rate * self.block_bytes
+
+
+class Segment(NamedTuple):
+    start: float  # seconds from the start of the recording
+    end: float
+    audio: bytes  # in the input encoding, without a header
+
+
+def parse_wav_header(data):
+    """(AudioFormat, offset of the samples) for a WAV file, or None if `data` is too short to tell.
+
+    Raises ValueError for anything other than PCM16 or mu-law WAV, malformed
+    headers included.
+    """
+    if len(data) < 12:
+        return None
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        raise ValueError("not a WAV file")
+    pos, fmt = 12, None
+    while True:
+        if len(data) < pos + 8:
+            return None
+        chunk_id, size = data[pos:pos + 4], int.from_bytes(data[pos + 4:pos + 8], "little")
+        if chunk_id == b"data":
+            if fmt is None:
+                raise ValueError("WAV data before fmt chunk")
+            return fmt, pos + 8
+        if len(data) < pos + 8 + size:
+            return None
+        if chunk_id == b"fmt ":
+            if size < 16:
+                raise ValueError(f"WAV fmt chunk too short ({size} bytes)")
+            try:
+                audio_format, channels, rate = struct.unpack_from("<HHI", data, pos + 8)
+                bits = struct.unpack_from("<H", data, pos + 22)[0]
+                if audio_format == 0xFFFE and size >= 40:  # WAVE_FORMAT_EXTENSIBLE
+                    audio_format = struct.unpack_from("<H", data, pos + 32)[0]
+            except struct.error as e:
+                raise ValueError(f"malformed WAV fmt chunk: {e}") from None
+            if not channels or not rate:
+                raise ValueError("WAV fmt chunk without channels or sample rate")
+            if audio_format == 1 and bits == 16:
+                fmt = AudioFormat("pcm16", rate, channels)
+            elif audio_format == 7 and bits == 8:
+                fmt = AudioFormat("mulaw", rate, channels)
+            else:
+                raise ValueError(f"unsupported WAV encoding {audio_format}/{bits}-bit")
+        pos += 8 + size + (size & 1)
+
+
+def to_wav(audio, fmt):
+    """A PCM16 WAV file of `audio`; mu-law is decoded, since every transcriber reads PCM."""
+    if fmt.encoding == "mulaw":
+        samples = array("h", map(ULAW_TO_LINEAR.__getitem__, audio))
+        if sys.byteorder == "big":
+            samples.byteswap()
+        audio = samples.tobytes()
+    block = fmt.channels * 2
+    header = b"RIFF" + struct.pack("<I", 36 + len(audio)) + b"WAVE" + b"fmt " + struct.pack(
+        "<IHHIIHH", 16, 1, fmt.channels, fmt.sample_rate, fmt.sample_rate * block, block, 16
+    ) + b"data" + struct.pack("<I", len(audio))
+    return header + audio
+
+
+class Segmenter:
+    """Cuts a stream of samples into speech segments at silences (energy VAD).
+
+    Audio is judged in 20 ms frames by mean energy. A segment ends once it is
+    at least `min_seconds` long and `silence_ms` of silence has passed, or at
+    `max_seconds`; segments without a single voiced frame are dropped. Only
+    the current segment is held in memory.
+    """
+
+    def __init__(self, fmt, min_seconds=STT_SEGMENT_MIN_SECONDS, max_seconds=STT_SEGMENT_MAX_SECONDS,
+                 silence_ms=STT_SILENCE_MS, threshold=STT_VAD_THRESHOLD):
+        self.fmt = fmt
+        self.frame_bytes = max(1, fmt.sample_rate * FRAME_MS // 1000) * fmt.block_bytes
+        self.min_bytes = int(min_seconds * fmt.bytes_per_second)
+        self.max_bytes = int(max_seconds * fmt.bytes_per_second)
+        self.silence_frames = max(1, silence_ms // FRAME_MS)
+        self.threshold_sq = threshold * threshold
+        self.pending = b""  # trailing partial frame
+        self.segment = bytearray()
+        self.offset = 0  # bytes before the current segment
+        self.voiced = False
+        self.silent_run = 0
+
+    def energy(self, frame):
+        if self.fmt.encoding == "mulaw":
+            samples = frame[::VAD_STRIDE]
+            return sum(map(ULAW_SQUARES.__getitem__, samples)) / len(samples)
+        samples = frame.cast("h")[::VAD_STRIDE]
+        return sum(map(mul, samples, samples)) / len(samples)
+
+    def feed(self, chunk):
+        """Add samples; returns the segments they completed."""
+        data = memoryview(self.pending + chunk if self.pending else chunk)
+        usable = len(data) - len(data) % self.frame_bytes
+        done = []
+        start = 0  # of the current segment's part inside `data`
+        for pos in range(0, usable, self.frame_bytes):
+            end = pos + self.frame_bytes
+            if self.energy(data[pos:end]) < self.threshold_sq:
+                self.silent_run += 1
+            else:
+                self.silent_run = 0
+                self.voiced = True
+            size = len(self.segment) + end - start
+            if size >= self.max_bytes or (size >= self.min_bytes and self.silent_run >= self.silence_frames):
+                self.segment += data[start:end]
+                segment = self._cut()
+                if segment:
+                    done.append(segment)
+                start = end
+        self.segment += data[start:usable]
+        self.pending = bytes(data[usable:])
+        return done
+
+    def flush(self):
+        self.segment += self.pending
+        self.pending = b""
+        segment = self._cut()
+        return [segment] if segment else []
+
+    def _cut(self):
+        bps = self.fmt.bytes_per_second
+        segment = None
+        if self.voiced and self.segment:
+            start = self.offset / bps
+            segment = Segment(round(start, 2), round(start + len(self.segment) / bps, 2), bytes(self.segment))
+        self.offset += len(self.segment)
+        self.segment = bytearray()
+        self.voiced = False
+        self.silent_run = 0
+        return segment
+
+
+async def open_audio(upload, fmt=None):
+    """Read the start of `upload`: (AudioFormat, first samples). ValueError if it can't be segmented."""
+    head = await upload.read(STT_READ_CHUNK)
+    if fmt is not None:
+        return fmt, head
+    while True:
+        parsed = parse_wav_header(head)
+        if parsed is not None:
+            fmt, offset = parsed
+            return fmt, head[offset:]
+        more = await upload.read(STT_READ_CHUNK)
+        if not more or len(head) > MAX_HEADER_BYTES:
+            raise ValueError("truncated WAV header")
+        head += more
+
+
+async def transcribe_stream(upload, fmt, head, transcribe, workers=STT_WORKERS):
+    """Segment `upload` chunk by chunk and transcribe segments concurrently.
+
+    `transcribe(wav_bytes, index)` returns the text of one segment. Yields
+    {"type": "segment", "index", "start", "end", "text"} events in order
+    (with "error" instead of "text" if that segment failed), then
+    {"type": "done", "text", "segments", "duration"}. At most `2 * workers`
+    segments are held at once, whatever the length of the upload.
+    """
+    segmenter = Segmenter(fmt)
+    semaphore = asyncio.Semaphore(workers)
+    in_flight = deque()
+    texts = []
+
+    async def run(index, segment):
+        event = {"type": "segment", "index": index, "start": segment.start, "end": segment.end}
+        async with semaphore:
+            try:
+                wav = await asyncio.to_thread(to_wav, segment.audio, fmt)
+                event["text"] = (await transcribe(wav, index)).strip()
+            except Exception as e:
+                event["error"] = str(e)
+        return event
+
+    def finished(event):
+        if event.get("text"):
+            texts.append(event["text"])
+        return event
+
+    index = 0
+    chunk = head
+    # A client that disconnects closes this generator at any yield; stop the
+    # transcriptions nobody will read so they free their provider slots
+    try:
+        while True:
+            segments = await asyncio.to_thread(segmenter.feed, chunk) if chunk else segmenter.flush()
+            for segment in segments:
+                in_flight.append(asyncio.create_task(run(index, segment)))
+                index += 1
+            # Hand back what is done, in order; wait when the window is full
+            while in_flight and (in_flight[0].done() or len(in_flight) >= 2 * workers):
+                yield finished(await in_flight.popleft())
+            if not chunk:
+                break
+            chunk = await upload.read(STT_READ_CHUNK)
+
+        while in_flight:
+            yield finished(await in_flight.popleft())
+    finally:
+        for task in in_flight:
+            task.cancel()
+    yield {
+        "type": "done",
+        "text": " ".join(texts),
+        "segments": index,
+        "duration": round(segmenter.offset / fmt.bytes_per_second, 2),
+    }
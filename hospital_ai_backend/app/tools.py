@@ -0,0 +1,282 @@
+# app/tools.py
+
+import os
+import json
+import time
+import asyncio
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel, Field, ValidationError
+from . import crud, schemas, metrics
+from .database import SessionLocal
+from .logger import log
+
+# --- Config ---
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "5"))
+# Read-only results are reused within one call for this long
+TOOL_CACHE_TTL = float(os.getenv("TOOL_CACHE_TTL", "30"))
+
+
+class Tool:
+    def __init__(self, name, description, args_model, handler, timeout=TOOL_TIMEOUT, read_only=False,
+                 status=None):
+        self.name = name
+        self.description = description
+        self.args_model = args_model
+        self.handler = handler
+        self.timeout = timeout
+        self.read_only = read_only
+        self.status = status or f"Running {name}"
+
+    def parameters(self):
+        """JSON schema for the arguments, trimmed to what the function-calling APIs expect."""
+        schema = self.args_model.model_json_schema()
+        properties = {}
+        for name, prop in schema.get("properties", {}).items():
+            prop = {k: v for k, v in prop.items() if k not in ("title", "default")}
+            # Optional[X] comes out as anyOf [X, null]; the model only needs X
+            variants = [v for v in prop.pop("anyOf", []) if v.get("type") != "null"]
+            if len(variants) == 1:
+                prop.update(variants[0])
+            properties[name] = prop
+        return {"type": "object", "properties": properties, "required": schema.get("required", [])}
+
+
+class ToolCache:
+    """Per-call cache of read-only tool results; cleared whenever a call writes."""
+
+    def __init__(self, ttl=TOOL_CACHE_TTL):
+        self.ttl = ttl
+        self.entries = {}  # (name, args json) -> (expires, result)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    def put(self, key, result):
+        self.entries[key] = (time.monotonic() + self.ttl, result)
+
+    def clear(self):
+        self.entries.clear()
+
+
+class ToolRegistry:
+    """Tools the assistant can call, keyed by name.
+
+    Each tool declares a pydantic model for its arguments and an async
+    handler taking (db, args). `call()` parses and validates the raw
+    arguments, runs the handler in its own DB session under the tool's
+    timeout, and never raises: failures come back as {"error": ...} so the
+    model can recover. Write tools are never cancelled, since they may
+    commit after the deadline; they finish in the background and the model
+    is told their outcome is unknown. The same table generates the function
+    list for the realtime session and for /chat.
+    """
+
+    def __init__(self):
+        self.tools = {}
+        self.background = set()  # write calls still finishing after their timeout
+
+    def tool(self, name, description, args_model, timeout=TOOL_TIMEOUT, read_only=False, status=None):
+        def register(handler):
+            self.tools[name] = Tool(name, description, args_model, handler, timeout, read_only, status)
+            return handler
+        return register
+
+    # --- Function lists ---
+    def realtime_tools(self):
+        return [
+            {"type": "function", "name": t.name, "description": t.description, "parameters": t.parameters()}
+            for t in self.tools.values()
+        ]
+
+    def chat_tools(self):
+        return [
+            {"type": "function",
+             "function": {"name": t.name, "description": t.description, "parameters": t.parameters()}}
+            for t in self.tools.values()
+        ]
+
+    def status(self, name):
+        """Short progress text shown to chat clients while a tool runs."""
+        tool = self.tools.get(name)
+        return tool.status if tool else "Working on it"
+
+    # --- Dispatch ---
+    async def call(self, name, arguments, cache=None):
+        started = time.perf_counter()
+        result, outcome = await self._call(name, arguments, cache)
+        # Model-supplied names go into a label; keep unknown ones from growing the series count
+        label = name if name in self.tools else "unknown"
+        metrics.tool_call_seconds.observe(time.perf_counter() - started, function=label, outcome=outcome)
+        return result
+
+    async def _call(self, name, arguments, cache):
+        tool = self.tools.get(name)
+        if tool is None:
+            return {"error": f"Unknown tool: {name}"}, "unknown"
+        try:
+            if isinstance(arguments, str):
+                arguments = json.loads(arguments or "{}")
+            args = tool.args_model.model_validate(arguments)
+        except (ValueError, ValidationError) as e:
+            return {"error": f"Invalid arguments for {name}: {e}"}, "invalid"
+
+        key = (name, args.model_dump_json())
+        if cache is not None and tool.read_only:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached, "cached"
+        try:
+            if tool.read_only:
+                # Each call gets its own short-lived session so the pooled connection
+                # goes back to the pool as soon as the call returns, even if the caller hangs up
+                async with SessionLocal() as db:
+                    result = await asyncio.wait_for(tool.handler(db, args), tool.timeout)
+            else:
+                task = asyncio.create_task(self._write(tool, args))
+                self.background.add(task)
+                task.add_done_callback(self._finished)
+                # Shielded: a timeout (or the caller hanging up) mid-commit must
+                # not cancel the write, or a committed booking is reported failed
+                result = await asyncio.wait_for(asyncio.shield(task), tool.timeout)
+        except asyncio.TimeoutError:
+            if tool.read_only:
+                log(f"Tool {name} timed out after {tool.timeout}s", level="WARNING")
+                return {"error": f"{name} timed out"}, "timeout"
+            log(f"Tool {name} still running after {tool.timeout}s; finishing in the background", level="WARNING")
+            if cache is not None:
+                cache.clear()
+            return {
+                "error": f"{name} did not finish within {tool.timeout:g}s and its outcome is unknown; "
+                         "it may still have succeeded. Check before trying again.",
+                "outcome": "unknown",
+            }, "unconfirmed"
+        except Exception as e:
+            log(f"Tool {name} failed: {e!r}", level="ERROR")
+            return {"error": str(e)}, "error"
+        if cache is not None:
+            if tool.read_only:
+                cache.put(key, result)
+            else:
+                cache.clear()
+        return result, "ok"
+
+
+    def _finished(self, task):
+        self.background.discard(task)
+        if not task.cancelled():
+            task.exception()  # logged by _write if nobody was waiting any more
+
+    async def _write(self, tool, args):
+        started = time.perf_counter()
+        try:
+            async with SessionLocal() as db:
+                result = await tool.handler(db, args)
+        except Exception as e:
+            if time.perf_counter() - started > tool.timeout:
+                log(f"Tool {tool.name} failed after its timeout: {e!r}", level="ERROR")
+            raise
+        if time.perf_counter() - started > tool.timeout:
+            log(f"Tool {tool.name} finished after its timeout: {result}", level="WARNING")
+        return result
+
+
+tools = ToolRegistry()
+
+
+# --- Tools ---
+class ListDoctorsArgs(BaseModel):
+    specialty: str = Field(description="Specialty of the doctor, e.g., 'cardiologist', 'pediatrician'.")
+
+
+@tools.tool("list_doctors", "Get a list of doctors by specialty.", ListDoctorsArgs, read_only=True,
+            status="Looking up doctors")
+async def list_doctors(db, args):
+    doctors = await crud.search_doctors(db, args.specialty)
+    return [
+        {"id": d.id, "name": d.name, "specialty": d.specialty, "contact_info": d.contact_info}
+        for d in doctors
+    ]
+
+
+class GetDoctorArgs(BaseModel):
+    doctor_id: int
+
+
+@tools.tool("get_doctor", "Get a doctor's details (name, specialty, description, contact) by ID.",
+            GetDoctorArgs, read_only=True, status="Looking up the doctor")
+async def get_doctor(db, args):
+    doctor = await crud.get_doctor(db, args.doctor_id)
+    if doctor is None:
+        return {"success": False, "reason": "Doctor not found"}
+    return {
+        "id": doctor.id, "name": doctor.name, "specialty": doctor.specialty,
+        "description": doctor.description, "contact_info": doctor.contact_info
+    }
+
+
+class ListSlotsArgs(BaseModel):
+    doctor_id: int
+    date: Optional[str] = Field(None, description="Date in YYYY-MM-DD format (optional)")
+
+
+@tools.tool("list_slots", "List available slots for a given doctor and optional date.",
+            ListSlotsArgs, read_only=True, status="Checking the schedule")
+async def list_slots(db, args):
+    slots = await crud.get_doctor_slots(db, args.doctor_id, args.date)
+    return [{"id": s.id, "start_time": str(s.start_time)} for s in slots]
+
+
+class FindNextAvailableArgs(BaseModel):
+    specialty: str = Field(description="Specialty or plain description, e.g. 'cardiology', 'skin doctor'.")
+    start: Optional[datetime] = Field(None, description="Earliest start, ISO datetime (optional, defaults to now)")
+    end: Optional[datetime] = Field(None, description="Latest start, ISO datetime (optional)")
+    limit: int = Field(5, ge=1, le=50, description="How many slots to return (default 5)")
+
+
+@tools.tool("find_next_available",
+            "Find the earliest free slots across all doctors of a specialty. Accepts everyday phrases like 'heart doctor'.",
+            FindNextAvailableArgs, read_only=True, status="Finding the earliest openings")
+async def find_next_available(db, args):
+    rows = await crud.find_next_available(db, args.specialty, args.start, args.end, args.limit)
+    if rows is None:
+        return {"success": False, "reason": "Unknown specialty"}
+    return [
+        {"slot_id": r.id, "start_time": str(r.start_time), "doctor_id": r.doctor_id, "doctor_name": r.doctor_name}
+        for r in rows
+    ]
+
+
+class BookAppointmentArgs(BaseModel):
+    doctor_id: int
+    slot_id: int
+    patient_name: str
+
+
+@tools.tool("book_appointment", "Book an appointment for a user with a doctor at a given slot.",
+            BookAppointmentArgs, timeout=TOOL_TIMEOUT * 2, status="Booking the appointment")
+async def book_appointment(db, args):
+    appointment = await crud.create_appointment(db, schemas.AppointmentCreate(**args.model_dump()))
+    if appointment:
+        return {
+            "success": True,
+            "appointment_id": appointment.id,
+            "doctor_id": args.doctor_id,
+            "slot_id": args.slot_id
+        }
+    return {"success": False, "reason": "Slot not available"}
+
+
+class CancelAppointmentArgs(BaseModel):
+    appointment_id: int
+
+
+@tools.tool("cancel_appointment", "Cancel an appointment by appointment ID.",
+            CancelAppointmentArgs, timeout=TOOL_TIMEOUT * 2, status="Cancelling the appointment")
+async def cancel_appointment(db, args):
+    if await crud.cancel_appointment(db, args.appointment_id):
+        return {"success": True}
+    return {"success": False, "reason": "Appointment not found"}
@@ -0,0 +1,287 @@
+# app/tts_cache.py
+
+import os
+import json
+import asyncio
+import hashlib
+from collections import Counter, OrderedDict
+from fastapi.responses import FileResponse
+from .logger import log
+
+# --- Config ---
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", ".tts_cache")
+TTS_CACHE_MEMORY_BYTES = int(os.getenv("TTS_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+TTS_CACHE_MEMORY_ITEM_BYTES = int(os.getenv("TTS_CACHE_MEMORY_ITEM_BYTES", str(512 * 1024)))
+TTS_CACHE_DISK_BYTES = int(os.getenv("TTS_CACHE_DISK_BYTES", str(512 * 1024 * 1024)))
+
+MEDIA_TYPES = {
+    "mp3": "audio/mpeg",
+    "opus": "audio/ogg",
+    "aac": "audio/aac",
+    "flac": "audio/flac",
+    "wav": "audio/wav",
+    "pcm": "audio/L16",
+}
+
+
+def cache_key(text, voice, model, fmt):
+    raw = json.dumps([text, voice, model, fmt], ensure_ascii=False)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class Fill:
+    """One in-flight upstream request, shared by every concurrent miss for its key."""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.changed = asyncio.Condition()
+
+    async def publish(self, chunk=None, done=False, error=None):
+        async with self.changed:
+            if chunk:
+                self.chunks.append(chunk)
+            self.done = self.done or done
+            self.error = self.error or error
+            self.changed.notify_all()
+
+    async def wait_started(self):
+        async with self.changed:
+            await self.changed.wait_for(lambda: self.chunks or self.done)
+        if self.error and not self.chunks:
+            raise self.error
+
+    async def stream(self):
+        i = 0
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(lambda: len(self.chunks) > i or self.done)
+                pending = self.chunks[i:]
+                finished = self.done
+            for chunk in pending:
+                yield chunk
+            i += len(pending)
+            if finished and i >= len(self.chunks):
+                if self.error:
+                    raise self.error
+                return
+
+
+class CachedFileResponse(FileResponse):
+    """Sends a disk hit, keeping the file from being evicted until it is sent."""
+
+    def __init__(self, cache, key, path, **kwargs):
+        super().__init__(path, **kwargs)
+        self.cache = cache
+        self.key = key
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.cache.release(self.key)
+
+
+class TTSCache:
+    """Two-tier cache for synthesized speech keyed by (text, voice, model, format).
+
+    Small clips live in an in-memory LRU; everything is also written to disk
+    under a size budget and served from there as a file. Misses stream
+    upstream audio to the client while it is being written, and concurrent
+    misses for the same key share one upstream request.
+    """
+
+    def __init__(self, directory=TTS_CACHE_DIR, memory_bytes=TTS_CACHE_MEMORY_BYTES,
+                 memory_item_bytes=TTS_CACHE_MEMORY_ITEM_BYTES, disk_bytes=TTS_CACHE_DISK_BYTES):
+        self.directory = directory
+        self.memory_budget = memory_bytes
+        self.memory_item_bytes = memory_item_bytes
+        self.disk_budget = disk_bytes
+        self.memory = OrderedDict()  # key -> bytes
+        self.memory_bytes = 0
+        self.disk = None  # key -> size, in LRU order; loaded lazily
+        self.disk_bytes = 0
+        self.inflight = {}
+        self.tasks = set()  # running fills, referenced so they aren't garbage-collected
+        self.readers = Counter()  # key -> disk hits still being sent
+        self.evicted_while_read = set()  # their files go when the last reader is done
+        self._index_lock = asyncio.Lock()
+        self.counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "collapsed_misses": 0,
+            "upstream_errors": 0,
+            "bytes_saved": 0,
+            "upstream_bytes": 0,
+        }
+
+    # --- Lookup ---
+    def path(self, key, fmt):
+        return os.path.join(self.directory, f"{key}.{fmt}")
+
+    def get_memory(self, key):
+        data = self.memory.get(key)
+        if data is not None:
+            self.memory.move_to_end(key)
+            self.counters["memory_hits"] += 1
+            self.counters["bytes_saved"] += len(data)
+        return data
+
+    async def get_disk(self, key, fmt):
+        """Path of the cached file, or None. A hit must be handed back with `release(key)`."""
+        await self._load_disk_index()
+        size = self.disk.get(key)
+        if size is None:
+            return None
+        path = self.path(key, fmt)
+        if not await asyncio.to_thread(os.path.exists, path):
+            self._forget_disk(key)
+            return None
+        self.disk.move_to_end(key)
+        self.readers[key] += 1
+        self.counters["disk_hits"] += 1
+        self.counters["bytes_saved"] += size
+        return path
+
+    def response(self, key, path, media_type):
+        return CachedFileResponse(self, key, path, media_type=media_type)
+
+    async def release(self, key):
+        self.readers[key] -= 1
+        if self.readers[key] > 0:
+            return
+        del self.readers[key]
+        if key in self.evicted_while_read:
+            self.evicted_while_read.discard(key)
+            # Unless a fill has cached it again meanwhile
+            if key not in self.disk and key not in self.inflight:
+                await asyncio.to_thread(self._remove_files, [key])
+
+    def fill(self, key, fmt, upstream):
+        """Return the shared Fill for `key`, starting `upstream()` if none is running."""
+        fill = self.inflight.get(key)
+        if fill is not None:
+            self.counters["collapsed_misses"] += 1
+            self.counters["bytes_saved"] += sum(len(c) for c in fill.chunks)
+            return fill
+        self.counters["misses"] += 1
+        fill = Fill()
+        self.inflight[key] = fill
+        # Runs independently of the requesting client so a hang-up doesn't
+        # abort the fill for everyone else waiting on it
+        task = asyncio.create_task(self._run_fill(key, fmt, fill, upstream))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return fill
+
+    # --- Filling ---
+    async def _run_fill(self, key, fmt, fill, upstream):
+        tmp_path = self.path(key, fmt) + ".part"
+        f = None
+        size = 0
+        try:
+            # Index the directory before this file lands in it, or it is counted twice
+            await self._load_disk_index()
+            await asyncio.to_thread(os.makedirs, self.directory, exist_ok=True)
+            f = await asyncio.to_thread(open, tmp_path, "wb")
+            async for chunk in upstream():
+                size += len(chunk)
+                await fill.publish(chunk)
+                await asyncio.to_thread(f.write, chunk)
+            await asyncio.to_thread(f.close)
+            await asyncio.to_thread(os.replace, tmp_path, self.path(key, fmt))
+            await self._remember(key, size, fill.chunks)
+            await fill.publish(done=True)
+        except Exception as e:
+            self.counters["upstream_errors"] += 1
+            log(f"/tts upstream error: {e}")
+            if f is not None:
+                await asyncio.to_thread(f.close)
+            if await asyncio.to_thread(os.path.exists, tmp_path):
+                await asyncio.to_thread(os.remove, tmp_path)
+            await fill.publish(done=True, error=e)
+        finally:
+            self.counters["upstream_bytes"] += size
+            self.inflight.pop(key, None)
+
+    async def _remember(self, key, size, chunks):
+        self.disk_bytes -= self.disk.pop(key, 0)
+        self.disk[key] = size
+        self.disk_bytes += size
+        evicted = []
+        while self.disk_bytes > self.disk_budget and len(self.disk) > 1:
+            old_key = next(iter(self.disk))
+            evicted.append(old_key)
+            self._forget_disk(old_key)
+        if size <= self.memory_item_bytes:
+            self.memory[key] = b"".join(chunks)
+            self.memory_bytes += size
+            while self.memory_bytes > self.memory_budget and self.memory:
+                _, data = self.memory.popitem(last=False)
+                self.memory_bytes -= len(data)
+        # Files being sent stay until their last reader is done (unlinking
+        # them could fail a response that hasn't opened its file yet)
+        self.evicted_while_read.update(k for k in evicted if k in self.readers)
+        evicted = [k for k in evicted if k not in self.readers]
+        # The index is already updated; only the files go in the background thread
+        if evicted:
+            await asyncio.to_thread(self._remove_files, evicted)
+
+    def _remove_files(self, keys):
+        prefixes = tuple(key + "." for key in keys)
+        for name in os.listdir(self.directory):
+            # A .part file belongs to a fill that started after the eviction
+            if name.startswith(prefixes) and not name.endswith(".part"):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+
+    def _forget_disk(self, key):
+        size = self.disk.pop(key, None)
+        if size is not None:
+            self.disk_bytes -= size
+        data = self.memory.pop(key, None)
+        if data is not None:
+            self.memory_bytes -= len(data)
+
+    async def _load_disk_index(self):
+        if self.disk is not None:
+            return
+        async with self._index_lock:
+            if self.disk is not None:
+                return
+            disk = OrderedDict()
+            for _, key, size in sorted(await asyncio.to_thread(self._scan_disk)):
+                disk[key] = size
+                self.disk_bytes += size
+            self.disk = disk
+
+    def _scan_disk(self):
+        """(atime, key, size) for every finished file in the cache directory."""
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith(".part"):
+                stat = entry.stat()
+                entries.append((stat.st_atime, entry.name.split(".", 1)[0], stat.st_size))
+        return entries
+
+    # --- Stats ---
+    def stats(self):
+        hits = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["collapsed_misses"]
+        lookups = hits + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_items": len(self.memory),
+            "memory_bytes": self.memory_bytes,
+            "disk_items": len(self.disk or ()),
+            "disk_bytes": self.disk_bytes,
+        }
+
+
+tts_cache = TTSCache()
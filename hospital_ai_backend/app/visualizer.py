@@ -0,0 +1,122 @@
+# app/visualizer.py
+
+import os
+import asyncio
+from .logger import log
+from .shared_state import shared_state
+
+# --- Config ---
+VISUALIZER_QUEUE_SIZE = int(os.getenv("VISUALIZER_QUEUE_SIZE", "32"))
+VISUALIZER_MAX_DROPS = int(os.getenv("VISUALIZER_MAX_DROPS", "256"))
+VISUALIZER_SEND_TIMEOUT = float(os.getenv("VISUALIZER_SEND_TIMEOUT", "5"))
+VISUALIZER_CHANNEL = "visualizer"
+
+
+class Subscriber:
+    def __init__(self, websocket, queue_size):
+        self.websocket = websocket
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.task = None
+
+
+class VisualizerHub:
+    """Fan-out of call events to /ws-visualizer clients.
+
+    `publish` never awaits: each subscriber has a bounded queue drained by its
+    own sender task. When a queue is full the oldest event is dropped; clients
+    that keep falling behind, or whose send times out, are disconnected.
+
+    Events go through the shared state's pub/sub, so clients connected to
+    any worker see calls handled by every worker.
+    """
+
+    def __init__(self, state=shared_state, queue_size=VISUALIZER_QUEUE_SIZE, max_drops=VISUALIZER_MAX_DROPS,
+                 send_timeout=VISUALIZER_SEND_TIMEOUT):
+        self.state = state
+        self.queue_size = queue_size
+        self.max_drops = max_drops
+        self.send_timeout = send_timeout
+        self.subscribers = set()
+        self.calls = {}  # call_id -> last state published by this worker
+        self.states = {}  # call_id -> last state seen from any worker, for late joiners
+        state.subscribe(VISUALIZER_CHANNEL, self.deliver)
+
+    def __len__(self):
+        return len(self.subscribers)
+
+    # --- Subscribers ---
+    def subscribe(self, websocket):
+        sub = Subscriber(websocket, self.queue_size)
+        # Late joiners get the current state of every live call
+        for call_id, state in self.states.items():
+            self._offer(sub, {"type": state, "call_id": call_id})
+        sub.task = asyncio.create_task(self._sender(sub))
+        self.subscribers.add(sub)
+        return sub
+
+    async def unsubscribe(self, sub):
+        self.subscribers.discard(sub)
+        if sub.task and sub.task is not asyncio.current_task():
+            sub.task.cancel()
+            try:
+                await sub.task
+            except asyncio.CancelledError:
+                pass
+
+    async def _sender(self, sub):
+        try:
+            while True:
+                event = await sub.queue.get()
+                await asyncio.wait_for(sub.websocket.send_json(event), self.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log(f"Visualizer client dropped: {e!r}", level="DEBUG")
+            self.subscribers.discard(sub)
+
+    # --- Publishing ---
+    def _offer(self, sub, event):
+        try:
+            sub.queue.put_nowait(event)
+            return
+        except asyncio.QueueFull:
+            pass
+        sub.dropped += 1
+        if sub.dropped > self.max_drops:
+            self.subscribers.discard(sub)
+            if sub.task:
+                sub.task.cancel()
+            asyncio.create_task(sub.websocket.close())
+            log("Visualizer client disconnected: too slow", level="DEBUG")
+            return
+        sub.queue.get_nowait()
+        sub.queue.put_nowait(event)
+
+    def publish(self, event):
+        self.state.publish(VISUALIZER_CHANNEL, event)
+
+    def deliver(self, event):
+        """Fan an event from any worker out to this worker's clients."""
+        call_id = event.get("call_id")
+        if call_id is not None:
+            if event.get("type") == "call-ended":
+                self.states.pop(call_id, None)
+            else:
+                self.states[call_id] = event.get("type")
+        for sub in list(self.subscribers):
+            self._offer(sub, event)
+
+    def set_state(self, call_id, state):
+        """Publish `state` for a call only if it differs from the last one."""
+        if self.calls.get(call_id) == state:
+            return
+        self.calls[call_id] = state
+        self.publish({"type": state, "call_id": call_id})
+
+    def end_call(self, call_id):
+        if self.calls.pop(call_id, None) is not None:
+            self.publish({"type": "call-ended", "call_id": call_id})
+
+
+hub = VisualizerHub()
@@ -0,0 +1,124 @@
+# app/warmup.py
+
+import gc
+import os
+import time
+import asyncio
+import datetime
+from sqlalchemy import text
+from .database import SessionLocal, engine, DB_POOL_SIZE
+from . import crud
+from .realtime_pool import realtime_pool
+from .slot_index import availability
+from .logger import log
+
+# --- Config ---
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "1") == "1"
+# Connections opened up front so the first requests don't pay the connect
+DB_WARM_CONNECTIONS = int(os.getenv("DB_WARM_CONNECTIONS", str(min(DB_POOL_SIZE, 4))))
+# Longest /ready waits for the first pre-connected realtime session
+READY_REALTIME_TIMEOUT = float(os.getenv("READY_REALTIME_TIMEOUT", "5"))
+# Opt-in: frozen objects are never collected, so garbage cycles left over
+# from startup stay in memory for the life of the worker
+STARTUP_GC_FREEZE = os.getenv("STARTUP_GC_FREEZE", "0") == "1"
+WARMUP_RETRY_INTERVAL = 1.0
+
+
+class Readiness:
+    """Whether this worker has finished warming up, and how long each step took."""
+
+    def __init__(self):
+        self.ready = False
+        self.started = time.perf_counter()
+        self.steps = {}
+
+    def begin(self):
+        self.ready = False
+        self.started = time.perf_counter()
+        self.steps = {}
+
+    async def step(self, name, fn, *args):
+        started = time.perf_counter()
+        try:
+            return await fn(*args)
+        finally:
+            self.steps[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    def finish(self):
+        self.ready = True
+        self.steps["total"] = round((time.perf_counter() - self.started) * 1000, 1)
+        log(f"Ready after {self.steps['total']} ms: {self.steps}")
+
+    def status(self):
+        return {"ready": self.ready, "startup_ms": self.steps.get("total"), "steps": self.steps}
+
+
+readiness = Readiness()
+
+
+async def warm_database(connections=DB_WARM_CONNECTIONS):
+    """Open `connections` pooled connections at once; they go back to the pool idle."""
+    async def ping():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            # Hold on until every ping has its own connection
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*(ping() for _ in range(max(1, connections))))
+
+
+async def warm_queries():
+    """Run the hot read paths once so SQLAlchemy's compiled-statement cache is filled."""
+    async with SessionLocal() as db:
+        await crud.get_doctors(db, limit=1)
+        await crud.get_doctors(db, limit=1, after_id=0, specialty="cardiology")
+        await crud.get_doctors_by_ids(db, [0])
+        await crud.get_slots_by_ids(db, [0])
+        now = datetime.datetime.now()
+        await crud.get_slots_for_doctors(db, [0], now, now)
+        await crud.search_doctors(db, "cardiology")
+        await crud.find_next_available(db, "cardiology", limit=1)
+        await crud.get_next_free_slots(db, 0, 1)
+        await crud.get_doctor_slots(db, 0)
+    # Doctor 0 does not exist; don't keep its empty index entry around
+    availability.invalidate(0)
+
+
+async def freeze_heap():
+    gc.collect()
+    gc.freeze()
+
+
+async def wait_for_realtime_pool(timeout=READY_REALTIME_TIMEOUT):
+    if realtime_pool.size <= 0:
+        return
+    deadline = time.monotonic() + timeout
+    while not realtime_pool.idle and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+
+
+async def warm_up(prebuild=None):
+    """Warm this worker, then mark it ready.
+
+    `prebuild` maps step names to plain callables run first, off the event
+    loop (templates, lazy imports). The database steps retry until the
+    database answers; the realtime pool only gets READY_REALTIME_TIMEOUT,
+    since calls fall back to a fresh session without it.
+    """
+    for name, fn in (prebuild or {}).items():
+        await readiness.step(name, asyncio.to_thread, fn)
+    while True:
+        try:
+            await readiness.step("database", warm_database)
+            await readiness.step("queries", warm_queries)
+            break
+        except Exception as e:
+            log(f"Warmup: database not ready ({e!r}); retrying", level="WARNING")
+            await asyncio.sleep(WARMUP_RETRY_INTERVAL)
+    await readiness.step("realtime_pool", wait_for_realtime_pool)
+    if STARTUP_GC_FREEZE:
+        # Startup leaves a large heap of long-lived objects (modules, SDK models);
+        # collect once now and move them out of the collector's way, so the first
+        # full collection doesn't land on a request
+        await readiness.step("gc", freeze_heap)
+    readiness.finish()
@@ -0,0 +1,104 @@
+# benchmarks/bench_booking.py
+#
+# Hammers crud.create_appointment from N concurrent workers and reports
+# bookings/s and the number of double-booked slots.
+#     python -m benchmarks.bench_booking --workers 50 --attempts 2000
+# --legacy runs the old read-then-write path for comparison.
+
+import argparse
+import asyncio
+import random
+import time
+
+from .common import use_bench_database, reset_schema, seed
+
+use_bench_database("booking")
+
+from sqlalchemy import select, func  # noqa: E402
+from app import crud, models, schemas  # noqa: E402
+from app.database import SessionLocal, engine  # noqa: E402
+
+
+async def legacy_create_appointment(db, appointment):
+    # Pre-fix behaviour: check in Python, then write
+    result = await db.execute(
+        select(models.Slot).filter(models.Slot.id == appointment.slot_id, models.Slot.is_booked == False)
+    )
+    slot = result.scalars().first()
+    if not slot:
+        return None
+    await asyncio.sleep(0)  # let other workers interleave, as they would under real load
+    slot.is_booked = True
+    db_appointment = models.Appointment(
+        doctor_id=appointment.doctor_id, slot_id=appointment.slot_id,
+        patient_name=appointment.patient_name, status="booked"
+    )
+    db.add(db_appointment)
+    await db.commit()
+    return db_appointment
+
+
+async def run_scenario(name, slots, workers, attempts, book):
+    queue = asyncio.Queue()
+    for i in range(attempts):
+        queue.put_nowait(random.choice(slots))
+    stats = {"booked": 0, "rejected": 0, "errors": 0}
+
+    async def worker(wid):
+        while True:
+            try:
+                slot_id, doctor_id = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            async with SessionLocal() as db:
+                try:
+                    appt = await book(db, schemas.AppointmentCreate(
+                        doctor_id=doctor_id, slot_id=slot_id, patient_name=f"worker-{wid}"
+                    ))
+                    stats["booked" if appt else "rejected"] += 1
+                except Exception:
+                    stats["errors"] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(workers)))
+    elapsed = time.perf_counter() - started
+
+    async with SessionLocal() as db:
+        double_booked = (await db.execute(
+            select(func.count()).select_from(
+                select(models.Appointment.slot_id)
+                .group_by(models.Appointment.slot_id)
+                .having(func.count() > 1)
+                .subquery()
+            )
+        )).scalar_one()
+    print(
+        f"{name:<12} attempts={attempts:<6} booked={stats['booked']:<6} rejected={stats['rejected']:<6} "
+        f"errors={stats['errors']:<4} {attempts / elapsed:8.1f} attempts/s "
+        f"{stats['booked'] / elapsed:8.1f} bookings/s double_booked={double_booked}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Concurrent booking benchmark")
+    parser.add_argument("--workers", type=int, default=50)
+    parser.add_argument("--attempts", type=int, default=2000)
+    parser.add_argument("--doctors", type=int, default=20)
+    parser.add_argument("--slots-per-doctor", type=int, default=200)
+    parser.add_argument("--legacy", action="store_true", help="use the old read-then-write booking path")
+    args = parser.parse_args()
+    book = legacy_create_appointment if args.legacy else crud.create_appointment
+    label = "legacy" if args.legacy else "atomic"
+
+    await reset_schema()
+    slots = await seed(1, 1)
+    await run_scenario(f"{label}/one", slots, args.workers, args.attempts, book)
+
+    await reset_schema()
+    slots = await seed(args.doctors, args.slots_per_doctor)
+    await run_scenario(f"{label}/many", slots, args.workers, args.attempts, book)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
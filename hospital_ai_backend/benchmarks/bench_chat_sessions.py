@@ -0,0 +1,101 @@
+# benchmarks/bench_chat_sessions.py
+#
+# Request size and latency across long /chat conversations, client-resent
+# history vs the server-side session store.
+#     python -m benchmarks.bench_chat_sessions --conversations 5 --turns 50
+# The fake provider charges --prompt-ms-per-kb of prefill time so upstream
+# latency grows with the prompt the way a real model's does.
+
+import os
+import re
+import json
+import time
+import asyncio
+import argparse
+
+from .common import use_bench_database, use_bench_workdir, percentile
+from .fake_openai import serve
+
+use_bench_workdir("chat_sessions")
+use_bench_database("chat_sessions")
+
+USER_MESSAGE = (
+    "I'd like to see a cardiologist sometime next week, preferably in the morning. "
+    "I have a follow-up about my blood pressure medication and some questions about my last test results, "
+    "and I can't do Wednesdays. Turn {turn}."
+)
+REPORT_TURNS = (1, 10, 25, 50)
+
+
+async def conversation(client, turns, use_sessions, samples):
+    history = []
+    session_id = None
+    for turn in range(1, turns + 1):
+        text = USER_MESSAGE.format(turn=turn)
+        if use_sessions:
+            body = {"message": text}
+            if session_id:
+                body["session_id"] = session_id
+        else:
+            history.append({"role": "user", "content": text})
+            body = {"messages": history}
+        payload = json.dumps(body)
+        started = time.perf_counter()
+        response = await client.post("/chat", content=payload, headers={"content-type": "application/json"})
+        elapsed = (time.perf_counter() - started) * 1000
+        data = response.json()
+        if use_sessions:
+            session_id = data["session_id"]
+        else:
+            history.append({"role": "assistant", "content": data["reply"]})
+        samples.setdefault(turn, []).append((len(payload), elapsed))
+
+
+async def run(name, client, fake_app, conversations, turns, use_sessions):
+    samples = {}
+    fake_app.state.chat_requests.clear()
+    await asyncio.gather(*(conversation(client, turns, use_sessions, samples) for _ in range(conversations)))
+    upstream = {}
+    for size, content, _ in fake_app.state.chat_requests:
+        match = re.search(r"Turn (\d+)\.$", content)
+        if match:
+            upstream.setdefault(int(match.group(1)), []).append(size)
+    print(f"{name}:")
+    for turn in REPORT_TURNS:
+        if turn in samples:
+            sizes = [b for b, _ in samples[turn]]
+            latencies = [ms for _, ms in samples[turn]]
+            print(f"  turn {turn:>3}: client {percentile(sizes, 50):6.0f} B  "
+                  f"upstream {percentile(upstream[turn], 50):6.0f} B  "
+                  f"latency p50={percentile(latencies, 50):6.1f} ms p99={percentile(latencies, 99):6.1f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="/chat session store benchmark")
+    parser.add_argument("--conversations", type=int, default=5)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--prompt-ms-per-kb", type=float, default=2.0)
+    args = parser.parse_args()
+
+    base_url, server = serve()
+    fake_app = server.config.app
+    fake_app.state.latency = args.latency_ms / 1000
+    fake_app.state.prompt_ms_per_kb = args.prompt_ms_per_kb
+    os.environ["OPENAI_BASE_URL"] = base_url
+
+    import httpx
+    from app.main import app
+    from app.chat_sessions import chat_sessions
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://app", timeout=120) as client:
+        await client.post("/chat", json={"message": "warm up"})  # first request pays for imports and pool setup
+        await run("resent history", client, fake_app, args.conversations, args.turns, False)
+        await run("session store", client, fake_app, args.conversations, args.turns, True)
+    print(f"store: {chat_sessions.stats()}")
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,107 @@
+# benchmarks/bench_chat_stream.py
+#
+# Time-to-first-token of streaming /chat (SSE) against the blocking response,
+# for a plain reply and for a turn that runs a tool first.
+#     python -m benchmarks.bench_chat_stream --requests 50 --token-ms 25
+# Blocking clients see nothing until the whole answer is ready, so their
+# "first token" is the full response time. The app runs under uvicorn in a
+# subprocess: an in-process ASGI transport would buffer the stream.
+
+import os
+import json
+import time
+import asyncio
+import argparse
+
+import httpx
+
+from .common import use_bench_database, use_bench_workdir, percentile
+from .fake_openai import serve
+from .load_test import free_port, start_app, seed_database
+
+PROMPTS = {
+    "plain": "What are your visiting hours on weekends for the cardiology ward?",
+    "tool": "I need an appointment with a heart doctor as soon as possible.",
+}
+
+
+async def blocking(client, prompt):
+    started = time.perf_counter()
+    response = await client.post("/chat", json={"message": prompt})
+    response.raise_for_status()
+    total = (time.perf_counter() - started) * 1000
+    return total, None, total
+
+
+async def streaming(client, prompt):
+    started = time.perf_counter()
+    first_token = first_status = None
+    async with client.stream("POST", "/chat", json={"message": prompt, "stream": True}) as response:
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[6:])
+            elapsed = (time.perf_counter() - started) * 1000
+            if event["type"] == "token" and first_token is None:
+                first_token = elapsed
+            elif event["type"] == "status" and first_status is None:
+                first_status = elapsed
+            elif event["type"] == "error":
+                raise RuntimeError(event["error"])
+    return first_token, first_status, (time.perf_counter() - started) * 1000
+
+
+async def measure(name, fn, client, prompt, requests, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+    samples = []
+
+    async def one():
+        async with sem:
+            samples.append(await fn(client, prompt))
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    ttft = [s[0] for s in samples]
+    total = [s[2] for s in samples]
+    status = [s[1] for s in samples if s[1] is not None]
+    line = (f"{name:<16} first token p50={percentile(ttft, 50):7.1f} p99={percentile(ttft, 99):7.1f} ms  "
+            f"complete p50={percentile(total, 50):7.1f} ms")
+    if status:
+        line += f"  first status p50={percentile(status, 50):7.1f} ms"
+    print(line)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Streaming /chat time-to-first-token")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--token-ms", type=float, default=25)
+    args = parser.parse_args()
+
+    use_bench_workdir("chat_stream")
+    db_url = use_bench_database("chat_stream")
+    await seed_database(50, 100)
+
+    fake_url, server = serve()
+    fake_app = server.config.app
+    fake_app.state.latency = args.latency_ms / 1000
+    fake_app.state.token_ms = args.token_ms
+
+    port = free_port()
+    env = {**os.environ, "DATABASE_URL": db_url, "OPENAI_BASE_URL": fake_url, "OPENAI_API_KEY": "offline",
+           "REALTIME_POOL_SIZE": "0"}
+    proc = start_app(port, env)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120) as client:
+            await blocking(client, "warm up")
+            for kind, prompt in PROMPTS.items():
+                await measure(f"{kind} blocking", blocking, client, prompt, args.requests, args.concurrency)
+                await measure(f"{kind} streaming", streaming, client, prompt, args.requests, args.concurrency)
+    finally:
+        proc.terminate()
+        proc.wait(10)
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
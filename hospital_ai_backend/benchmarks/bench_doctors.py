@@ -0,0 +1,117 @@
+# benchmarks/bench_doctors.py
+#
+# GET /doctors paging cost at increasing depth (offset vs cursor), SQL
+# statements per request, and what include=slots and the batch endpoints
+# save over one request per doctor.
+#     python -m benchmarks.bench_doctors --doctors 20000 --slots 20
+
+import time
+import asyncio
+import argparse
+
+import httpx
+
+from .common import use_bench_database, use_bench_workdir, reset_schema, seed, percentile
+
+use_bench_workdir("doctors")
+use_bench_database("doctors")
+
+from sqlalchemy import event, select  # noqa: E402
+from sqlalchemy.orm import selectinload  # noqa: E402
+from app import models  # noqa: E402
+from app.database import SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.slot_index import availability  # noqa: E402
+
+statements = 0
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def count_statement(*args):
+    global statements
+    statements += 1
+
+
+async def legacy_page(skip, limit):
+    # Pre-change GET /doctors: offset paging with every slot of every doctor eager-loaded
+    async with SessionLocal() as db:
+        result = await db.execute(
+            select(models.Doctor).options(selectinload(models.Doctor.slots)).offset(skip).limit(limit)
+        )
+        return [(d.id, len(d.slots)) for d in result.scalars().all()]
+
+
+async def timed(fn, reps):
+    global statements
+    times = []
+    for _ in range(reps):
+        statements = 0
+        started = time.perf_counter()
+        await fn()
+        times.append((time.perf_counter() - started) * 1000)
+    return percentile(times, 50), statements
+
+
+def row(name, p50, queries, requests=1):
+    print(f"{name:<44} p50={p50:8.2f} ms  queries={queries:<4} requests={requests}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="/doctors paging and batch benchmark")
+    parser.add_argument("--doctors", type=int, default=20000)
+    parser.add_argument("--slots", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--reps", type=int, default=20)
+    args = parser.parse_args()
+
+    await reset_schema()
+    await seed(args.doctors, args.slots)
+    async with engine.connect() as conn:
+        ids = (await conn.execute(select(models.Doctor.id).order_by(models.Doctor.id))).scalars().all()
+        slot_ids = (await conn.execute(select(models.Slot.id).limit(500))).scalars().all()
+
+    limit = args.limit
+    depths = [0, args.doctors // 2, args.doctors - limit]
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        await client.get("/doctors")  # warm-up
+
+        print(f"page of {limit} doctors at increasing depth ({args.doctors} doctors, {args.slots} slots each)")
+        for depth in depths:
+            p50, q = await timed(lambda: legacy_page(depth, limit), args.reps)
+            row(f"  legacy offset+all slots  skip={depth}", p50, q)
+            p50, q = await timed(lambda: client.get("/doctors", params={"skip": depth, "limit": limit}), args.reps)
+            row(f"  offset                   skip={depth}", p50, q)
+            cursor = ids[depth - 1] if depth else None
+            params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+            p50, q = await timed(lambda: client.get("/doctors", params=params), args.reps)
+            row(f"  cursor                   depth={depth}", p50, q)
+            p50, q = await timed(lambda: client.get("/doctors", params={**params, "include": "slots"}), args.reps)
+            row(f"  cursor + include=slots   depth={depth}", p50, q)
+
+        print("doctors with their slots, deep page")
+        params = {"limit": limit, "cursor": ids[depths[-1] - 1]}
+
+        async def one_per_doctor():
+            availability.invalidate()  # cold slot index: an admin paging through many doctors
+            page = (await client.get("/doctors", params=params)).json()
+            for doctor in page:
+                await client.get(f"/doctors/{doctor['id']}/slots")
+
+        p50, q = await timed(one_per_doctor, max(1, args.reps // 4))
+        row("  page + /doctors/{id}/slots each", p50, q, 1 + limit)
+        p50, q = await timed(lambda: client.get("/doctors", params={**params, "include": "slots"}), args.reps)
+        row("  page with include=slots", p50, q)
+
+        print("batch lookups")
+        sample = ids[::max(1, len(ids) // 200)][:200]
+        p50, q = await timed(lambda: client.post("/doctors/batch", json={"ids": sample}), args.reps)
+        row(f"  POST /doctors/batch ({len(sample)} ids)", p50, q)
+        p50, q = await timed(lambda: client.post("/doctors/batch?include=slots", json={"ids": sample}), args.reps)
+        row(f"  POST /doctors/batch?include=slots ({len(sample)} ids)", p50, q)
+        p50, q = await timed(lambda: client.post("/slots/batch", json={"ids": slot_ids}), args.reps)
+        row(f"  POST /slots/batch ({len(slot_ids)} ids)", p50, q)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
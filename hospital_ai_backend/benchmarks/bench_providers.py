@@ -0,0 +1,74 @@
+# benchmarks/bench_providers.py
+#
+# Throughput and latency of /chat, /tts and /stt against the fake provider,
+# exercising the shared client pool in app/providers.py.
+#     python -m benchmarks.bench_providers --requests 500 --concurrency 50
+
+import os
+import time
+import asyncio
+import argparse
+
+from .common import use_bench_database, use_bench_workdir, percentile
+from .fake_openai import serve
+
+use_bench_workdir("providers")
+use_bench_database("providers")
+
+
+async def run(name, client, make_request, total, concurrency):
+    latencies = []
+    errors = 0
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        nonlocal errors
+        async with sem:
+            started = time.perf_counter()
+            response = await make_request(client, i)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200 or b'"error"' in response.content[:200]:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+    print(
+        f"{name:<6} {total / elapsed:8.1f} req/s  p50={percentile(latencies, 50):7.1f} ms  "
+        f"p99={percentile(latencies, 99):7.1f} ms  errors={errors}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Provider client benchmark")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    base_url, server = serve()
+    server.config.app.state.latency = args.latency_ms / 1000
+    os.environ["OPENAI_BASE_URL"] = base_url
+
+    import httpx
+    from app.main import app
+    from app.providers import providers
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://app", timeout=120) as client:
+        await run("chat", client, lambda c, i: c.post(
+            "/chat", json={"messages": [{"role": "user", "content": f"hello {i}"}]}
+        ), args.requests, args.concurrency)
+        # Unique text per request so every call misses the TTS cache
+        await run("tts", client, lambda c, i: c.post(
+            "/tts", params={"text": f"bench {time.time()} {i}"}
+        ), args.requests, args.concurrency)
+        await run("stt", client, lambda c, i: c.post(
+            "/stt", files={"audio": ("a.wav", b"\x00" * 32_000, "audio/wav")}
+        ), args.requests, args.concurrency)
+    await providers.close()
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
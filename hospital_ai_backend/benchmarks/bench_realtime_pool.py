@@ -0,0 +1,72 @@
+# benchmarks/bench_realtime_pool.py
+#
+# Time-to-first-audio for /media-stream with and without pre-warmed realtime
+# sessions, against the fake provider's realtime websocket.
+#     python -m benchmarks.bench_realtime_pool --calls 10
+
+import os
+import re
+import json
+import time
+import argparse
+
+from .common import use_bench_database, use_bench_workdir, percentile
+from .fake_openai import serve
+
+use_bench_workdir("realtime_pool")
+use_bench_database("realtime_pool")
+
+
+def place_call(client, i):
+    twiml = client.post("/incoming-call").text
+    token = re.search(r'name="session" value="([^"]+)"', twiml).group(1)
+    with client.websocket_connect("/media-stream") as ws:
+        ws.send_text(json.dumps({"event": "connected"}))
+        started = time.perf_counter()
+        ws.send_text(json.dumps({"event": "start", "start": {
+            "streamSid": f"MZ{i}", "callSid": f"CA{i}", "customParameters": {"session": token}
+        }}))
+        while True:
+            message = ws.receive_json()
+            if message.get("event") == "media":
+                ttfa = (time.perf_counter() - started) * 1000
+                break
+        ws.send_text(json.dumps({"event": "stop"}))
+    return ttfa
+
+
+def run(label, pool_size, calls, gap):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.realtime_pool import realtime_pool
+    realtime_pool.size = pool_size
+    with TestClient(app) as client:
+        time.sleep(1.0 if pool_size else 0)  # let the pool warm up
+        timings = []
+        for i in range(calls):
+            timings.append(place_call(client, i))
+            time.sleep(gap)
+        stats = realtime_pool.stats()
+    print(
+        f"{label:<10} time-to-first-audio p50={percentile(timings, 50):7.1f} ms  "
+        f"p95={percentile(timings, 95):7.1f} ms  warm={stats['warm']} cold={stats['cold']}"
+    )
+    realtime_pool.counters.update(warm=0, cold=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Realtime session pool benchmark")
+    parser.add_argument("--calls", type=int, default=10)
+    parser.add_argument("--pool-size", type=int, default=2)
+    parser.add_argument("--gap", type=float, default=0.5, help="seconds between calls")
+    args = parser.parse_args()
+
+    base_url, server = serve()
+    os.environ["OPENAI_BASE_URL"] = base_url
+    run("cold", 0, args.calls, args.gap)
+    run("pooled", args.pool_size, args.calls, args.gap)
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# benchmarks/bench_relay.py
+#
+# CPU cost of relaying media frames, before and after the string fast path.
+#     python -m benchmarks.bench_relay --frames 200000 --coalesce 5
+# Inbound: Twilio media event -> input_audio_buffer.append.
+# Outbound: response.audio.delta -> 20 ms Twilio media frames.
+# Sends go to no-op coroutines (the legacy outbound one runs json.dumps the
+# way Starlette's send_json does), so the numbers cover parsing and
+# serialisation only, not websocket framing or socket I/O. "calls/core" is
+# 1 s / (50 inbound + 50 outbound frames' worth of that CPU). Coalescing costs
+# a decode/re-encode here; what it saves is per-message websocket work on both
+# ends, which this does not measure.
+
+import json
+import time
+import base64
+import asyncio
+import argparse
+
+from app.audio import OutboundAudio, FRAME_BYTES, SAMPLE_RATE
+from app.relay import InboundRelay, twilio_media_payload, audio_delta
+
+FRAMES_PER_SECOND = 1000 // 20
+
+
+def twilio_frame(seq):
+    payload = base64.b64encode(bytes([seq % 256]) * FRAME_BYTES).decode()
+    # Twilio sends compact JSON in this key order
+    return json.dumps({
+        "event": "media", "sequenceNumber": str(seq),
+        "media": {"track": "inbound", "chunk": str(seq), "timestamp": str(seq * 20), "payload": payload},
+        "streamSid": "MZ00000000000000000000000000000000",
+    }, separators=(",", ":"))
+
+
+def delta_event(seq, delta_ms):
+    audio = bytes([seq % 256]) * (SAMPLE_RATE * delta_ms // 1000)
+    return json.dumps({
+        "type": "response.audio.delta", "event_id": f"event_{seq}", "response_id": "resp_1",
+        "item_id": "item_1", "output_index": 0, "content_index": 0,
+        "delta": base64.b64encode(audio).decode(),
+    }, separators=(",", ":"))
+
+
+async def noop(message):
+    pass
+
+
+async def send_json_like_starlette(data):
+    json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+# --- Inbound ---
+async def inbound_legacy(messages):
+    for message in messages:
+        data = json.loads(message)
+        if data.get("event") == "media":
+            await noop(json.dumps({"type": "input_audio_buffer.append", "audio": data["media"]["payload"]}))
+
+
+async def inbound_fast(messages, coalesce):
+    relay = InboundRelay(noop, coalesce)
+    for message in messages:
+        payload = twilio_media_payload(message)
+        await relay.media(payload)
+    await relay.flush()
+
+
+# --- Outbound ---
+async def outbound(messages, fast):
+    audio = OutboundAudio(send_json_like_starlette, lambda: "MZ0", send_text=noop if fast else None)
+    for message in messages:
+        delta = audio_delta(message) if fast else None
+        if delta is None:
+            event = json.loads(message)
+            delta = event.get("item_id"), event["delta"]
+        audio.push(*delta)
+        # What the pacer does per frame, without the sleeping
+        while len(audio.buffer) >= FRAME_BYTES:
+            frame = bytes(audio.buffer[:FRAME_BYTES])
+            del audio.buffer[:FRAME_BYTES]
+            await audio._send_frame("MZ0", frame)
+
+
+def cpu_us_per_frame(coro_fn, frames, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.process_time()
+        asyncio.run(coro_fn())
+        elapsed = time.process_time() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best / frames * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=100_000, help="inbound frames per run")
+    parser.add_argument("--delta-ms", type=int, default=100, help="audio per response.audio.delta")
+    parser.add_argument("--coalesce", type=int, default=5, help="frames per append in coalesced mode")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    inbound_msgs = [twilio_frame(i) for i in range(args.frames)]
+    deltas = [delta_event(i, args.delta_ms) for i in range(args.frames * 20 // args.delta_ms)]
+    out_frames = len(deltas) * (SAMPLE_RATE * args.delta_ms // 1000) // FRAME_BYTES
+
+    results = {
+        "inbound legacy": cpu_us_per_frame(lambda: inbound_legacy(inbound_msgs), args.frames, args.repeat),
+        "inbound fast": cpu_us_per_frame(lambda: inbound_fast(inbound_msgs, 1), args.frames, args.repeat),
+        f"inbound fast x{args.coalesce}": cpu_us_per_frame(
+            lambda: inbound_fast(inbound_msgs, args.coalesce), args.frames, args.repeat),
+        "outbound legacy": cpu_us_per_frame(lambda: outbound(deltas, False), out_frames, args.repeat),
+        "outbound fast": cpu_us_per_frame(lambda: outbound(deltas, True), out_frames, args.repeat),
+    }
+    for name, us in results.items():
+        print(f"{name:<20} {us:7.2f} us/frame")
+
+    def calls_per_core(inbound_us, outbound_us):
+        return 1e6 / (FRAMES_PER_SECOND * (inbound_us + outbound_us))
+
+    before = calls_per_core(results["inbound legacy"], results["outbound legacy"])
+    after = calls_per_core(results["inbound fast"], results["outbound fast"])
+    coalesced = calls_per_core(results[f"inbound fast x{args.coalesce}"], results["outbound fast"])
+    print(f"relay calls/core: before={before:.0f} after={after:.0f} ({after / before:.2f}x) "
+          f"after+coalesce x{args.coalesce}={coalesced:.0f} ({coalesced / before:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# benchmarks/bench_schedules.py
+#
+# Slot generation throughput from schedule rules, at ~1M rows by default:
+# Mon-Fri 08:00-18:00 in 15-minute slots is 40 slots a day, ~10.4k a doctor
+# a year, so 96 doctors over 365 days is ~1M slots.
+#     python -m benchmarks.bench_schedules --doctors 96 --days 365
+# Also times a row-by-row ORM baseline on a sample, a re-run of the same
+# window (idempotency) and a rolling extension, and checks for duplicates.
+
+import time
+import asyncio
+import argparse
+import datetime
+
+from .common import use_bench_database, reset_schema, SPECIALTIES
+
+use_bench_database("schedules")
+
+from sqlalchemy import insert, select, func  # noqa: E402
+from app import models, schedules  # noqa: E402
+from app.database import SessionLocal, engine  # noqa: E402
+
+
+async def seed_rules(n_doctors, valid_from):
+    async with engine.begin() as conn:
+        await conn.execute(insert(models.Doctor), [
+            {"name": f"Dr. Bench {i}", "specialty": SPECIALTIES[i % len(SPECIALTIES)]}
+            for i in range(n_doctors)
+        ])
+        doctor_ids = (await conn.execute(select(models.Doctor.id))).scalars().all()
+        await conn.execute(insert(models.ScheduleRule), [
+            {"doctor_id": doctor_id, "weekdays": "0,1,2,3,4", "start_time": datetime.time(8),
+             "end_time": datetime.time(18), "slot_minutes": 15, "valid_from": valid_from}
+            for doctor_id in doctor_ids
+        ])
+        # A public holiday for everyone and a half day off for every tenth doctor
+        holiday = valid_from + datetime.timedelta(days=10)
+        await conn.execute(insert(models.ScheduleException), [
+            {"doctor_id": doctor_id, "day": holiday, "reason": "holiday"} for doctor_id in doctor_ids
+        ] + [
+            {"doctor_id": doctor_id, "day": valid_from + datetime.timedelta(days=3),
+             "start_time": datetime.time(13), "end_time": datetime.time(18), "reason": "half day"}
+            for doctor_id in doctor_ids[::10]
+        ])
+    return doctor_ids
+
+
+async def orm_baseline(doctor_id, start, rows):
+    """The only way to add slots before: one ORM object per slot, committed together."""
+    step = datetime.timedelta(minutes=15)
+    started = time.perf_counter()
+    async with SessionLocal() as db:
+        for i in range(rows):
+            db.add(models.Slot(doctor_id=doctor_id, start_time=start + i * step, is_booked=False))
+        await db.commit()
+    return rows / (time.perf_counter() - started)
+
+
+async def count_slots():
+    async with engine.connect() as conn:
+        total = (await conn.execute(select(func.count()).select_from(models.Slot))).scalar_one()
+        distinct = (await conn.execute(select(func.count()).select_from(
+            select(models.Slot.doctor_id, models.Slot.start_time).distinct().subquery()
+        ))).scalar_one()
+    return total, distinct
+
+
+def report(name, stats):
+    rate = stats["slots_created"] / stats["seconds"] if stats["seconds"] else 0.0
+    print(f"{name:<22} created={stats['slots_created']:<9} existing={stats['slots_existing']:<9} "
+          f"{stats['seconds']:7.2f} s {rate:10.0f} slots/s")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Schedule generation benchmark")
+    parser.add_argument("--doctors", type=int, default=96)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--extend-days", type=int, default=30)
+    parser.add_argument("--baseline-rows", type=int, default=20000)
+    args = parser.parse_args()
+
+    await reset_schema()
+    today = datetime.date.today()
+
+    # Baseline first, on a throwaway doctor, then start clean
+    async with engine.begin() as conn:
+        await conn.execute(insert(models.Doctor), [{"name": "Dr. Baseline", "specialty": "Cardiology"}])
+    rate = await orm_baseline(1, datetime.datetime.combine(today, datetime.time(8)), args.baseline_rows)
+    print(f"{'orm row-by-row':<22} created={args.baseline_rows:<9} {'':<18}{'':>10} {rate:10.0f} slots/s")
+    await reset_schema()
+
+    await seed_rules(args.doctors, today)
+    end = today + datetime.timedelta(days=args.days)
+    report("generate", await schedules.generate(today, end))
+    report("generate (re-run)", await schedules.generate(today, end))
+    report("extend", await schedules.extend(args.days + args.extend_days, today=today))
+    report("extend (re-run)", await schedules.extend(args.days + args.extend_days, today=today))
+
+    total, distinct = await count_slots()
+    print(f"slots in table={total} distinct (doctor, start)={distinct} duplicates={total - distinct}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
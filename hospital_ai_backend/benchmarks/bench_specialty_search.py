@@ -0,0 +1,91 @@
+# benchmarks/bench_specialty_search.py
+#
+# Cross-doctor "next available by specialty" at 1k doctors / 1M slots.
+#     python -m benchmarks.bench_specialty_search --doctors 1000 --slots-per-doctor 1000
+# Compares crud.find_next_available (one indexed query) with the old flow of
+# list_doctors (ILIKE scan) followed by one slot query per doctor.
+
+import argparse
+import asyncio
+import datetime
+import time
+
+from .common import use_bench_database, reset_schema, seed, percentile
+
+use_bench_database("specialty")
+
+from sqlalchemy import select  # noqa: E402
+from app import crud, models  # noqa: E402
+from app.database import SessionLocal, engine, create_schema  # noqa: E402
+from app.specialties import sync_specialties  # noqa: E402
+
+
+async def legacy_next_available(db, specialty, start, limit):
+    doctors = (await db.execute(
+        select(models.Doctor).filter(models.Doctor.specialty.ilike(f"%{specialty}%"))
+    )).scalars().all()
+    found = []
+    for doctor in doctors:
+        found.extend((await db.execute(
+            select(models.Slot).filter(
+                models.Slot.doctor_id == doctor.id,
+                models.Slot.is_booked == False,
+                models.Slot.start_time >= start,
+            )
+        )).scalars().all())
+    found.sort(key=lambda s: (s.start_time, s.id))
+    return found[:limit], 1 + len(doctors)
+
+
+async def time_queries(label, fn, runs):
+    timings = []
+    queries = 0
+    for _ in range(runs):
+        async with SessionLocal() as db:
+            started = time.perf_counter()
+            queries = await fn(db)
+            timings.append((time.perf_counter() - started) * 1000)
+    print(
+        f"{label:<28} p50={percentile(timings, 50):8.2f} ms  p95={percentile(timings, 95):8.2f} ms  "
+        f"queries/lookup={queries}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Next-available-by-specialty benchmark")
+    parser.add_argument("--doctors", type=int, default=1000)
+    parser.add_argument("--slots-per-doctor", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--legacy-runs", type=int, default=3)
+    parser.add_argument("--limit", type=int, default=5)
+    args = parser.parse_args()
+
+    await reset_schema()
+    started = time.perf_counter()
+    await seed(args.doctors, args.slots_per_doctor)
+    async with engine.begin() as conn:
+        await conn.run_sync(create_schema)
+    async with SessionLocal() as db:
+        await sync_specialties(db)
+    print(f"seeded {args.doctors} doctors x {args.slots_per_doctor} slots in {time.perf_counter() - started:.1f}s")
+
+    # Search from the middle of the schedule so the index has to skip past rows
+    start = datetime.datetime.now() + datetime.timedelta(days=3)
+
+    async def indexed(db):
+        rows = await crud.find_next_available(db, "heart doctor", start, None, args.limit)
+        assert rows, "no slots found"
+        return 2  # synonym lookup + slot query
+
+    async def legacy(db):
+        rows, queries = await legacy_next_available(db, "cardio", start, args.limit)
+        assert rows, "no slots found"
+        return queries
+
+    await time_queries("find_next_available", indexed, args.runs)
+    await time_queries("list_doctors + list_slots", legacy, args.legacy_runs)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
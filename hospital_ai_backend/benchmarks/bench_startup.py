@@ -0,0 +1,103 @@
+# benchmarks/bench_startup.py
+#
+# Cold start of one uvicorn worker: process spawn -> port open -> /ready,
+# then the latency of the first and second request to each hot endpoint.
+#     python -m benchmarks.bench_startup --runs 3
+# Modes: migrate on startup without warmup (the old behaviour), no migrate
+# without warmup, and no migrate with warmup (the default).
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import subprocess
+
+import httpx
+
+from .common import use_bench_database, use_bench_workdir, percentile
+from .fake_openai import serve
+from .load_test import BACKEND_DIR, free_port, seed_database
+
+MODES = [
+    ("migrate on start, no warmup", {"DB_CREATE_SCHEMA": "1", "STARTUP_WARMUP": "0"}),
+    ("no migrate, no warmup", {"DB_CREATE_SCHEMA": "0", "STARTUP_WARMUP": "0"}),
+    ("no migrate, warmup", {"DB_CREATE_SCHEMA": "0", "STARTUP_WARMUP": "1"}),
+]
+
+REQUESTS = [
+    ("POST /incoming-call", "POST", "/incoming-call", None),
+    ("GET /doctors?include=slots", "GET", "/doctors?include=slots&limit=20", None),
+    ("GET /slots/next-available", "GET", "/slots/next-available?specialty=heart%20doctor", None),
+    ("POST /chat", "POST", "/chat", {"message": "hello"}),
+]
+
+
+async def cold_start(port, env):
+    """Returns (ms to first HTTP answer, ms to /ready 200, first/second request ms, ready status)."""
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.run_app", "--port", str(port)],
+        cwd=os.getcwd(), env={**env, "PYTHONPATH": BACKEND_DIR},
+    )
+    listening = None
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=30) as client:
+            while True:
+                if proc.poll() is not None:
+                    raise RuntimeError("app exited during startup")
+                try:
+                    response = await client.get("/ready")
+                except httpx.HTTPError:
+                    await asyncio.sleep(0.005)
+                    continue
+                listening = listening or (time.perf_counter() - started) * 1000
+                if response.status_code == 200:
+                    ready = (time.perf_counter() - started) * 1000
+                    status = response.json()
+                    break
+                await asyncio.sleep(0.005)
+            timings = {}
+            for name, method, path, body in REQUESTS:
+                runs = []
+                for _ in range(2):
+                    t = time.perf_counter()
+                    response = await client.request(method, path, json=body)
+                    runs.append((time.perf_counter() - t) * 1000)
+                    if response.status_code >= 500:
+                        raise RuntimeError(f"{name} failed: {response.status_code}")
+                timings[name] = runs
+        return listening, ready, timings, status
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Cold start and first-request latency")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--doctors", type=int, default=200)
+    parser.add_argument("--slots", type=int, default=100)
+    args = parser.parse_args()
+
+    use_bench_workdir("startup")
+    db_url = use_bench_database("startup")
+    await seed_database(args.doctors, args.slots)
+    fake_url, fake_server = serve()
+    env = {**os.environ, "DATABASE_URL": db_url, "OPENAI_BASE_URL": fake_url, "OPENAI_API_KEY": "offline"}
+
+    for mode, extra in MODES:
+        results = [await cold_start(free_port(), {**env, **extra}) for _ in range(args.runs)]
+        listening = percentile([r[0] for r in results], 50)
+        ready = percentile([r[1] for r in results], 50)
+        print(f"{mode}: port open {listening:.0f} ms, ready {ready:.0f} ms (median of {args.runs})")
+        print(f"  last run's steps: {results[-1][3]['steps']}")
+        for name, *_ in REQUESTS:
+            first = percentile([r[2][name][0] for r in results], 50)
+            second = percentile([r[2][name][1] for r in results], 50)
+            print(f"  {name:<30} first={first:7.1f} ms  second={second:7.1f} ms")
+    fake_server.should_exit = True
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,129 @@
+# benchmarks/bench_stt.py
+#
+# /stt on long recordings: one-shot upload (the default) vs stream=true
+# (silence-split segments transcribed in parallel, streamed back as SSE).
+# Generates 8 kHz mu-law WAV files of speech-like tone bursts separated by
+# pauses, serves the fake provider with transcription time proportional to
+# the audio length, and starts a fresh app process per run so its peak RSS
+# (VmHWM) belongs to that one request.
+#     python -m benchmarks.bench_stt --minutes 1,10,60
+
+import os
+import json
+import time
+import random
+import struct
+import asyncio
+import argparse
+
+import httpx
+
+from .common import use_bench_database, use_bench_workdir
+from .fake_openai import serve, app as fake_app
+from .load_test import free_port, start_app, seed_database
+from .twilio_sim import tone
+
+RATE = 8000
+SILENCE = b"\xff"  # mu-law zero
+
+
+def write_recording(path, minutes, seed=7):
+    """A mu-law WAV of 2-8 s bursts and 0.5-1.5 s pauses, written a second at a time."""
+    rng = random.Random(seed)
+    voice = tone(1.0, 220.0, RATE)
+    total = int(minutes * 60 * RATE)
+    with open(path, "wb") as f:
+        f.write(b"RIFF" + struct.pack("<I", 36 + total) + b"WAVE" + b"fmt " + struct.pack(
+            "<IHHIIHH", 16, 7, 1, RATE, RATE, 1, 8) + b"data" + struct.pack("<I", total))
+        written = 0
+        while written < total:
+            for block, seconds in ((voice, rng.uniform(2, 8)), (SILENCE * RATE, rng.uniform(0.5, 1.5))):
+                n = min(int(seconds * RATE), total - written)
+                while n > 0:
+                    part = block[:min(n, RATE)]
+                    f.write(part)
+                    n -= len(part)
+                    written += len(part)
+
+
+def peak_rss_mb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        fields = dict(line.split(":", 1) for line in f)
+    return int(fields["VmHWM"].split()[0]) / 1024, int(fields["VmRSS"].split()[0]) / 1024
+
+
+async def run(port, env, path, stream):
+    proc = start_app(port, env)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=600) as client:
+            pid = (await client.get("/_bench/pid")).json()["pid"]
+            baseline = peak_rss_mb(pid)[1]
+            result = {"first_ms": None, "segments": 0, "status": None}
+            started = time.perf_counter()
+            with open(path, "rb") as f:
+                files = {"audio": (os.path.basename(path), f, "audio/wav")}
+                if not stream:
+                    response = await client.post("/stt", files=files)
+                    result["status"] = response.status_code
+                    result["text"] = response.json().get("text") or response.json().get("error", "")[:60]
+                else:
+                    async with client.stream("POST", "/stt", params={"stream": "true"}, files=files) as response:
+                        result["status"] = response.status_code
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data: "):
+                                continue
+                            event = json.loads(line[6:])
+                            if event["type"] == "segment":
+                                if result["first_ms"] is None:
+                                    result["first_ms"] = (time.perf_counter() - started) * 1000
+                                result["segments"] += 1
+                                result["errors"] = result.get("errors", 0) + ("error" in event)
+                            elif event["type"] == "done":
+                                result["text"] = f"{len(event['text'])} chars, {event['duration']} s"
+            result["wall_s"] = time.perf_counter() - started
+            result["peak_mb"] = peak_rss_mb(pid)[0]
+            result["baseline_mb"] = baseline
+            return result
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="/stt one-shot vs streamed segments")
+    parser.add_argument("--minutes", default="1,10,60")
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--ms-per-audio-second", type=float, default=10,
+                        help="fake transcription cost per second of audio")
+    parser.add_argument("--upload-limit-mb", type=float, default=25,
+                        help="fake provider's upload limit (the real one rejects files over 25 MB)")
+    args = parser.parse_args()
+
+    workdir = use_bench_workdir("stt")
+    db_url = use_bench_database("stt")
+    await seed_database(10, 10)
+    fake_url, fake_server = serve()
+    fake_app.state.latency = args.latency_ms / 1000
+    fake_app.state.stt_ms_per_audio_second = args.ms_per_audio_second
+    fake_app.state.stt_max_bytes = int(args.upload_limit_mb * 1024 * 1024)
+    env = {**os.environ, "DATABASE_URL": db_url, "OPENAI_BASE_URL": fake_url, "OPENAI_API_KEY": "offline",
+           "REALTIME_POOL_SIZE": "0"}
+
+    for minutes in [float(m) for m in args.minutes.split(",")]:
+        path = os.path.join(workdir, f"recording_{minutes:g}m.wav")
+        if not os.path.exists(path):
+            write_recording(path, minutes)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        print(f"{minutes:g} min recording ({size_mb:.1f} MB mu-law WAV)")
+        for name, stream in (("one-shot", False), ("stream", True)):
+            r = await run(free_port(), env, path, stream)
+            first = f"{r['first_ms']:7.0f} ms" if r["first_ms"] is not None else "      -   "
+            print(f"  {name:<9} status={r['status']} wall={r['wall_s']:6.2f} s  first segment={first}  "
+                  f"segments={r['segments']:<4} errors={r.get('errors', 0)}  "
+                  f"peak RSS={r['peak_mb']:6.1f} MB (+{r['peak_mb'] - r['baseline_mb']:.1f} over idle)  "
+                  f"[{r.get('text')}]")
+    fake_server.should_exit = True
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
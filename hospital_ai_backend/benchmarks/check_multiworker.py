@@ -0,0 +1,148 @@
+# benchmarks/check_multiworker.py
+#
+# Runs the app with several uvicorn workers and checks that state is shared:
+#   - /chat sessions continue correctly when turns land on different workers
+#   - every /ws-visualizer client sees every call, whichever worker handles it
+#     python -m benchmarks.check_multiworker --workers 4
+# Each mode is run twice: in-process state (expected to fail with more than one
+# worker) and SHARED_STATE_URL=sqlite:///... (expected to pass). Exits non-zero
+# if the shared backend fails.
+
+import os
+import re
+import sys
+import json
+import asyncio
+import argparse
+import tempfile
+
+import httpx
+import websockets
+
+from .common import use_bench_database, use_bench_workdir
+from .fake_openai import serve
+from .load_test import free_port, start_app, seed_database
+from .twilio_sim import run_calls
+
+
+def fresh_client(base_url):
+    # No keep-alive: every request is a new connection the kernel may hand to any worker
+    return httpx.AsyncClient(base_url=base_url, timeout=30, limits=httpx.Limits(max_keepalive_connections=0))
+
+
+async def workers_hit(base_url, probes=50):
+    async with fresh_client(base_url) as client:
+        pids = [(await client.get("/_bench/pid")).json()["pid"] for _ in range(probes)]
+    return len(set(pids))
+
+
+async def check_chat(base_url, fake_app, sessions, turns):
+    fake_app.state.chat_requests.clear()
+
+    async def conversation(n):
+        session_id = None
+        async with fresh_client(base_url) as client:
+            for turn in range(1, turns + 1):
+                body = {"message": f"session {n} turn {turn}"}
+                if session_id:
+                    body["session_id"] = session_id
+                session_id = (await client.post("/chat", json=body)).json()["session_id"]
+
+    await asyncio.gather(*(conversation(n) for n in range(sessions)))
+    # Turn k of an intact session sends the system prompt plus 2k - 1 messages
+    broken = 0
+    for _, content, count in fake_app.state.chat_requests:
+        match = re.match(r"session \d+ turn (\d+)$", content)
+        if match and count != 2 * int(match.group(1)):
+            broken += 1
+    total = sessions * turns
+    print(f"  chat: {total - broken}/{total} turns saw their full history")
+    return broken == 0
+
+
+async def check_visualizer(base_url, fake_app, clients, calls, duration):
+    ws_url = re.sub(r"^http", "ws", base_url) + "/ws-visualizer"
+    seen = [dict() for _ in range(clients)]  # call_id -> set of event types
+
+    async def watch(i):
+        async with websockets.connect(ws_url) as ws:
+            async for message in ws:
+                event = json.loads(message)
+                seen[i].setdefault(event.get("call_id"), set()).add(event.get("type"))
+
+    watchers = [asyncio.create_task(watch(i)) for i in range(clients)]
+    await asyncio.sleep(0.5)
+    results = await run_calls(base_url, calls, duration, fake_app.state.sent_at)
+    await asyncio.sleep(1.0)
+    for task in watchers:
+        task.cancel()
+    await asyncio.gather(*watchers, return_exceptions=True)
+
+    failed_calls = sum(1 for r in results if r.error)
+    complete = [
+        sum(1 for types in s.values() if {"call-started", "call-ended"} <= types) for s in seen
+    ]
+    print(f"  visualizer: calls per client with start+end = {complete} (expected {calls}), "
+          f"failed calls={failed_calls}")
+    return failed_calls == 0 and all(n == calls for n in complete)
+
+
+async def run_mode(name, env_extra, args, db_url, fake_url, fake_app):
+    port = free_port()
+    env = {**os.environ, "DATABASE_URL": db_url, "OPENAI_BASE_URL": fake_url, "OPENAI_API_KEY": "offline",
+           **env_extra}
+    proc = start_app(port, env, workers=args.workers)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        await asyncio.sleep(1.0)  # let every worker finish startup
+        print(f"{name}: {await workers_hit(base_url)} of {args.workers} workers answered")
+        chat_ok = await check_chat(base_url, fake_app, args.sessions, args.turns)
+        visualizer_ok = await check_visualizer(base_url, fake_app, args.clients, args.calls, args.duration)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(10)
+        except Exception:
+            proc.kill()
+    ok = chat_ok and visualizer_ok
+    print(f"  => {'PASS' if ok else 'FAIL'}")
+    return ok
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Multi-worker shared-state check")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--calls", type=int, default=6)
+    parser.add_argument("--duration", type=float, default=2.0)
+    parser.add_argument("--skip-memory", action="store_true", help="only run the shared backend")
+    args = parser.parse_args()
+
+    use_bench_workdir("multiworker")
+    db_url = use_bench_database("multiworker")
+    await seed_database(20, 50)
+    fake_url, fake_server = serve()
+    fake_app = fake_server.config.app
+    fake_app.state.latency = 0.01
+
+    state_path = os.path.join(tempfile.gettempdir(), "hospital_multiworker_state.db")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(state_path + suffix):
+            os.remove(state_path + suffix)
+
+    common = {"REALTIME_POOL_SIZE": "0"}
+    if not args.skip_memory:
+        await run_mode("in-process state", common, args, db_url, fake_url, fake_app)
+    shared_ok = await run_mode(
+        "sqlite shared state", {**common, "SHARED_STATE_URL": f"sqlite:///{state_path}"},
+        args, db_url, fake_url, fake_app
+    )
+    fake_server.should_exit = True
+    if not shared_ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,69 @@
+# benchmarks/common.py
+#
+# Shared helpers for the offline benchmarks. Run them from hospital_ai_backend/:
+#     python -m benchmarks.bench_booking
+# DATABASE_URL defaults to a throwaway SQLite file so nothing touches the real DB.
+
+import os
+import tempfile
+import datetime
+
+SPECIALTIES = ["Cardiology", "Pediatrics", "Dermatology", "Neurology", "Orthopedics", "General Medicine"]
+
+
+def use_bench_database(name="bench"):
+    if not os.getenv("DATABASE_URL"):
+        path = os.path.join(tempfile.gettempdir(), f"hospital_{name}.db")
+        if os.path.exists(path):
+            os.remove(path)
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    return os.environ["DATABASE_URL"]
+
+
+def use_bench_workdir(name="bench"):
+    """Run from a scratch directory so logs, caches and app.main's static mount stay out of the tree."""
+    path = os.path.join(tempfile.gettempdir(), f"hospital_{name}_work")
+    os.makedirs(os.path.join(path, "static"), exist_ok=True)
+    os.chdir(path)
+    return path
+
+
+async def reset_schema():
+    from app.database import engine, Base
+    from app import models  # noqa: F401 - registers tables on Base
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def seed(n_doctors, slots_per_doctor, start=None, step_minutes=15, batch=50_000):
+    """Bulk-insert doctors and free slots; returns (slot_id, doctor_id) rows."""
+    from sqlalchemy import insert, select
+    from app.database import engine
+    from app import models
+    start = start or datetime.datetime.now().replace(hour=8, minute=0, second=0, microsecond=0)
+    step = datetime.timedelta(minutes=step_minutes)
+    async with engine.begin() as conn:
+        await conn.execute(insert(models.Doctor), [
+            {"name": f"Dr. Bench {i}", "specialty": SPECIALTIES[i % len(SPECIALTIES)]}
+            for i in range(n_doctors)
+        ])
+        doctor_ids = (await conn.execute(select(models.Doctor.id))).scalars().all()
+        rows = []
+        for doctor_id in doctor_ids:
+            for i in range(slots_per_doctor):
+                rows.append({"doctor_id": doctor_id, "start_time": start + i * step, "is_booked": False})
+                if len(rows) >= batch:
+                    await conn.execute(insert(models.Slot), rows)
+                    rows = []
+        if rows:
+            await conn.execute(insert(models.Slot), rows)
+        return (await conn.execute(select(models.Slot.id, models.Slot.doctor_id))).all()
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(p / 100.0 * (len(values) - 1)))))
+    return values[k]
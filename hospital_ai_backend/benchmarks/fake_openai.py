@@ -0,0 +1,316 @@
+# benchmarks/fake_openai.py
+#
+# Minimal stand-in for the provider's HTTP and realtime APIs so endpoints and
+# calls can be load tested offline. Point the app at it with
+# OPENAI_BASE_URL=http://host:port/v1.
+#     python -m benchmarks.fake_openai --port 9100 --latency-ms 50
+
+import os
+import json
+import time
+import base64
+import struct
+import asyncio
+import argparse
+import threading
+
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
+
+FAKE_LATENCY_MS = float(os.getenv("FAKE_LATENCY_MS", "50"))
+FAKE_TTS_BYTES = int(os.getenv("FAKE_TTS_BYTES", str(48_000)))
+FAKE_TTS_CHUNK = 4096
+# Realtime: handshake and session.update costs, and the audio each response carries
+FAKE_CONNECT_MS = float(os.getenv("FAKE_CONNECT_MS", "300"))
+FAKE_SETUP_MS = float(os.getenv("FAKE_SETUP_MS", "200"))
+FAKE_RESPONSE_MS = float(os.getenv("FAKE_RESPONSE_MS", "150"))
+FAKE_RESPONSE_AUDIO_MS = int(os.getenv("FAKE_RESPONSE_AUDIO_MS", "2000"))
+FAKE_DELTA_MS = 100
+# Models prefill the whole prompt before the first token; charge for it per KB
+FAKE_PROMPT_MS_PER_KB = float(os.getenv("FAKE_PROMPT_MS_PER_KB", "0"))
+
+app = FastAPI(title="Fake provider")
+app.state.latency = FAKE_LATENCY_MS / 1000
+app.state.requests = 0
+app.state.prompt_ms_per_kb = FAKE_PROMPT_MS_PER_KB
+# (request bytes, last message content, message count) per chat completion
+app.state.chat_requests = []
+# Transcription: cost per second of WAV audio and the provider's upload limit
+app.state.stt_ms_per_audio_second = float(os.getenv("FAKE_STT_MS_PER_AUDIO_SECOND", "0"))
+app.state.stt_max_bytes = int(os.getenv("FAKE_STT_MAX_BYTES", str(25 * 1024 * 1024)))
+
+
+async def delay():
+    app.state.requests += 1
+    await asyncio.sleep(app.state.latency)
+
+
+# Chat: a user message containing a keyword triggers the matching tool call
+# (when tools are offered); a tool result is answered in text. Replies are
+# generated at token_ms per word, streamed when the request asks for it.
+FAKE_TOKEN_MS = float(os.getenv("FAKE_TOKEN_MS", "0"))
+app.state.token_ms = FAKE_TOKEN_MS
+app.state.chat_tool_rules = {"appointment": ("find_next_available", {"specialty": "cardiology", "limit": 3})}
+
+
+def chat_turn(body):
+    """(reply text, tool call or None) for a chat completion request."""
+    last = body["messages"][-1]
+    content = last.get("content") or ""
+    if last.get("role") == "tool":
+        return f"Here is what I found: {content[:80]}", None
+    if body.get("tools") and body.get("tool_choice") != "none":
+        for keyword, (name, arguments) in app.state.chat_tool_rules.items():
+            if keyword in content.lower():
+                return "", {"id": f"call_{app.state.requests}", "type": "function",
+                            "function": {"name": name, "arguments": json.dumps(arguments)}}
+    return f"You said: {content[:80]}", None
+
+
+def chat_chunk(body, delta, finish_reason=None):
+    return "data: " + json.dumps({
+        "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }) + "\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    raw = await request.body()
+    body = json.loads(raw)
+    app.state.chat_requests.append((len(raw), body["messages"][-1].get("content") or "", len(body["messages"])))
+    await asyncio.sleep(len(raw) / 1024 * app.state.prompt_ms_per_kb / 1000)
+    await delay()
+    text, tool_call = chat_turn(body)
+    parts = text.split(" ") if text else []
+    words = [w + " " for w in parts[:-1]] + parts[-1:]
+    finish_reason = "tool_calls" if tool_call else "stop"
+
+    if body.get("stream"):
+        async def stream():
+            yield chat_chunk(body, {"role": "assistant", "content": ""})
+            for word in words:
+                await asyncio.sleep(app.state.token_ms / 1000)
+                yield chat_chunk(body, {"content": word})
+            if tool_call:
+                yield chat_chunk(body, {"tool_calls": [{"index": 0, **tool_call}]})
+            yield chat_chunk(body, {}, finish_reason)
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    await asyncio.sleep(len(words) * app.state.token_ms / 1000)
+    message = {"role": "assistant", "content": text or None}
+    if tool_call:
+        message["tool_calls"] = [tool_call]
+    return JSONResponse({
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{"index": 0, "finish_reason": finish_reason, "message": message}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": len(words), "total_tokens": 10 + len(words)},
+    })
+
+
+@app.post("/v1/audio/speech")
+async def speech(request: Request):
+    await request.body()
+    await delay()
+
+    async def body():
+        sent = 0
+        while sent < FAKE_TTS_BYTES:
+            n = min(FAKE_TTS_CHUNK, FAKE_TTS_BYTES - sent)
+            sent += n
+            yield b"\xff" * n
+            await asyncio.sleep(0)
+    return StreamingResponse(body(), media_type="audio/mpeg")
+
+
+def wav_seconds(data):
+    # Duration from a canonical WAV header's byte rate; 0 for anything else
+    if len(data) < 44 or data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        return 0.0
+    byte_rate = struct.unpack_from("<I", data, 28)[0]
+    return (len(data) - 44) / byte_rate if byte_rate else 0.0
+
+
+@app.post("/v1/audio/transcriptions")
+async def transcriptions(request: Request):
+    form = await request.form()
+    upload = form.get("file")
+    data = await upload.read() if upload is not None else b""
+    if len(data) > app.state.stt_max_bytes:
+        return JSONResponse(status_code=413, content={"error": {"message": "Maximum content size limit exceeded"}})
+    await delay()
+    # Transcription time grows with the length of the audio
+    await asyncio.sleep(wav_seconds(data) * app.state.stt_ms_per_audio_second / 1000)
+    return JSONResponse({"text": f"fake transcript of {len(data)} bytes"})
+
+
+# Scripted realtime behaviour. The greeting and every later response play the
+# next entry of "responses" (cycling after the first); each action is either
+# {"audio_ms": N} or {"tool": name, "arguments": {...}}. Consecutive tool actions
+# are emitted together as parallel calls and end the response; the following
+# entry plays once the app sends the outputs back and asks for a response.
+# Every `turn_every_ms` of inbound audio simulates the caller finishing a sentence.
+DEFAULT_SCRIPT = {
+    "turn_every_ms": 3000,
+    "responses": [
+        [{"audio_ms": FAKE_RESPONSE_AUDIO_MS}],
+        [{"tool": "list_doctors", "arguments": {"specialty": "heart doctor"}}],
+        [{"audio_ms": 1500}],
+        [{"tool": "find_next_available", "arguments": {"specialty": "cardiology", "limit": 3}},
+         {"tool": "list_slots", "arguments": {"doctor_id": 1}}],
+        [{"audio_ms": 1500}],
+    ],
+}
+app.state.script = DEFAULT_SCRIPT
+# Shared with an in-process Twilio simulator: (call_no, seq) -> perf_counter at send
+app.state.sent_at = {}
+# frame_latency_ms holds (seq, ms) so callers can drop each call's warm-up frames
+app.state.stats = {"frame_latency_ms": [], "tool_latency_ms": [], "appends": 0, "sessions": 0}
+
+
+def frame_header(audio):
+    """(call_no, seq) stamped into the first 8 bytes of a simulated frame."""
+    if len(audio) < 8:
+        return None
+    return struct.unpack(">II", audio[:8])
+
+
+class RealtimeConversation:
+    def __init__(self, ws, script):
+        self.ws = ws
+        self.script = script
+        self.responses = 0
+        self.inbound_ms = 0
+        self.pending_tools = {}  # call_id -> perf_counter when the call was emitted
+        self.tasks = set()
+
+    def next_actions(self):
+        responses = self.script["responses"]
+        if self.responses == 0 or len(responses) == 1:
+            actions = responses[0]
+        else:
+            actions = responses[1 + (self.responses - 1) % (len(responses) - 1)]
+        self.responses += 1
+        return actions
+
+    def respond(self):
+        task = asyncio.create_task(self.run_response(self.next_actions(), self.responses))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def send(self, event):
+        await self.ws.send_text(json.dumps(event))
+
+    async def run_response(self, actions, n):
+        await asyncio.sleep(FAKE_RESPONSE_MS / 1000)
+        called_tools = False
+        for i, action in enumerate(actions):
+            item_id = f"item_{n}_{i}"
+            if called_tools and "tool" not in action:
+                break
+            if "tool" in action:
+                called_tools = True
+                call_id = f"call_{n}_{i}"
+                self.pending_tools[call_id] = time.perf_counter()
+                await self.send({
+                    "type": "response.function_call_arguments.done",
+                    "item_id": item_id,
+                    "call_id": call_id,
+                    "name": action["tool"],
+                    "arguments": json.dumps(action.get("arguments", {})),
+                })
+                continue
+            delta = base64.b64encode(b"\xff" * (8 * FAKE_DELTA_MS)).decode()
+            for _ in range(max(1, action.get("audio_ms", 0) // FAKE_DELTA_MS)):
+                await self.send({"type": "response.audio.delta", "item_id": item_id, "delta": delta})
+                await asyncio.sleep(FAKE_DELTA_MS / 2000)
+            await self.send({"type": "response.audio.done", "item_id": item_id})
+        await self.send({"type": "response.done"})
+
+    def on_append(self, event):
+        stats = app.state.stats
+        stats["appends"] += 1
+        audio = base64.b64decode(event.get("audio", ""))
+        # One append may carry several coalesced 20 ms frames
+        for offset in range(0, len(audio), 160):
+            header = frame_header(audio[offset:offset + 160])
+            sent = app.state.sent_at.pop(header, None) if header else None
+            if sent is not None:
+                stats["frame_latency_ms"].append((header[1], (time.perf_counter() - sent) * 1000))
+        self.inbound_ms += len(audio) // 8
+        turn_every = self.script.get("turn_every_ms")
+        if turn_every and self.inbound_ms >= turn_every:
+            self.inbound_ms = 0
+            return True
+        return False
+
+    def on_item(self, event):
+        item = event.get("item", {})
+        call_id = item.get("call_id")
+        started = self.pending_tools.pop(call_id, None)
+        if started is None and self.pending_tools and item.get("type") in ("function", "function_call_output"):
+            # Older clients answer without a call_id
+            started = self.pending_tools.pop(next(iter(self.pending_tools)))
+        if started is not None:
+            app.state.stats["tool_latency_ms"].append((time.perf_counter() - started) * 1000)
+
+
+@app.websocket("/v1/realtime")
+async def realtime(ws: WebSocket):
+    await asyncio.sleep(FAKE_CONNECT_MS / 1000)
+    await ws.accept()
+    app.state.stats["sessions"] += 1
+    conversation = RealtimeConversation(ws, app.state.script)
+    await conversation.send({"type": "session.created"})
+    try:
+        while True:
+            event = json.loads(await ws.receive_text())
+            kind = event.get("type")
+            if kind == "input_audio_buffer.append":
+                if conversation.on_append(event):
+                    await conversation.send({"type": "input_audio_buffer.speech_started"})
+                    await conversation.send({"type": "input_audio_buffer.speech_stopped"})
+                    conversation.respond()
+            elif kind == "session.update":
+                await asyncio.sleep(FAKE_SETUP_MS / 1000)
+                await conversation.send({"type": "session.updated"})
+            elif kind == "conversation.item.create":
+                conversation.on_item(event)
+            elif kind == "response.create":
+                conversation.respond()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in list(conversation.tasks):
+            task.cancel()
+
+
+def serve(port=0, host="127.0.0.1", fake_app=app):
+    """Start a uvicorn server in a daemon thread; returns (base_url, server)."""
+    import socket
+    import uvicorn
+    if port == 0:
+        with socket.socket() as sock:
+            sock.bind((host, 0))
+            port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(fake_app, host=host, port=port, log_level="warning", lifespan="off"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://{host}:{port}/v1", server
+
+
+if __name__ == "__main__":
+    import uvicorn
+    parser = argparse.ArgumentParser(description="Fake provider server")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=FAKE_LATENCY_MS)
+    args = parser.parse_args()
+    app.state.latency = args.latency_ms / 1000
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
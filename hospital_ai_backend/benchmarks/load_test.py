@@ -0,0 +1,173 @@
+# benchmarks/load_test.py
+#
+# Offline load test for /media-stream. Seeds a SQLite DB, starts the fake
+# provider (in this process) and the app under uvicorn (in a subprocess),
+# then drives N simulated Twilio callers per step and reports:
+#   - inbound frame forwarding latency (simulator send -> fake model receive)
+#   - time-to-first-audio, tool-call latency
+#   - the app's event-loop lag
+#   - concurrent-call capacity: the largest step that met the SLOs
+#     python -m benchmarks.load_test --calls 10,25,50 --duration 20
+# --json prints a machine-readable summary; --min-capacity makes the exit
+# status fail when capacity regresses, for CI.
+
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import subprocess
+
+import httpx
+
+from .common import use_bench_database, use_bench_workdir, reset_schema, seed, percentile
+from .fake_openai import serve, app as fake_app
+from .twilio_sim import run_calls, tone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def seed_database(doctors, slots_per_doctor):
+    await reset_schema()
+    await seed(doctors, slots_per_doctor)
+    # The app no longer migrates on startup
+    from app.migrate import migrate
+    await migrate()
+    from app.database import engine
+    await engine.dispose()
+
+
+def start_app(port, env, workers=1):
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.run_app", "--port", str(port), "--workers", str(workers)],
+        cwd=os.getcwd(), env={**env, "PYTHONPATH": BACKEND_DIR},
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("app exited during startup")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/_bench/loop-lag", timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("app did not start")
+
+
+async def run_step(app_url, n_calls, duration, audio, warmup_frames):
+    stats = fake_app.state.stats
+    stats["frame_latency_ms"].clear()
+    stats["tool_latency_ms"].clear()
+    fake_app.state.sent_at.clear()
+    async with httpx.AsyncClient() as client:
+        await client.get(f"{app_url}/_bench/loop-lag")  # reset
+        results = await run_calls(app_url, n_calls, duration, fake_app.state.sent_at, audio)
+        lag = (await client.get(f"{app_url}/_bench/loop-lag")).json()
+    # Frames sent while the realtime session is still connecting queue up in
+    # the app; only steady-state forwarding counts towards the latency figures
+    received = list(stats["frame_latency_ms"])
+    frames = [ms for seq, ms in received if seq >= warmup_frames]
+    tools = list(stats["tool_latency_ms"])
+    ttfa = [r.ttfa_ms for r in results if r.ttfa_ms is not None]
+    sent = sum(r.frames_sent for r in results)
+    return {
+        "calls": n_calls,
+        "failed_calls": sum(1 for r in results if r.error),
+        "frames_sent": sent,
+        "frames_forwarded_pct": round(100.0 * len(received) / sent, 2) if sent else 0.0,
+        "forward_p50_ms": round(percentile(frames, 50), 2),
+        "forward_p99_ms": round(percentile(frames, 99), 2),
+        "ttfa_p50_ms": round(percentile(ttfa, 50), 1),
+        "ttfa_p95_ms": round(percentile(ttfa, 95), 1),
+        "tool_calls": len(tools),
+        "tool_p50_ms": round(percentile(tools, 50), 2),
+        "tool_p99_ms": round(percentile(tools, 99), 2),
+        "loop_lag_p50_ms": round(lag["p50"], 2),
+        "loop_lag_p99_ms": round(lag["p99"], 2),
+        "loop_lag_max_ms": round(lag["max"], 2),
+        "outbound_frames": sum(r.media_received for r in results),
+        "errors": [r.error for r in results if r.error][:3],
+    }
+
+
+def meets_slo(step, args):
+    return (
+        step["failed_calls"] == 0
+        and step["frames_forwarded_pct"] >= 99.0
+        and step["forward_p99_ms"] <= args.slo_forward_ms
+        and step["loop_lag_p99_ms"] <= args.slo_lag_ms
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Offline /media-stream load test")
+    parser.add_argument("--calls", default="5,10,25", help="comma-separated concurrent call counts")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds of caller audio per call")
+    parser.add_argument("--audio", help="raw 8 kHz mu-law file to replay (default: generated tone)")
+    parser.add_argument("--script", help="JSON realtime script for the fake server")
+    parser.add_argument("--warmup-frames", type=int, default=50,
+                        help="per-call frames excluded from forwarding latency (50 = first second)")
+    parser.add_argument("--doctors", type=int, default=50)
+    parser.add_argument("--slots-per-doctor", type=int, default=200)
+    parser.add_argument("--slo-forward-ms", type=float, default=100.0)
+    parser.add_argument("--slo-lag-ms", type=float, default=50.0)
+    parser.add_argument("--min-capacity", type=int, default=0)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    use_bench_workdir("load_test")
+    db_url = use_bench_database("load_test")
+    await seed_database(args.doctors, args.slots_per_doctor)
+
+    if args.script:
+        with open(args.script) as f:
+            fake_app.state.script = json.load(f)
+    fake_url, fake_server = serve()
+    audio = open(args.audio, "rb").read() if args.audio else tone(2.0)
+
+    port = free_port()
+    env = {**os.environ, "DATABASE_URL": db_url, "OPENAI_BASE_URL": fake_url, "OPENAI_API_KEY": "offline"}
+    proc = start_app(port, env)
+    app_url = f"http://127.0.0.1:{port}"
+    steps = []
+    try:
+        for n in [int(x) for x in args.calls.split(",")]:
+            step = await run_step(app_url, n, args.duration, audio, args.warmup_frames)
+            step["meets_slo"] = meets_slo(step, args)
+            steps.append(step)
+            if not args.json:
+                print(
+                    f"calls={n:<4} ok={step['meets_slo']!s:<5} failed={step['failed_calls']:<3} "
+                    f"fwd={step['frames_forwarded_pct']:6.2f}% p50={step['forward_p50_ms']:6.2f} p99={step['forward_p99_ms']:7.2f} ms  "
+                    f"ttfa p50={step['ttfa_p50_ms']:7.1f} ms  tools={step['tool_calls']:<4} p99={step['tool_p99_ms']:7.2f} ms  "
+                    f"loop lag p99={step['loop_lag_p99_ms']:6.2f} max={step['loop_lag_max_ms']:6.2f} ms"
+                )
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        fake_server.should_exit = True
+
+    capacity = max((s["calls"] for s in steps if s["meets_slo"]), default=0)
+    if args.json:
+        print(json.dumps({"capacity": capacity, "steps": steps}, indent=2))
+    else:
+        print(f"concurrent-call capacity (SLO: forward p99 <= {args.slo_forward_ms} ms, "
+              f"loop lag p99 <= {args.slo_lag_ms} ms): {capacity}")
+    if capacity < args.min_capacity:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
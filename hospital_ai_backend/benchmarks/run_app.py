@@ -0,0 +1,73 @@
+# benchmarks/run_app.py
+#
+# Serves app.main:app under uvicorn with an event-loop lag probe mounted at
+# /_bench/loop-lag, so the load test can read the app's own loop health.
+#     python -m benchmarks.run_app --port 8010
+
+import os
+import asyncio
+import argparse
+from contextlib import asynccontextmanager
+
+import uvicorn
+
+from app.main import app
+from .common import percentile
+
+PROBE_INTERVAL = 0.01
+lag_ms = []
+
+
+async def probe():
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lag_ms.append(max(0.0, loop.time() - started - PROBE_INTERVAL) * 1000)
+
+
+app_lifespan = app.router.lifespan_context
+
+
+@asynccontextmanager
+async def lifespan_with_probe(app):
+    # Wraps the app's own lifespan; on_event handlers are ignored once one is set
+    app.state.lag_probe = asyncio.create_task(probe())
+    try:
+        async with app_lifespan(app) as state:
+            yield state
+    finally:
+        app.state.lag_probe.cancel()
+
+
+app.router.lifespan_context = lifespan_with_probe
+
+
+@app.get("/_bench/loop-lag")
+async def loop_lag(reset: bool = True):
+    values = list(lag_ms)
+    if reset:
+        lag_ms.clear()
+    return {
+        "samples": len(values),
+        "p50": percentile(values, 50),
+        "p99": percentile(values, 99),
+        "max": max(values, default=0.0),
+    }
+
+
+@app.get("/_bench/pid")
+async def worker_pid():
+    return {"pid": os.getpid()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the app with a loop-lag probe")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+    # Several workers need an import string so each process builds its own app
+    target = "benchmarks.run_app:app" if args.workers > 1 else app
+    uvicorn.run(target, host=args.host, port=args.port, workers=args.workers,
+                log_level="warning", ws_max_size=16 * 1024 * 1024)
@@ -0,0 +1,117 @@
+# benchmarks/twilio_sim.py
+#
+# Simulated Twilio <Stream> callers. Each call fetches TwiML from
+# /incoming-call, opens /media-stream and replays mu-law audio at the real
+# 20 ms cadence while recording what comes back.
+
+import json
+import math
+import time
+import struct
+import base64
+import asyncio
+import re
+
+import httpx
+import websockets
+
+FRAME_BYTES = 160  # 20 ms of 8 kHz mu-law
+
+
+def linear_to_ulaw(sample):
+    # G.711 mu-law encode of one signed 16-bit sample
+    BIAS, CLIP = 0x84, 32635
+    sign = 0x80 if sample < 0 else 0
+    sample = min(abs(sample), CLIP) + BIAS
+    exponent = 7
+    for exp in range(7, -1, -1):
+        if sample & (0x4000 >> (7 - exp)):
+            exponent = exp
+            break
+    mantissa = (sample >> (exponent + 3)) & 0x0F
+    return ~(sign | (exponent << 4) | mantissa) & 0xFF
+
+
+def tone(seconds=1.0, freq=440.0, rate=8000):
+    return bytes(
+        linear_to_ulaw(int(8000 * math.sin(2 * math.pi * freq * i / rate)))
+        for i in range(int(seconds * rate))
+    )
+
+
+class CallResult:
+    def __init__(self, call_no):
+        self.call_no = call_no
+        self.ttfa_ms = None
+        self.frames_sent = 0
+        self.frames_late = 0
+        self.media_received = 0
+        self.marks = 0
+        self.error = None
+
+
+async def run_call(base_url, call_no, audio, duration_s, sent_at):
+    """One simulated caller; `sent_at` is shared with the fake realtime server."""
+    result = CallResult(call_no)
+    ws_url = re.sub(r"^http", "ws", base_url) + "/media-stream"
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=30) as http:
+            twiml = (await http.post("/incoming-call")).text
+        match = re.search(r'name="session" value="([^"]+)"', twiml)
+        token = match.group(1) if match else None
+        async with websockets.connect(ws_url, max_size=None) as ws:
+            stream_sid = f"MZsim{call_no:06d}"
+            await ws.send(json.dumps({"event": "connected", "protocol": "Call", "version": "1.0.0"}))
+            started = time.perf_counter()
+            await ws.send(json.dumps({"event": "start", "sequenceNumber": "1", "start": {
+                "streamSid": stream_sid, "callSid": f"CAsim{call_no:06d}",
+                "tracks": ["inbound"], "customParameters": {"session": token} if token else {},
+                "mediaFormat": {"encoding": "audio/x-mulaw", "sampleRate": 8000, "channels": 1},
+            }, "streamSid": stream_sid}))
+
+            async def receive():
+                async for message in ws:
+                    event = json.loads(message)
+                    kind = event.get("event")
+                    if kind == "media":
+                        result.media_received += 1
+                        if result.ttfa_ms is None:
+                            result.ttfa_ms = (time.perf_counter() - started) * 1000
+                    elif kind == "mark":
+                        # Twilio echoes marks back once the audio before them has played
+                        result.marks += 1
+                        await ws.send(json.dumps({"event": "mark", "streamSid": stream_sid, "mark": event["mark"]}))
+
+            receiver = asyncio.create_task(receive())
+            loop = asyncio.get_running_loop()
+            next_at = loop.time()
+            frames = int(duration_s * 1000 / 20)
+            for seq in range(frames):
+                offset = (seq * FRAME_BYTES) % max(len(audio) - FRAME_BYTES, 1)
+                frame = struct.pack(">II", call_no, seq) + audio[offset + 8:offset + FRAME_BYTES]
+                sent_at[(call_no, seq)] = time.perf_counter()
+                await ws.send(json.dumps({"event": "media", "streamSid": stream_sid, "media": {
+                    "track": "inbound", "chunk": str(seq + 1), "timestamp": str(seq * 20),
+                    "payload": base64.b64encode(frame).decode(),
+                }}))
+                result.frames_sent += 1
+                next_at += 0.02
+                delay = next_at - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                elif delay < -0.02:
+                    result.frames_late += 1
+            await ws.send(json.dumps({"event": "stop", "streamSid": stream_sid}))
+            receiver.cancel()
+    except Exception as e:
+        result.error = repr(e)
+    return result
+
+
+async def run_calls(base_url, n_calls, duration_s, sent_at, audio=None, ramp_s=1.0):
+    audio = audio or tone(2.0)
+    tasks = []
+    for i in range(n_calls):
+        tasks.append(asyncio.create_task(run_call(base_url, i, audio, duration_s, sent_at)))
+        await asyncio.sleep(ramp_s / max(n_calls, 1))
+    return await asyncio.gather(*tasks)